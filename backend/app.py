@@ -9,8 +9,17 @@ from flask_login import current_user
 
 from config import Config
 from extensions import db, migrate, login_manager, limiter
-from models import User, ListingImage, Listing
+from models import User, ListingImage, ListingImageRendition, Listing
 from routes import register_blueprints
+from counter_utils import reconcile_counters
+from cascade_utils import delete_listings, delete_users, migrate_fk_actions, validate_fk_actions
+from view_utils import init_view_buffer, rebuild_viewer_sketches
+from notify_utils import init_fanout
+from blob_utils import init_blob_store, migrate_blobs, sweep_blobs
+from rendition_utils import build_renditions
+from similar_utils import rebuild_similarity_index
+from rollup_utils import rebuild_daily_stats
+from ranking_utils import refresh_rank_scores
 
 load_dotenv()
 
@@ -41,6 +50,7 @@ def create_app():
 
     # ensure upload folder exists
     os.makedirs(app.config["UPLOAD_FOLDER"], exist_ok=True)
+    init_blob_store(app)
 
     # init extensions
     db.init_app(app)
@@ -90,6 +100,8 @@ def create_app():
         changed |= _add_col("boosts", "duration_hours", "INTEGER DEFAULT 24")
         changed |= _add_col("listing_images", "image_data", "BYTEA")
         changed |= _add_col("listing_images", "image_mime", "VARCHAR(32)")
+        changed |= _add_col("listing_images", "blob_key", "VARCHAR(64)")
+        changed |= _add_col("users", "avatar_key", "VARCHAR(64)")
         changed |= _add_col("reports", "listing_id", "VARCHAR(36) REFERENCES listings(id)")
         changed |= _add_col("users", "is_test_account", "BOOLEAN DEFAULT FALSE")
         changed |= _add_col("users", "is_admin", "BOOLEAN DEFAULT FALSE")
@@ -97,8 +109,56 @@ def create_app():
         changed |= _add_col("reports", "admin_notes", "TEXT")
         changed |= _add_col("reports", "resolved_by", "VARCHAR(36)")
         changed |= _add_col("reports", "resolved_at", "TIMESTAMP WITH TIME ZONE")
+        changed |= _add_col("listings", "geohash", "VARCHAR(12)")
+        ranks_added = _add_col("listings", "rank_score", "DOUBLE PRECISION")
+        changed |= ranks_added
+        counters_added = _add_col("listings", "observing_count", "INTEGER NOT NULL DEFAULT 0")
+        counters_added |= _add_col("listings", "view_count", "INTEGER NOT NULL DEFAULT 0")
+        changed |= counters_added
+        changed |= _add_col("listings", "version", "INTEGER NOT NULL DEFAULT 1")
+        changed |= _add_col("users", "version", "INTEGER NOT NULL DEFAULT 1")
+        changed |= _add_col("users", "deleted_at", "TIMESTAMP WITH TIME ZONE")
+        positions_added = _add_col("listing_images", "position", "INTEGER NOT NULL DEFAULT 0")
+        changed |= positions_added
+        sketches_added = _add_col("listings", "unique_viewers", "INTEGER NOT NULL DEFAULT 0")
+        sketches_added |= _add_col("listings", "viewer_sketch", "BYTEA")
+        sketches_added |= _add_col("users", "viewer_sketch", "BYTEA")
+        changed |= sketches_added
+        rendition_mime_added = _add_col("listing_image_renditions", "mime", "VARCHAR(32) NOT NULL DEFAULT 'image/jpeg'")
+        changed |= rendition_mime_added
         if changed:
             db.session.commit()
+        if counters_added:
+            reconcile_counters()
+        if ranks_added:
+            refresh_rank_scores()
+            db.session.commit()
+        if sketches_added:
+            rebuild_viewer_sketches()
+        if rendition_mime_added:
+            # The rendition unique key gained mime. SQLite can't alter a table constraint; renditions
+            # are derived data there, so recreate the table empty and leave the refill to
+            # flask build-renditions (images serve their full JPEG until then)
+            if db.engine.dialect.name == "sqlite":
+                ListingImageRendition.__table__.drop(db.engine)
+                ListingImageRendition.__table__.create(db.engine)
+            else:
+                db.session.execute(text(
+                    "ALTER TABLE listing_image_renditions DROP CONSTRAINT IF EXISTS uq_listing_image_rendition"
+                ))
+                db.session.execute(text(
+                    "ALTER TABLE listing_image_renditions "
+                    "ADD CONSTRAINT uq_listing_image_rendition UNIQUE (image_id, size, mime)"
+                ))
+                db.session.commit()
+        if positions_added:
+            # Gallery order used to live in created_at (reorder rewrote it); carry it over
+            db.session.execute(text(
+                "UPDATE listing_images SET position = (SELECT COUNT(*) FROM listing_images o "
+                "WHERE o.listing_id = listing_images.listing_id AND (o.created_at < listing_images.created_at "
+                "OR (o.created_at = listing_images.created_at AND o.id < listing_images.id)))"
+            ))
+            db.session.commit()
 
         # Drop is_demo column if it still exists (removed from model)
         try:
@@ -122,6 +182,13 @@ def create_app():
         except Exception:
             db.session.rollback()
 
+        # Foreign keys created before the models declared ON DELETE CASCADE / SET NULL.
+        # Only the quick swap runs here; flask validate-fk-actions checks existing rows.
+        try:
+            migrate_fk_actions()
+        except Exception:
+            db.session.rollback()
+
         # Partial unique index: only 1 active boost per listing at the DB level
         try:
             db.session.execute(text(
@@ -132,47 +199,54 @@ def create_app():
         except Exception:
             db.session.rollback()
 
+        # Composite indexes backing keyset pagination of the feed/search sort modes
+        try:
+            for stmt in [
+                "CREATE INDEX IF NOT EXISTS ix_listings_sort_newest "
+                "ON listings ((COALESCE(renewed_at, created_at)), id)",
+                "CREATE INDEX IF NOT EXISTS ix_listings_sort_created ON listings (created_at, id)",
+                "CREATE INDEX IF NOT EXISTS ix_listings_sort_price ON listings (price_cents, id)",
+                "CREATE INDEX IF NOT EXISTS ix_listings_rank ON listings (rank_score, id)",
+                # Geohash range scans for the nearby filter / distance sort
+                "CREATE INDEX IF NOT EXISTS ix_listings_geohash ON listings (geohash, id)",
+                # Gallery order lookups (first image, ordered gallery)
+                "CREATE INDEX IF NOT EXISTS ix_listing_images_listing_position "
+                "ON listing_images (listing_id, position)",
+                # Reference checks when sweeping unused blobs
+                "CREATE INDEX IF NOT EXISTS ix_listing_images_blob_key ON listing_images (blob_key)",
+                "CREATE INDEX IF NOT EXISTS ix_users_avatar_key ON users (avatar_key)",
+                # The few users being deleted, whose listings every feed and search hides
+                "CREATE INDEX IF NOT EXISTS ix_users_deleting ON users (id) WHERE deleted_at IS NOT NULL",
+            ]:
+                db.session.execute(text(stmt))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+
+        # Geohash for listings created before the column existed
+        try:
+            from geo_utils import backfill_geohashes
+            backfill_geohashes()
+        except Exception:
+            db.session.rollback()
+
+        # Full-text index for /api/listings/search (tsvector + GIN, or FTS5 on SQLite)
+        from search_utils import init_search_index
+        init_search_index()
+
         # One-time cleanup: remove old broken images (filesystem URLs) and empty listings
         # Use raw SQL to avoid ORM issues with missing columns
         try:
             result = db.session.execute(text(
-                "DELETE FROM listing_images WHERE image_url LIKE '%/uploads/%' AND image_data IS NULL"
+                "DELETE FROM listing_images WHERE image_url LIKE '%/uploads/%' AND image_data IS NULL "
+                "AND blob_key IS NULL"
             ))
             if result.rowcount > 0:
                 # Find listings with zero remaining images and delete them + dependents
                 orphans = db.session.execute(text(
                     "SELECT id FROM listings WHERE id NOT IN (SELECT DISTINCT listing_id FROM listing_images)"
                 )).fetchall()
-                for (lid,) in orphans:
-                    # Delete dependents via raw SQL — each wrapped individually
-                    for tbl, col in [
-                        ("boost_impressions", "boost_id IN (SELECT id FROM boosts WHERE listing_id=:lid)"),
-                        ("boosts", "listing_id=:lid"),
-                        ("messages", "conversation_id IN (SELECT id FROM conversations WHERE listing_id=:lid)"),
-                        ("conversations", "listing_id=:lid"),
-                        ("safe_meet_locations", "listing_id=:lid"),
-                        ("safety_ack_events", "listing_id=:lid"),
-                        ("observing", "listing_id=:lid"),
-                        ("notifications", "listing_id=:lid"),
-                        ("offers", "listing_id=:lid"),
-                        ("price_history", "listing_id=:lid"),
-                        ("reviews", "listing_id=:lid"),
-                        ("listing_views", "listing_id=:lid"),
-                        ("meetup_confirmations", "listing_id=:lid"),
-                    ]:
-                        try:
-                            db.session.execute(text(f"DELETE FROM {tbl} WHERE {col}"), {"lid": lid})
-                        except Exception:
-                            db.session.rollback()
-                    # Also try reports (column may not exist on older DBs)
-                    try:
-                        db.session.execute(text("DELETE FROM reports WHERE listing_id=:lid"), {"lid": lid})
-                    except Exception:
-                        db.session.rollback()
-                    try:
-                        db.session.execute(text("DELETE FROM listings WHERE id=:lid"), {"lid": lid})
-                    except Exception:
-                        db.session.rollback()
+                delete_listings([lid for (lid,) in orphans])
                 db.session.commit()
         except Exception:
             db.session.rollback()
@@ -183,45 +257,7 @@ def create_app():
                 "SELECT id FROM users WHERE email='demo@pocket-market.com'"
             )).fetchone()
             if demo_user:
-                demo_uid = demo_user[0]
-                demo_listings = db.session.execute(text(
-                    "SELECT id FROM listings WHERE user_id=:uid"
-                ), {"uid": demo_uid}).fetchall()
-                for (lid,) in demo_listings:
-                    for tbl, col in [
-                        ("boost_impressions", "boost_id IN (SELECT id FROM boosts WHERE listing_id=:lid)"),
-                        ("boosts", "listing_id=:lid"),
-                        ("messages", "conversation_id IN (SELECT id FROM conversations WHERE listing_id=:lid)"),
-                        ("conversations", "listing_id=:lid"),
-                        ("safe_meet_locations", "listing_id=:lid"),
-                        ("safety_ack_events", "listing_id=:lid"),
-                        ("observing", "listing_id=:lid"),
-                        ("notifications", "listing_id=:lid"),
-                        ("offers", "listing_id=:lid"),
-                        ("price_history", "listing_id=:lid"),
-                        ("reviews", "listing_id=:lid"),
-                        ("listing_views", "listing_id=:lid"),
-                        ("meetup_confirmations", "listing_id=:lid"),
-                        ("listing_images", "listing_id=:lid"),
-                        ("reports", "listing_id=:lid"),
-                    ]:
-                        try:
-                            db.session.execute(text(f"DELETE FROM {tbl} WHERE {col}"), {"lid": lid})
-                        except Exception:
-                            db.session.rollback()
-                    db.session.execute(text("DELETE FROM listings WHERE id=:lid"), {"lid": lid})
-                # Delete the demo user itself
-                for tbl in ["subscriptions", "push_subscriptions", "saved_searches",
-                            "blocked_users", "notifications", "observing", "safety_ack_events"]:
-                    try:
-                        db.session.execute(text(f"DELETE FROM {tbl} WHERE user_id=:uid"), {"uid": demo_uid})
-                    except Exception:
-                        db.session.rollback()
-                try:
-                    db.session.execute(text("DELETE FROM blocked_users WHERE blocked_id=:uid"), {"uid": demo_uid})
-                except Exception:
-                    db.session.rollback()
-                db.session.execute(text("DELETE FROM users WHERE id=:uid"), {"uid": demo_uid})
+                delete_users([demo_user[0]])
                 db.session.commit()
         except Exception:
             db.session.rollback()
@@ -238,13 +274,17 @@ def create_app():
 
     @login_manager.user_loader
     def load_user(user_id):
-        return db.session.get(User, user_id)
+        u = db.session.get(User, user_id)
+        # Tombstoned accounts are signed out everywhere while their purge runs
+        return u if u and not u.deleted_at else None
 
     @login_manager.unauthorized_handler
     def unauthorized():
         return jsonify({"error": "Login required"}), 401
 
     register_blueprints(app)
+    init_view_buffer(app)
+    init_fanout(app)
 
     # Block write operations for test accounts (Stripe review)
     @app.before_request
@@ -282,6 +322,52 @@ def create_app():
             current_user.last_seen = now
             db.session.commit()
 
+    @app.cli.command("rebuild-similar")
+    def rebuild_similar_command():
+        """Recompute the similar-listings index from scratch."""
+        print(f"Indexed {rebuild_similarity_index()} listing(s)")
+
+    @app.cli.command("rebuild-rollups")
+    def rebuild_rollups_command():
+        """Recompute the daily seller/listing analytics rollups from raw events."""
+        print(f"Wrote {rebuild_daily_stats()} listing-day row(s)")
+
+    @app.cli.command("rerank-listings")
+    def rerank_listings_command():
+        """Recompute every listing's stored "newest" feed score."""
+        n = refresh_rank_scores()
+        db.session.commit()
+        print(f"Ranked {n} listing(s)")
+
+    @app.cli.command("validate-fk-actions")
+    def validate_fk_actions_command():
+        """Check existing rows against foreign keys startup recreated as NOT VALID."""
+        migrate_fk_actions()
+        print(f"Validated {validate_fk_actions()} constraint(s)")
+
+    @app.cli.command("reconcile-counters")
+    def reconcile_counters_command():
+        """Rebuild listing observing/view counters from their source tables."""
+        print(f"Reconciled {reconcile_counters()} counter(s)")
+
+    @app.cli.command("migrate-blobs")
+    def migrate_blobs_command():
+        """Move image and avatar bytes out of the database into the blob store."""
+        # The bytes leave the database for good, so they must land somewhere that survives a deploy
+        if app.config["BLOB_STORE"] == "local" and not app.config["BLOB_ROOT"]:
+            raise SystemExit("Set BLOB_ROOT to a directory on a persistent volume before migrating blobs")
+        print(f"Moved {migrate_blobs()} blob(s)")
+
+    @app.cli.command("build-renditions")
+    def build_renditions_command():
+        """Create the thumb/card renditions missing for existing listing images."""
+        print(f"Rendered {build_renditions()} image(s)")
+
+    @app.cli.command("sweep-blobs")
+    def sweep_blobs_command():
+        """Delete stored blobs no image or avatar references any more."""
+        print(f"Deleted {sweep_blobs()} blob(s)")
+
     @app.get("/api/health")
     def health():
         return jsonify({"ok": True}), 200
@@ -338,7 +424,7 @@ def create_app():
             lid = listing_match.group(1)
             listing = db.session.get(Listing, lid)
             if listing:
-                img = ListingImage.query.filter_by(listing_id=lid).order_by(ListingImage.created_at.asc()).first()
+                img = ListingImage.query.filter_by(listing_id=lid).order_by(ListingImage.position.asc()).first()
                 img_url = f"https://pocket-market.com{img.image_url}" if img else "https://pocket-market.com/pocketmarket_favicon_transparent_512x512.png"
                 price = f"${listing.price_cents / 100:.2f}"
                 desc = (listing.description or listing.title or "")[:200]
@@ -0,0 +1,115 @@
+"""Account deletion: time of DELETE /api/admin/users/<id> (tombstone + queue)
+vs. the background purge it starts, for sellers of growing size. Each listing
+has images, a boost with impressions, a conversation with messages and views.
+Fails if a purge doesn't finish, leaves the user's rows behind, or the request
+stops being flat. Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_account_deletion [listings ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+os.environ.pop("REDIS_URL", None)
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from models import (  # noqa: E402
+    Boost, BoostImpression, Conversation, DeletionJob, Listing, ListingImage, ListingView, Message, User,
+)
+
+MAX_REQUEST_MS = 250
+
+
+def _seed(seller_id, buyer_id, n):
+    now = datetime.utcnow()
+    rows = {m: [] for m in (Listing, ListingImage, Boost, BoostImpression, Conversation, Message, ListingView)}
+    for _ in range(n):
+        lid, bid, cid = str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4())
+        rows[Listing].append({
+            "id": lid, "user_id": seller_id, "title": "item", "price_cents": 1000, "category": "other",
+            "condition": "used", "pickup_or_shipping": "pickup", "is_sold": False, "is_draft": False,
+            "created_at": now,
+        })
+        rows[ListingImage] += [{"id": str(uuid.uuid4()), "listing_id": lid, "image_url": "x", "created_at": now}
+                               for _ in range(3)]
+        rows[Boost].append({"id": bid, "listing_id": lid, "starts_at": now, "ends_at": now + timedelta(days=1),
+                            "status": "expired", "duration_hours": 24, "paid_cents": 100, "boost_type": "paid",
+                            "created_at": now})
+        rows[BoostImpression] += [{"id": str(uuid.uuid4()), "boost_id": bid, "shown_at": now} for _ in range(5)]
+        rows[Conversation].append({"id": cid, "listing_id": lid, "buyer_id": buyer_id, "seller_id": seller_id,
+                                   "created_at": now})
+        rows[Message] += [{"id": str(uuid.uuid4()), "conversation_id": cid, "sender_id": buyer_id, "body": "hi",
+                           "created_at": now} for _ in range(4)]
+        rows[ListingView] += [{"id": str(uuid.uuid4()), "listing_id": lid, "viewer_id": buyer_id,
+                               "created_at": now} for _ in range(5)]
+    for model, data in rows.items():
+        db.session.execute(model.__table__.insert(), data)
+    db.session.commit()
+
+
+def main(*sizes):
+    sizes = sizes or (10, 1000, 5000)
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    with app.app_context():
+        admin = User(email="admin@example.com", is_admin=True)
+        db.session.add(admin)
+        db.session.commit()
+        admin_id = admin.id
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = admin_id
+        s["_fresh"] = True
+
+    failures = []
+    print(f"{'listings':>8} {'request':>10} {'purge':>10}")
+    for n in sizes:
+        with app.app_context():
+            seller = User(email=f"seller{n}@example.com")
+            buyer = User(email=f"buyer{n}@example.com")
+            db.session.add_all([seller, buyer])
+            db.session.commit()
+            seller_id, buyer_id = seller.id, buyer.id
+            _seed(seller_id, buyer_id, n)
+
+        started = time.perf_counter()
+        resp = client.delete(f"/api/admin/users/{seller_id}")
+        request_ms = (time.perf_counter() - started) * 1000
+        job_id = resp.get_json()["job"]["id"]
+        status = None
+        while time.perf_counter() - started < 600:
+            status = client.get(f"/api/admin/deletion-jobs/{job_id}").get_json()["job"]["status"]
+            if status in ("done", "failed"):
+                break
+            time.sleep(0.05)
+        purge_s = time.perf_counter() - started
+        print(f"{n:>8} {request_ms:8.1f}ms {purge_s:9.2f}s")
+
+        with app.app_context():
+            job = db.session.get(DeletionJob, job_id)
+            if status != "done":
+                failures.append(f"{n}: job ended {status}: {job.error}")
+            if job.listings_deleted != n:
+                failures.append(f"{n}: job reports {job.listings_deleted} listings deleted")
+            if db.session.get(User, seller_id) or Listing.query.filter_by(user_id=seller_id).count():
+                failures.append(f"{n}: seller rows left behind")
+        if request_ms > MAX_REQUEST_MS:
+            failures.append(f"{n}: request took {request_ms:.0f}ms")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,134 @@
+"""Blob deferral: blob bytes loaded from the database into User/ListingImage
+objects and peak Python memory per request, with avatar_data and image_data
+loaded along with their rows (before) vs. deferred until the byte-serving
+endpoints ask for them (after). "Before" is reproduced by undeferring both
+columns on every ORM query. Every user and image still holds its bytes in the
+database, as before migrate-blobs. Fails if the authenticated, feed or profile
+request loads blob bytes after the change, or if serve_avatar/serve_image stop
+serving them. Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_blob_deferral [sellers]
+"""
+import os
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_db_dir, "uploads")
+os.environ.pop("REDIS_URL", None)
+
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.orm import Session, undefer  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from models import Boost, Listing, ListingImage, User  # noqa: E402
+
+AVATAR_BYTES = 150 * 1024
+IMAGE_BYTES = 400 * 1024
+IMAGES_PER_LISTING = 4
+# Blob columns and the entity they belong to
+BLOBS = [(User, "avatar_data"), (ListingImage, "image_data")]
+
+_loaded = [0]
+
+
+def _count_blobs(target, *args):
+    for cls, attr in BLOBS:
+        if isinstance(target, cls):
+            _loaded[0] += len(target.__dict__.get(attr) or b"")
+
+
+def _undefer_blobs(state):
+    """The old mapping: blob columns come with every entity query."""
+    if not state.is_select or state.is_column_load:
+        return
+    entities = {d.get("entity") for d in state.statement.column_descriptions if d.get("expr") is d.get("entity")}
+    opts = [undefer(getattr(cls, attr)) for cls, attr in BLOBS if cls in entities]
+    if opts:
+        state.statement = state.statement.options(*opts)
+
+
+def _measure(client, url):
+    _loaded[0] = 0
+    tracemalloc.start()
+    resp = client.get(url)
+    resp.get_data()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resp.status_code, _loaded[0], peak
+
+
+def main(sellers=8):
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    now = datetime.utcnow()
+    with app.app_context():
+        users = [User(email=f"seller{i}@example.com", avatar_data=os.urandom(AVATAR_BYTES), avatar_mime="image/jpeg")
+                 for i in range(sellers)]
+        db.session.add_all(users)
+        db.session.commit()
+        for u in users:
+            u.avatar_url = f"/api/auth/avatars/{u.id}"
+            listing = Listing(user_id=u.id, title="Bike", price_cents=1000, category="other",
+                              condition="used", pickup_or_shipping="pickup")
+            db.session.add(listing)
+            db.session.flush()
+            db.session.add_all(ListingImage(listing_id=listing.id, image_url="", image_data=os.urandom(IMAGE_BYTES),
+                                            image_mime="image/jpeg", position=p) for p in range(IMAGES_PER_LISTING))
+            db.session.add(Boost(listing_id=listing.id, starts_at=now, ends_at=now + timedelta(days=1),
+                                 status="active", paid_cents=100))
+        db.session.commit()
+        user_id = users[0].id
+        image_id = db.session.query(ListingImage.id).limit(1).scalar()
+    for cls, _ in BLOBS:
+        event.listen(cls, "load", _count_blobs)
+        event.listen(cls, "refresh", _count_blobs)
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = user_id
+        s["_fresh"] = True
+
+    endpoints = [
+        ("/api/auth/me", "authenticated"),
+        ("/api/boosts/featured", "feed"),
+        (f"/api/users/{user_id}/profile", "profile"),
+    ]
+    results = {}
+    for label, undeferred in (("before", True), ("after", False)):
+        if undeferred:
+            event.listen(Session, "do_orm_execute", _undefer_blobs)
+        for url, name in endpoints:
+            _measure(client, url)       # warm caches and imports
+            results[name, label] = _measure(client, url)
+        if undeferred:
+            event.remove(Session, "do_orm_execute", _undefer_blobs)
+
+    failures = []
+    print(f"{sellers} sellers, {AVATAR_BYTES // 1024}KB avatars, {IMAGES_PER_LISTING} x {IMAGE_BYTES // 1024}KB images each")
+    print(f"{'request':<14} {'blob bytes before':>18} {'after':>10} {'peak mem before':>16} {'after':>10}")
+    for url, name in endpoints:
+        (s0, b0, m0), (s1, b1, m1) = results[name, "before"], results[name, "after"]
+        print(f"{name:<14} {b0 / 1024:16.0f}KB {b1 / 1024:8.0f}KB {m0 / 1024:14.0f}KB {m1 / 1024:8.0f}KB")
+        if s0 != 200 or s1 != 200:
+            failures.append(f"{url}: {s0} before, {s1} after")
+        elif b1:
+            failures.append(f"{url} still loads {b1} blob bytes")
+    for url, size in ((f"/api/auth/avatars/{user_id}", AVATAR_BYTES), (f"/api/listings/image/{image_id}", IMAGE_BYTES)):
+        resp = client.get(url)
+        if resp.status_code != 200 or len(resp.get_data()) != size:
+            failures.append(f"{url}: {resp.status_code}, {len(resp.get_data())} bytes, expected {size}")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,121 @@
+"""Bulk listing delete: the old per-listing loop (~17 DELETEs per listing) vs.
+delete_listings (one DELETE per table per chunk of ids). Each listing gets a
+few images, a boost with impressions, a conversation with messages, views and
+observers. Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_bulk_delete [size ...]
+"""
+import os
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+os.environ.pop("REDIS_URL", None)
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import (  # noqa: E402
+    Boost, BoostImpression, Conversation, Listing, ListingImage, ListingView, MeetupConfirmation, Message,
+    Notification, Observing, Offer, PriceHistory, Report, Review, SafeMeetLocation, SafetyAckEvent, User,
+)
+from cascade_utils import delete_listings  # noqa: E402
+
+BACKGROUND_LISTINGS = 5000
+
+
+def _seed(user_id, buyer_id, n):
+    now = datetime.utcnow()
+    ids = [str(uuid.uuid4()) for _ in range(n)]
+    rows = {m: [] for m in (Listing, ListingImage, Boost, BoostImpression, Conversation, Message,
+                            ListingView, Observing, PriceHistory)}
+    for lid in ids:
+        rows[Listing].append({
+            "id": lid, "user_id": user_id, "title": "item", "price_cents": 1000, "category": "other",
+            "condition": "used", "pickup_or_shipping": "pickup", "is_sold": False, "is_draft": False,
+            "created_at": now,
+        })
+        rows[ListingImage] += [{"id": str(uuid.uuid4()), "listing_id": lid, "image_url": "x", "created_at": now}
+                               for _ in range(3)]
+        bid, cid = str(uuid.uuid4()), str(uuid.uuid4())
+        rows[Boost].append({"id": bid, "listing_id": lid, "starts_at": now, "ends_at": now + timedelta(days=1),
+                            "status": "active", "duration_hours": 24, "paid_cents": 100, "boost_type": "paid",
+                            "created_at": now})
+        rows[BoostImpression] += [{"id": str(uuid.uuid4()), "boost_id": bid, "shown_at": now} for _ in range(5)]
+        rows[Conversation].append({"id": cid, "listing_id": lid, "buyer_id": buyer_id, "seller_id": user_id,
+                                   "created_at": now})
+        rows[Message] += [{"id": str(uuid.uuid4()), "conversation_id": cid, "sender_id": buyer_id, "body": "hi",
+                           "created_at": now} for _ in range(4)]
+        rows[ListingView] += [{"id": str(uuid.uuid4()), "listing_id": lid, "created_at": now} for _ in range(5)]
+        rows[Observing].append({"id": str(uuid.uuid4()), "listing_id": lid, "user_id": buyer_id, "created_at": now})
+        rows[PriceHistory].append({"id": str(uuid.uuid4()), "listing_id": lid, "old_cents": 1200, "new_cents": 1000,
+                                   "changed_at": now})
+    for model, data in rows.items():
+        db.session.execute(model.__table__.insert(), data)
+    db.session.commit()
+    return ids
+
+
+def _per_listing(ids):
+    """The loop bulk_action used to run."""
+    for lid in ids:
+        l = db.session.get(Listing, lid)
+        boost_ids = [b.id for b in Boost.query.filter_by(listing_id=l.id).all()]
+        if boost_ids:
+            BoostImpression.query.filter(BoostImpression.boost_id.in_(boost_ids)).delete(synchronize_session=False)
+        Boost.query.filter_by(listing_id=l.id).delete()
+        conv_ids = [c.id for c in Conversation.query.filter_by(listing_id=l.id).all()]
+        if conv_ids:
+            Message.query.filter(Message.conversation_id.in_(conv_ids)).delete(synchronize_session=False)
+        Conversation.query.filter_by(listing_id=l.id).delete()
+        for model in (ListingImage, SafeMeetLocation, SafetyAckEvent, Observing, Notification, Offer,
+                      PriceHistory, Review, Report, ListingView, MeetupConfirmation):
+            model.query.filter_by(listing_id=l.id).delete()
+        db.session.delete(l)
+    db.session.commit()
+
+
+def _set_based(ids):
+    delete_listings(ids)
+    db.session.commit()
+
+
+def main(*sizes):
+    sizes = sizes or (10, 50, 200, 1000)
+    statements = [0]
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+        user, buyer = User(email="seller@example.com"), User(email="buyer@example.com")
+        db.session.add_all([user, buyer])
+        db.session.commit()
+        user_id, buyer_id = user.id, buyer.id
+        _seed(user_id, buyer_id, BACKGROUND_LISTINGS)
+
+        print(f"{'listings':>8} {'per-listing':>22} {'set-based':>22}")
+        for n in sizes:
+            results = []
+            for fn in (_per_listing, _set_based):
+                ids = _seed(user_id, buyer_id, n)
+                statements[0] = 0
+                started = time.perf_counter()
+                fn(ids)
+                elapsed = time.perf_counter() - started
+                results.append(f"{elapsed * 1000:9.1f}ms {statements[0]:6} stmts")
+                if Listing.query.filter(Listing.id.in_(ids[:500])).count():
+                    print("listings were left behind")
+                    return 1
+            print(f"{n:>8} {results[0]:>22} {results[1]:>22}")
+        if Listing.query.count() != BACKGROUND_LISTINGS or Message.query.count() != BACKGROUND_LISTINGS * 4:
+            print("rows outside the deleted set were touched")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
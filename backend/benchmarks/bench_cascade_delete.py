@@ -0,0 +1,162 @@
+"""Cascade-delete service check: seeds a row in every table that has a foreign
+key, for four scenarios built from the model metadata, deletes two users and a
+listing through cascade_utils, and fails if any row is left pointing at a
+missing parent, if rows of the kept user/listing were lost, or if the listing
+counters drifted. Also prints the statements each delete issued.
+Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_cascade_delete
+"""
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime, timedelta
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+os.environ.pop("REDIS_URL", None)
+
+from sqlalchemy import event, func, select, types  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from cascade_utils import _UNLINKED, delete_listings, delete_users  # noqa: E402
+from counter_utils import reconcile_counters  # noqa: E402
+from models import Listing, ListingNeighbor, ListingDailyStats, SellerDailyStats, User  # noqa: E402
+
+
+def _value(column):
+    t = column.type
+    if isinstance(t, (types.String, types.Text)):
+        return str(uuid.uuid4())
+    if isinstance(t, (types.Integer, types.Numeric, types.Float)):
+        return 1
+    if isinstance(t, types.Boolean):
+        return False
+    if isinstance(t, types.DateTime):
+        return datetime.utcnow()
+    if isinstance(t, types.Date):
+        return date.today()
+    if isinstance(t, types.LargeBinary):
+        return b""
+    raise TypeError(f"no sample value for {column}")
+
+
+def _insert(table, refs):
+    """One row of table with every foreign key pointed at refs[parent table]."""
+    row = {c.name: _value(c) for c in table.columns if not c.nullable or c.foreign_keys}
+    for fk in table.foreign_keys:
+        row[fk.parent.name] = refs[fk.column.table.name]
+    db.session.execute(table.insert(), [row])
+    return row["id"]
+
+
+def _user(name):
+    u = User(email=f"{name}@example.com")
+    db.session.add(u)
+    db.session.flush()
+    return u.id
+
+
+def _listing(owner, buyer=None):
+    lid = _insert(Listing.__table__, {"users": owner})
+    if buyer:
+        db.session.execute(Listing.__table__.update().where(Listing.id == lid).values(buyer_id=buyer))
+    return lid
+
+
+def _seed():
+    gone, gone2, kept, kept2 = _user("gone"), _user("gone2"), _user("kept"), _user("kept2")
+    kept_listing = _listing(kept, buyer=gone)       # survives, but loses its buyer
+    gone_listing = _listing(kept2)                  # deleted directly
+    scenarios = {
+        "user and listing deleted": {"users": gone, "listings": _listing(gone)},
+        "kept": {"users": kept, "listings": kept_listing},
+        "user deleted": {"users": gone2, "listings": kept_listing},
+        "listing deleted": {"users": kept2, "listings": gone_listing},
+    }
+    children = [t for t in db.metadata.sorted_tables if t.foreign_keys and t.name != "listings"]
+    kept_rows = {}
+    for i, (name, refs) in enumerate(scenarios.items()):
+        refs = dict(refs)
+        for table in children:
+            refs[table.name] = _insert(table, refs)
+            if name == "kept":
+                kept_rows[table.name] = refs[table.name]
+        day = date.today() - timedelta(days=i)
+        db.session.add_all([
+            ListingDailyStats(listing_id=refs["listings"], seller_id=refs["users"], day=day, views=1),
+            SellerDailyStats(seller_id=refs["users"], day=day, views=1),
+        ])
+        if refs["listings"] != kept_listing:
+            db.session.add_all([
+                ListingNeighbor(listing_id=refs["listings"], neighbor_id=kept_listing, score=0.5),
+                ListingNeighbor(listing_id=kept_listing, neighbor_id=refs["listings"], score=0.5),
+            ])
+        db.session.flush()
+    db.session.commit()
+    reconcile_counters()
+    return [gone, gone2], gone_listing, {kept, kept2}, kept_listing, kept_rows
+
+
+def _orphans():
+    found = []
+    for table in db.metadata.sorted_tables:
+        for fk in table.foreign_keys:
+            parent = fk.column.table
+            n = db.session.execute(select(func.count()).select_from(table).where(
+                fk.parent.isnot(None), fk.parent.not_in(select(fk.column))
+            )).scalar()
+            if n:
+                found.append(f"{table.name}.{fk.parent.name} -> {parent.name}: {n}")
+    for parent, derived in _UNLINKED.items():
+        parent_ids = select(db.metadata.tables[parent].c.id)
+        for model, cols in derived.items():
+            for col in cols:
+                n = db.session.query(func.count()).select_from(model).filter(
+                    model.__table__.c[col].not_in(parent_ids)
+                ).scalar()
+                if n:
+                    found.append(f"{model.__tablename__}.{col} -> {parent}: {n}")
+    return found
+
+
+def main():
+    statements = [0]
+    failures = []
+    with app.app_context():
+        event.listen(db.engine, "before_cursor_execute", lambda *a: statements.__setitem__(0, statements[0] + 1))
+        user_ids, listing_id, kept, kept_listing, kept_rows = _seed()
+
+        statements[0] = 0
+        delete_listings([listing_id])
+        db.session.commit()
+        print(f"delete_listings: {statements[0]} statements")
+        statements[0] = 0
+        delete_users(user_ids)
+        db.session.commit()
+        print(f"delete_users:    {statements[0]} statements")
+
+        failures += [f"orphan rows in {o}" for o in _orphans()]
+        for table, row_id in kept_rows.items():
+            t = db.metadata.tables[table]
+            if not db.session.execute(select(t.c.id).where(t.c.id == row_id)).first():
+                failures.append(f"kept row in {table} was deleted")
+        listing = db.session.get(Listing, kept_listing)
+        if listing is None or listing.buyer_id is not None:
+            failures.append("kept listing missing or still points at the deleted buyer")
+        if {uid for (uid,) in db.session.query(User.id)} != kept:
+            failures.append("wrong users left")
+        if reconcile_counters():
+            failures.append("listing counters drifted")
+
+    for f in failures:
+        print("FAIL:", f)
+    print("no orphans" if not failures else f"{len(failures)} failures")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
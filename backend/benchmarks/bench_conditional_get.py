@@ -0,0 +1,106 @@
+"""Queries and latency for listing detail / profile GETs: full 200 vs. 304 on
+If-None-Match. Uses a throwaway SQLite database.
+
+Exits non-zero if a 304 costs more than one query of its own (the logged-in
+user load that every authenticated request does is reported separately).
+
+Run from backend/:  python -m benchmarks.bench_conditional_get
+"""
+import os
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+
+from sqlalchemy import event  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from models import Listing, ListingImage, User  # noqa: E402
+
+RUNS = 200
+
+
+class _Queries:
+    def __init__(self):
+        self.statements = []
+
+    def __enter__(self):
+        event.listen(db.engine, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(db.engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, *args):
+        # Server-side session storage isn't part of the endpoint
+        if "sessions" not in statement:
+            self.statements.append(statement)
+
+
+def _seed():
+    seller = User(email="seller@example.com", display_name="Seller")
+    viewer = User(email="viewer@example.com", display_name="Viewer")
+    seller.set_password("pw")
+    viewer.set_password("pw")
+    db.session.add_all([seller, viewer])
+    db.session.commit()
+    for i in range(20):
+        l = Listing(user_id=seller.id, title=f"Item {i}", price_cents=1000, category="other",
+                    condition="used", pickup_or_shipping="pickup")
+        db.session.add(l)
+        db.session.flush()
+        db.session.add(ListingImage(listing_id=l.id, image_url=f"/img/{i}.jpg"))
+    db.session.commit()
+    return seller.id, l.id
+
+
+def _measure(client, url):
+    first = client.get(url)
+    etag = first.headers["ETag"]
+    results = {}
+    for label, headers in (("200", {}), ("304", {"If-None-Match": etag})):
+        with app.app_context(), _Queries() as q:
+            resp = client.get(url, headers=headers)
+        assert resp.status_code == int(label), (url, resp.status_code)
+        started = time.perf_counter()
+        for _ in range(RUNS):
+            client.get(url, headers=headers)
+        results[label] = (len(q.statements), (time.perf_counter() - started) / RUNS * 1000, q.statements)
+    return results
+
+
+def main():
+    with app.app_context():
+        seller_id, listing_id = _seed()
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+
+    anon = app.test_client()
+    viewer = app.test_client()
+    viewer.post("/api/auth/login", json={"email": "viewer@example.com", "password": "pw"})
+
+    failed = False
+    for name, client, url, auth_queries in (
+        ("listing (anonymous)", anon, f"/api/listings/{listing_id}", 0),
+        ("listing (logged in)", viewer, f"/api/listings/{listing_id}", 1),
+        ("profile (logged in)", viewer, f"/api/users/{seller_id}/profile", 1),
+    ):
+        r = _measure(client, url)
+        own = r["304"][0] - auth_queries
+        print(f"{name:<20} 200: {r['200'][0]:>2} queries {r['200'][1]:6.2f}ms   "
+              f"304: {r['304'][0]:>2} queries ({own} + {auth_queries} user load) {r['304'][1]:6.2f}ms")
+        if own > 1:
+            failed = True
+            print("  304 ran:", *r["304"][2], sep="\n    ")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,111 @@
+"""Feed image bytes: what a client downloads (and has to decode) for the card
+images of one feed page, using each card's full image (before) vs. its
+"thumbnail" rendition (after). Listings get 12MP photos through the real upload
+route; a few have their renditions removed and rebuilt by build_renditions, as
+for images uploaded before renditions existed. Fails if a card has no
+thumbnail, a thumbnail is larger than its rendition size, or the page doesn't
+get smaller. Uses a throwaway SQLite database and blob directory.
+
+Run from backend/:  python -m benchmarks.bench_feed_image_bytes [per_page]
+"""
+import io
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_db_dir, "uploads")
+os.environ.pop("REDIS_URL", None)
+
+from PIL import Image  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from image_utils import RENDITIONS  # noqa: E402
+from models import Listing, ListingImage, ListingImageRendition, User  # noqa: E402
+from rendition_utils import build_renditions  # noqa: E402
+from benchmarks.bench_image_pipeline import _make_corpus  # noqa: E402
+
+CORPUS = 5          # distinct photos, cycled over the listings
+REBUILT = 3         # listings whose renditions come from build_renditions
+
+
+def _fetch(client, url):
+    resp = client.get(url)
+    data = resp.get_data()
+    return resp.status_code, len(data), Image.open(io.BytesIO(data)).size if resp.status_code == 200 else (0, 0)
+
+
+def main(per_page=20):
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    app.config["IMAGE_WORKERS"] = 1
+    photos = []
+    for path in _make_corpus(tempfile.mkdtemp(), CORPUS):
+        with open(path, "rb") as fh:
+            photos.append(fh.read())
+
+    with app.app_context():
+        seller = User(email="seller@example.com")
+        db.session.add(seller)
+        db.session.commit()
+        seller_id = seller.id
+        listings = [Listing(user_id=seller_id, title=f"Item {i}", price_cents=1000 + i, category="other",
+                            condition="used", pickup_or_shipping="pickup") for i in range(per_page)]
+        db.session.add_all(listings)
+        db.session.commit()
+        listing_ids = [l.id for l in listings]
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = seller_id
+        s["_fresh"] = True
+
+    failures = []
+    for i, lid in enumerate(listing_ids):
+        resp = client.post(f"/api/listings/{lid}/images", data={"files": [(io.BytesIO(photos[i % CORPUS]), "p.jpg")]},
+                           content_type="multipart/form-data")
+        if resp.status_code != 201:
+            failures.append(f"upload for listing {i} returned {resp.status_code}")
+    with app.app_context():
+        image_ids = [i for (i,) in db.session.query(ListingImage.id).filter(
+            ListingImage.listing_id.in_(listing_ids[:REBUILT])
+        )]
+        ListingImageRendition.query.filter(ListingImageRendition.image_id.in_(image_ids)).delete()
+        db.session.commit()
+        rebuilt = build_renditions()
+    if rebuilt != REBUILT:
+        failures.append(f"build_renditions rebuilt {rebuilt} image(s), expected {REBUILT}")
+
+    cards = client.get(f"/api/listings?per_page={per_page}").get_json()["listings"]
+    totals = {"full": [0, 0], "thumbnail": [0, 0]}
+    for card in cards:
+        if not card.get("thumbnail"):
+            failures.append(f"{card['id']}: no thumbnail")
+            continue
+        for label, url in (("full", card["images"][0]), ("thumbnail", card["thumbnail"])):
+            status, size, (w, h) = _fetch(client, url)
+            if status != 200:
+                failures.append(f"{url}: {status}")
+            totals[label][0] += size
+            totals[label][1] += w * h
+            if label == "thumbnail" and max(w, h) > RENDITIONS["card"]:
+                failures.append(f"{url}: {w}x{h} is larger than the card rendition")
+
+    print(f"{len(cards)} cards per page")
+    print(f"{'images':<10} {'bytes/page':>11} {'pixels to decode':>17}")
+    for label, (size, pixels) in totals.items():
+        print(f"{label:<10} {size / 1024:9.0f}KB {pixels / 1e6:15.1f}MP")
+    if totals["thumbnail"][0] >= totals["full"][0]:
+        failures.append("thumbnails are not smaller than the full images")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,50 @@
+"""Fuzzy search latency at scale for the in-process TrigramIndex.
+
+Run from backend/:  python -m benchmarks.bench_fuzzy_search [listing_count]
+"""
+import random
+import sys
+import time
+import uuid
+
+from search_utils import TrigramIndex
+
+BRANDS = ["iphone", "samsung", "playstation", "nintendo", "nike", "adidas", "ikea", "dyson",
+          "canon", "nikon", "lego", "fender", "yamaha", "bose", "sony", "dell", "lenovo", "trek"]
+ITEMS = ["charger", "console", "bicycle", "sneakers", "table", "chair", "camera", "lens", "guitar",
+         "speaker", "laptop", "monitor", "vacuum", "jacket", "headphones", "desk", "lamp", "set"]
+EXTRAS = ["vintage", "new", "used", "mint", "black", "white", "large", "small", "pro", "max", "mini"]
+QUERIES = ["iphnoe charger", "playstaton", "nikke sneakrs", "bicylce", "yamah guitar", "headphnes", "lamp"]
+
+
+def _title(rng):
+    words = [rng.choice(EXTRAS), rng.choice(BRANDS), rng.choice(ITEMS)]
+    if rng.random() < 0.5:
+        words.append(str(rng.randint(1, 999)))
+    return " ".join(words)
+
+
+def main(n=100_000):
+    rng = random.Random(42)
+    index = TrigramIndex()
+    started = time.perf_counter()
+    for _ in range(n):
+        index.add(str(uuid.uuid4()), _title(rng))
+    build = time.perf_counter() - started
+    print(f"listings={n} build={build:.2f}s vocab={len(index.vocab)} trigrams={len(index.postings)}")
+
+    for q in QUERIES:
+        runs = 20
+        started = time.perf_counter()
+        for _ in range(runs):
+            hits = index.search(q)
+        search_ms = (time.perf_counter() - started) / runs * 1000
+        started = time.perf_counter()
+        for _ in range(runs):
+            suggestion = " ".join(index.correct(t) or t for t in q.split())
+        suggest_ms = (time.perf_counter() - started) / runs * 1000
+        print(f"{q!r:18} search={search_ms:6.1f}ms hits={len(hits):3} suggest={suggest_ms:5.2f}ms -> {suggestion!r}")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000)
@@ -0,0 +1,82 @@
+"""Nearby-listing query cost as the table grows: geohash ranges vs. the old
+unindexed lat/lng bounding box. Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_geo_query
+"""
+import math
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Listing, User  # noqa: E402
+from geo_utils import apply_radius_filter, distance_key, geohash_encode  # noqa: E402
+
+SIZES = [10_000, 50_000, 100_000, 200_000]
+ORIGIN = (40.73, -73.99)
+RADIUS_KM = 10
+RUNS = 20
+
+
+def _insert(n, user_id, rng):
+    rows = []
+    for _ in range(n):
+        # Listings spread over the continental US
+        lat, lng = rng.uniform(25, 49), rng.uniform(-124, -67)
+        rows.append({
+            "id": str(uuid.uuid4()), "user_id": user_id, "title": "item", "price_cents": 100,
+            "category": "other", "condition": "used", "pickup_or_shipping": "pickup",
+            "is_sold": False, "is_draft": False, "created_at": datetime.utcnow(),
+            "lat": lat, "lng": lng, "geohash": geohash_encode(lat, lng),
+        })
+    db.session.execute(Listing.__table__.insert(), rows)
+    db.session.commit()
+
+
+def _time(fn):
+    started = time.perf_counter()
+    for _ in range(RUNS):
+        fn()
+    return (time.perf_counter() - started) / RUNS * 1000
+
+
+def main():
+    rng = random.Random(7)
+    lat, lng = ORIGIN
+    with app.app_context():
+        user = User(email="bench@example.com")
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+        total = 0
+        for size in SIZES:
+            _insert(size - total, user_id, rng)
+            total = size
+
+            def indexed():
+                q = apply_radius_filter(Listing.query, lat, lng, RADIUS_KM)
+                return q.order_by(distance_key(lat, lng)).limit(20).all()
+
+            def bbox():
+                lat_delta = RADIUS_KM / 111.0
+                lng_delta = RADIUS_KM / (111.0 * max(math.cos(math.radians(lat)), 0.01))
+                return Listing.query.filter(
+                    Listing.lat.between(lat - lat_delta, lat + lat_delta),
+                    Listing.lng.between(lng - lng_delta, lng + lng_delta),
+                ).limit(20).all()
+
+            print(f"listings={size:>7} geohash={_time(indexed):6.2f}ms bbox_scan={_time(bbox):6.2f}ms")
+            db.session.expunge_all()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
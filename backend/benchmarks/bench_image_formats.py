@@ -0,0 +1,123 @@
+"""Image formats: total bytes and encode CPU per format (image_utils.FORMATS)
+for every stored size of a corpus of 12MP photos, each decoded once as at
+upload. Then checks Accept negotiation end to end through the upload route and
+GET /api/listings/image/<id>. Fails if a modern format isn't smaller than JPEG,
+a client gets a format it didn't name, or a response lacks Vary: Accept.
+Uses a throwaway SQLite database and blob directory.
+
+Run from backend/:  python -m benchmarks.bench_image_formats [images]
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_db_dir, "uploads")
+os.environ.pop("REDIS_URL", None)
+
+from PIL import Image  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from image_utils import FORMATS, FULL_SIZE, RENDITIONS, _decode, _encode  # noqa: E402
+from models import Listing, User  # noqa: E402
+from benchmarks.bench_image_pipeline import _make_corpus  # noqa: E402
+
+# Accept header -> format a client sending it must get, when every format is stored
+NEGOTIATION = [
+    ("image/avif,image/webp,image/apng,image/*,*/*;q=0.8", "image/avif"),    # Chrome
+    ("image/webp,*/*", "image/webp"),                                         # older Firefox
+    ("image/png,image/svg+xml,image/*;q=0.8,video/*;q=0.8,*/*;q=0.5", "image/jpeg"),  # older Safari
+    ("*/*", "image/jpeg"),
+    (None, "image/jpeg"),
+]
+
+
+def _sizes(img):
+    out = {"full": img}
+    for name, size in sorted(RENDITIONS.items(), key=lambda r: -r[1]):
+        img = img.copy()
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)
+        out[name] = img
+    return out
+
+
+def _check_negotiation(photo, failures):
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    with app.app_context():
+        seller = User(email="seller@example.com")
+        db.session.add(seller)
+        db.session.commit()
+        listing = Listing(user_id=seller.id, title="Bike", price_cents=1000, category="other",
+                          condition="used", pickup_or_shipping="pickup")
+        db.session.add(listing)
+        db.session.commit()
+        seller_id, lid = seller.id, listing.id
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = seller_id
+        s["_fresh"] = True
+    url = client.post(f"/api/listings/{lid}/images", data={"files": [(io.BytesIO(photo), "p.jpg")]},
+                      content_type="multipart/form-data").get_json()["images"][0]
+
+    print(f"\n{'Accept':<62} {'size':<6} {'served':<11} {'bytes':>7}")
+    for accept, expected in NEGOTIATION:
+        if expected not in FORMATS:
+            expected = "image/webp" if "image/webp" in (accept or "") and "image/webp" in FORMATS else "image/jpeg"
+        for size in ("full", "card", "thumb"):
+            resp = client.get(f"{url}?size={size}", headers={"Accept": accept} if accept else {})
+            body = resp.get_data()
+            print(f"{accept or '(none)':<62} {size:<6} {resp.mimetype:<11} {len(body):>7}")
+            if resp.status_code != 200 or resp.mimetype != expected:
+                failures.append(f"Accept {accept!r} size {size}: got {resp.status_code} {resp.mimetype}, "
+                                f"expected {expected}")
+            if "Accept" not in resp.vary:
+                failures.append(f"Accept {accept!r} size {size}: no Vary: Accept")
+            if resp.status_code == 200 and Image.open(io.BytesIO(body)).format != FORMATS[expected][0]:
+                failures.append(f"Accept {accept!r} size {size}: body isn't {FORMATS[expected][0]}")
+
+
+def main(n=6):
+    paths = _make_corpus(tempfile.mkdtemp(), n)
+    photos = []
+    for path in paths:
+        with open(path, "rb") as fh:
+            photos.append(fh.read())
+
+    totals = {mime: {"full": 0, **{name: 0 for name in RENDITIONS}, "cpu": 0.0} for mime in FORMATS}
+    for data in photos:
+        sized = _sizes(_decode(data, FULL_SIZE))
+        for mime in FORMATS:
+            for name, img in sized.items():
+                started = time.process_time()
+                totals[mime][name] += len(_encode(img, mime, 85))
+                totals[mime]["cpu"] += time.process_time() - started
+
+    jpeg = totals["image/jpeg"]
+    names = ["full", *RENDITIONS]
+    print(f"{n} photos; bytes summed over the corpus, encode CPU per photo (all sizes)")
+    print(f"{'format':<11}" + "".join(f"{name:>10}" for name in names) + f"{'total':>10} {'vs JPEG':>8} {'CPU':>8}")
+    failures = []
+    for mime, t in totals.items():
+        total = sum(t[name] for name in names)
+        ratio = total / sum(jpeg[name] for name in names)
+        print(f"{mime:<11}" + "".join(f"{t[name] / 1024:8.0f}KB" for name in names)
+              + f"{total / 1024:8.0f}KB {ratio:7.0%} {t['cpu'] / n * 1000:6.0f}ms")
+        if mime != "image/jpeg" and ratio >= 1:
+            failures.append(f"{mime} is not smaller than JPEG")
+
+    _check_negotiation(photos[0], failures)
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
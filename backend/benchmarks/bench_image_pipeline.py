@@ -0,0 +1,155 @@
+"""Image upload pipeline: the old serial path (temp file, full-size decode,
+LANCZOS, re-encode, read back, one file at a time) vs. render_images (in
+memory, JPEG draft-mode decode, process pool, and the smaller renditions from
+the same decode) over a corpus of 12MP phone-sized JPEGs, some with an EXIF
+rotation. Each variant runs in a fresh interpreter so the peak RSS figures
+don't bleed into each other. Peaks are each process's VmHWM from /proc (Linux
+only; ru_maxrss survives exec, so a child would report the corpus generator's
+peak), read for pool workers before the pool shuts down. Fails if an output isn't a correctly oriented max_size JPEG, or if the
+pipeline isn't faster than before.
+
+Run from backend/:  python -m benchmarks.bench_image_pipeline [images] [workers]
+"""
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from PIL import Image, ImageOps
+
+import image_utils
+
+WIDTH, HEIGHT = 4000, 3000
+MAX_SIZE = 1200
+
+
+def _make_corpus(directory, n):
+    """Gradients plus sensor-like noise, so the JPEGs are about the size a phone writes."""
+    base = Image.merge("RGB", (
+        Image.linear_gradient("L").resize((WIDTH, HEIGHT)),
+        Image.linear_gradient("L").rotate(90).resize((WIDTH, HEIGHT)),
+        Image.radial_gradient("L").resize((WIDTH, HEIGHT)),
+    ))
+    noise = Image.effect_noise((WIDTH, HEIGHT), 40).convert("RGB")
+    paths = []
+    for i in range(n):
+        img = Image.blend(base, noise, 0.15 + 0.02 * i)
+        exif = Image.Exif()
+        exif[0x0112] = 6 if i % 3 == 0 else 1       # every third shot was taken in portrait
+        path = os.path.join(directory, f"photo{i}.jpg")
+        img.save(path, "JPEG", quality=92, exif=exif)
+        paths.append(path)
+    return paths
+
+
+def _old_compress(file_path, max_size=MAX_SIZE, quality=85):
+    """compress_image as it was before the pipeline: full-size decode, in place on disk."""
+    img = Image.open(file_path)
+    img = ImageOps.exif_transpose(img)
+    if max(img.size) > max_size:
+        ratio = max_size / max(img.size)
+        img = img.resize((int(img.size[0] * ratio), int(img.size[1] * ratio)), Image.Resampling.LANCZOS)
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+    img.save(file_path, "JPEG", quality=quality, optimize=True)
+
+
+def _serial(blobs):
+    out = []
+    for data in blobs:
+        with tempfile.NamedTemporaryFile(suffix=".jpg", delete=False) as tmp:
+            tmp_path = tmp.name
+            tmp.write(data)
+        _old_compress(tmp_path)
+        with open(tmp_path, "rb") as fh:
+            out.append(fh.read())
+        os.unlink(tmp_path)
+    return out
+
+
+def _peak_kb(pid):
+    with open(f"/proc/{pid}/status") as fh:
+        for line in fh:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1])
+    return 0
+
+
+def _run(variant, paths, workers):
+    """Runs in the child interpreter: time one variant and report its memory."""
+    blobs = []
+    for p in paths:
+        with open(p, "rb") as fh:
+            blobs.append(fh.read())
+    started = time.perf_counter()
+    if variant == "serial":
+        out = _serial(blobs)
+    else:
+        # JPEG only, like the old path; bench_image_formats covers the cost of the other formats
+        out = [r["full"]["image/jpeg"] for r in image_utils.render_images(
+            blobs, workers, max_size=MAX_SIZE, mimes=["image/jpeg"],
+        )]
+    wall = time.perf_counter() - started
+
+    worker_peaks = []
+    if image_utils._pool is not None:
+        worker_peaks = [_peak_kb(pid) for pid in image_utils._pool._processes]
+        image_utils._pool.shutdown()
+    sizes = [Image.open(io.BytesIO(b)).size for b in out]
+    formats = [Image.open(io.BytesIO(b)).format for b in out]
+    print(json.dumps({
+        "wall": wall, "parent_kb": _peak_kb("self"),
+        "worker_kb": worker_peaks, "sizes": sizes, "formats": formats, "bytes": sum(map(len, out)),
+    }))
+
+
+def main(n=10, workers=None):
+    workers = workers or min(4, os.cpu_count() or 1)
+    corpus = tempfile.mkdtemp()
+    paths = _make_corpus(corpus, n)
+    mb = sum(os.path.getsize(p) for p in paths) / 1e6
+    print(f"{n} images, {WIDTH}x{HEIGHT}, {mb:.1f}MB total; {workers} workers on {os.cpu_count()} CPUs")
+
+    results = {}
+    for variant, w in (("serial", 1), ("pipeline", 1), ("pipeline", workers)):
+        label = variant if variant == "serial" else f"pipeline/{w}"
+        if label in results:
+            continue
+        proc = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_image_pipeline", "--run", variant, str(w), *paths],
+            capture_output=True, text=True, check=True,
+        )
+        results[label] = json.loads(proc.stdout.strip().splitlines()[-1])
+
+    print(f"{'variant':<12} {'wall':>8} {'per image':>10} {'parent RSS':>11} {'worker RSS':>11} {'total RSS':>10}")
+    for label, r in results.items():
+        worker_total = sum(r["worker_kb"])
+        print(f"{label:<12} {r['wall']:7.2f}s {r['wall'] / n * 1000:8.0f}ms "
+              f"{r['parent_kb'] / 1024:9.0f}MB {worker_total / 1024:9.0f}MB "
+              f"{(r['parent_kb'] + worker_total) / 1024:8.0f}MB")
+
+    failures = []
+    expected = [(MAX_SIZE * HEIGHT // WIDTH, MAX_SIZE) if i % 3 == 0 else (MAX_SIZE, MAX_SIZE * HEIGHT // WIDTH)
+                for i in range(n)]
+    for label, r in results.items():
+        if [tuple(s) for s in r["sizes"]] != expected:
+            failures.append(f"{label}: output sizes {r['sizes']}")
+        if set(r["formats"]) != {"JPEG"}:
+            failures.append(f"{label}: output formats {set(r['formats'])}")
+    best = min(r["wall"] for label, r in results.items() if label != "serial")
+    if best >= results["serial"]["wall"]:
+        failures.append(f"pipeline {best:.2f}s is no faster than serial {results['serial']['wall']:.2f}s")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["--run"]:
+        _run(sys.argv[2], sys.argv[4:], int(sys.argv[3]))
+    else:
+        sys.exit(main(*(int(a) for a in sys.argv[1:])))
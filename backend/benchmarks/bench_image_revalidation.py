@@ -0,0 +1,127 @@
+"""Image revalidation: what a repeat view of a feed page's images costs once the
+browser's copy has expired, before (bare URLs, max-age only) vs. after (hashed
+URLs cached as immutable, ETag + If-None-Match on bare URLs). Counts requests,
+body bytes and SQL statements. A browser never re-requests an immutable
+response, so a repeat view of hashed URLs costs nothing. Fails if a hashed URL
+isn't immutable, a wrong digest or a missing rendition is, a revalidation
+isn't an empty 304, or an avatar's URL doesn't change with a new picture. Uses
+a throwaway SQLite database and blob directory.
+
+Run from backend/:  python -m benchmarks.bench_image_revalidation [images]
+"""
+import io
+import os
+import sys
+import tempfile
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ["UPLOAD_FOLDER"] = os.path.join(_db_dir, "uploads")
+os.environ.pop("REDIS_URL", None)
+
+from PIL import Image  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from models import Listing, ListingImageRendition, User  # noqa: E402
+
+PER_LISTING = 5     # photo limit for a non-Pro seller
+
+_statements = []
+
+
+def _photo(i):
+    buf = io.BytesIO()
+    Image.new("RGB", (800, 600), (i * 40 % 256, 90, 160)).save(buf, "JPEG")
+    return buf.getvalue()
+
+
+def _view(client, urls, etags=None):
+    """(requests, body bytes, SQL statements) for fetching urls; etags makes them conditional."""
+    del _statements[:]
+    sent = 0
+    for url in urls:
+        headers = {"If-None-Match": etags[url]} if etags else {}
+        sent += len(client.get(url, headers=headers).get_data())
+    return len(urls), sent, len(_statements)
+
+
+def main(n=20):
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    app.config["IMAGE_WORKERS"] = 1
+    with app.app_context():
+        seller = User(email="seller@example.com")
+        db.session.add(seller)
+        db.session.commit()
+        listings = [Listing(user_id=seller.id, title=f"Item {i}", price_cents=1000, category="other",
+                            condition="used", pickup_or_shipping="pickup") for i in range(0, n, PER_LISTING)]
+        db.session.add_all(listings)
+        db.session.commit()
+        seller_id, listing_ids = seller.id, [l.id for l in listings]
+        event.listen(db.engine, "before_cursor_execute", lambda *args: _statements.append(args[2]))
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = seller_id
+        s["_fresh"] = True
+
+    failures = []
+    hashed = []
+    for start, lid in zip(range(0, n, PER_LISTING), listing_ids):
+        hashed += client.post(f"/api/listings/{lid}/images", content_type="multipart/form-data", data={
+            "files": [(io.BytesIO(_photo(i)), f"p{i}.jpg") for i in range(start, min(start + PER_LISTING, n))],
+        }).get_json()["images"]
+    bare = [url.rsplit("/", 1)[0] for url in hashed]
+
+    for url in hashed:
+        cc = client.get(url).headers.get("Cache-Control", "")
+        if "immutable" not in cc or "max-age=31536000" not in cc:
+            failures.append(f"{url}: Cache-Control {cc!r}")
+    # A digest that isn't the image's, or a size whose rendition isn't stored yet, may answer
+    # differently later, so neither may be cached as immutable
+    with app.app_context():
+        db.session.execute(ListingImageRendition.__table__.delete().where(
+            ListingImageRendition.image_id == bare[0].rsplit("/", 1)[1], ListingImageRendition.size == "card",
+        ))
+        db.session.commit()
+    for url in (f"{bare[1]}/{'0' * 16}", f"{hashed[0]}?size=card"):
+        if "immutable" in client.get(url).headers.get("Cache-Control", ""):
+            failures.append(f"{url} is immutable")
+    etags = {url: client.get(url).headers.get("ETag") for url in bare}
+    if not all(etags.values()):
+        failures.append("a bare image URL has no ETag")
+
+    rows = [
+        ("bare, max-age expired", _view(client, bare)),
+        ("bare, If-None-Match", _view(client, bare, etags)),
+        ("hashed, immutable", (0, 0, 0)),
+    ]
+    if rows[1][1][1]:
+        failures.append(f"revalidating with If-None-Match sent {rows[1][1][1]} body bytes")
+
+    avatars = []
+    for i in range(2):
+        avatars.append(client.post("/api/auth/avatar", content_type="multipart/form-data", data={
+            "file": (io.BytesIO(_photo(i)), "a.jpg"),
+        }).get_json()["avatar_url"])
+    if avatars[0] == avatars[1]:
+        failures.append("avatar URL didn't change with the picture")
+    elif "immutable" in client.get(avatars[0]).headers.get("Cache-Control", ""):
+        failures.append("a replaced avatar's URL is still immutable")
+
+    print(f"repeat view of {n} images after the browser's copy expires")
+    print(f"{'URLs':<24} {'requests':>8} {'body bytes':>11} {'SQL':>5}")
+    for label, (requests, sent, statements) in rows:
+        print(f"{label:<24} {requests:>8} {sent:>11} {statements:>5}")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,118 @@
+"""Price-drop fan-out: latency of the seller's PUT /api/listings/<id> and time
+until every observer's email and push went out, for growing observer counts.
+Resend and web push are replaced by a fixed SEND_LATENCY_MS sleep so no real
+messages leave the machine. Fails if notifications or sends go missing, or if
+the PUT stops being flat. Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_price_drop_fanout [observers ...]
+"""
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+os.environ.pop("REDIS_URL", None)
+
+import notify_utils  # noqa: E402
+import push_utils  # noqa: E402
+from app import app  # noqa: E402
+from extensions import db, limiter  # noqa: E402
+from models import Listing, Notification, Observing, PushSubscription, User  # noqa: E402
+
+SEND_LATENCY_MS = 20
+MAX_PUT_MS = 250
+
+_sent = {"email": 0, "push": 0}
+_sent_lock = threading.Lock()
+
+
+def _fake_send(kind):
+    def send(*args, **kwargs):
+        time.sleep(SEND_LATENCY_MS / 1000)
+        with _sent_lock:
+            _sent[kind] += 1
+    return send
+
+
+def _seed(seller_id, n):
+    now = datetime.utcnow()
+    lid = str(uuid.uuid4())
+    db.session.execute(Listing.__table__.insert(), [{
+        "id": lid, "user_id": seller_id, "title": "Bike", "price_cents": 10000, "category": "other",
+        "condition": "used", "pickup_or_shipping": "pickup", "is_sold": False, "is_draft": False,
+        "created_at": now,
+    }])
+    users = [{"id": str(uuid.uuid4()), "email": f"{uuid.uuid4().hex}@example.com", "created_at": now}
+             for _ in range(n)]
+    if users:
+        db.session.execute(User.__table__.insert(), users)
+        db.session.execute(Observing.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "user_id": u["id"], "listing_id": lid, "created_at": now} for u in users
+        ])
+        db.session.execute(PushSubscription.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "user_id": u["id"], "endpoint": f"https://push.example/{u['id']}",
+             "p256dh": "k", "auth": "a", "created_at": now} for u in users
+        ])
+    db.session.commit()
+    return lid
+
+
+def main(*sizes):
+    sizes = sizes or (10, 100, 500)
+    limiter.enabled = False
+    # SQLite hands back naive datetimes, which the last_seen hook can't compare
+    app.before_request_funcs[None] = [
+        f for f in app.before_request_funcs[None] if f.__name__ != "_update_last_seen"
+    ]
+    app.config["VAPID_PRIVATE_KEY"] = "bench"
+    notify_utils.send_price_drop_alert = _fake_send("email")
+    push_utils.webpush = _fake_send("push")
+
+    with app.app_context():
+        seller = User(email="seller@example.com")
+        db.session.add(seller)
+        db.session.commit()
+        seller_id = seller.id
+    client = app.test_client()
+    with client.session_transaction() as s:
+        s["_user_id"] = seller_id
+        s["_fresh"] = True
+
+    failures = []
+    print(f"{'observers':>9} {'PUT':>10} {'delivered':>10}  (concurrency {app.config['FANOUT_CONCURRENCY']})")
+    for n in sizes:
+        with app.app_context():
+            lid = _seed(seller_id, n)
+        _sent["email"] = _sent["push"] = 0
+        started = time.perf_counter()
+        resp = client.put(f"/api/listings/{lid}", json={"price_cents": 8000})
+        put_ms = (time.perf_counter() - started) * 1000
+        while (_sent["email"] < n or _sent["push"] < n) and time.perf_counter() - started < 300:
+            time.sleep(0.01)
+        delivered_s = time.perf_counter() - started
+        print(f"{n:>9} {put_ms:8.1f}ms {delivered_s:9.2f}s")
+
+        with app.app_context():
+            notes = Notification.query.filter_by(listing_id=lid).count()
+        if resp.status_code != 200:
+            failures.append(f"{n}: PUT returned {resp.status_code}")
+        if notes != n:
+            failures.append(f"{n}: {notes} notifications for {n} observers")
+        if _sent["email"] != n or _sent["push"] != n:
+            failures.append(f"{n}: sent {_sent['email']} emails and {_sent['push']} pushes")
+        if put_ms > MAX_PUT_MS:
+            failures.append(f"{n}: PUT took {put_ms:.0f}ms")
+
+    for f in failures:
+        print("FAIL:", f)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,77 @@
+"""Similar-listings index: full rebuild time and per-listing incremental cost.
+Uses a throwaway SQLite database.
+
+Run from backend/:  python -m benchmarks.bench_similar_index [listing_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Listing, ListingNeighbor, User  # noqa: E402
+from similar_utils import index_listing, rebuild_similarity_index  # noqa: E402
+
+CATEGORIES = ["electronics", "clothing", "furniture", "sports", "toys", "home", "other"]
+
+
+def _words(rng, n):
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(n)]
+
+
+def _seed(n, rng):
+    user = User(email="bench@example.com")
+    db.session.add(user)
+    db.session.commit()
+    # A few hundred common title words, a long tail of description words
+    brands, items, extras, prose = _words(rng, 300), _words(rng, 500), _words(rng, 60), _words(rng, 5000)
+    rows = []
+    for _ in range(n):
+        words = [rng.choice(extras), rng.choice(brands), rng.choice(items), str(rng.randint(1, 500))]
+        rows.append({
+            "id": str(uuid.uuid4()), "user_id": user.id, "title": " ".join(words),
+            "description": " ".join(rng.choice(prose) for _ in range(rng.randint(5, 30))),
+            "price_cents": rng.randint(500, 100_000), "category": rng.choice(CATEGORIES),
+            "condition": "used", "pickup_or_shipping": "pickup", "is_sold": False, "is_draft": False,
+            "created_at": datetime.utcnow(), "lat": rng.uniform(40, 41), "lng": rng.uniform(-74, -73),
+        })
+    for i in range(0, n, 10_000):
+        db.session.execute(Listing.__table__.insert(), rows[i:i + 10_000])
+    db.session.commit()
+    return [r["id"] for r in rows]
+
+
+def main(n=100_000):
+    rng = random.Random(11)
+    with app.app_context():
+        ids = _seed(n, rng)
+
+        started = time.perf_counter()
+        indexed = rebuild_similarity_index()
+        print(f"rebuild: {indexed:,} listings in {time.perf_counter() - started:.1f}s, "
+              f"{ListingNeighbor.query.count():,} neighbor rows")
+
+        sample = rng.sample(ids, 50)
+        started = time.perf_counter()
+        for lid in sample:
+            index_listing(lid)
+        print(f"incremental index_listing: {(time.perf_counter() - started) / len(sample) * 1000:.1f}ms per listing")
+
+        client = app.test_client()
+        started = time.perf_counter()
+        for lid in sample:
+            client.get(f"/api/listings/{lid}/similar")
+        print(f"GET /similar: {(time.perf_counter() - started) / len(sample) * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
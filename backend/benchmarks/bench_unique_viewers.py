@@ -0,0 +1,41 @@
+"""Accuracy of the HyperLogLog unique-viewer sketch against exact counts.
+
+Checks that estimates stay within the documented bound (two standard errors,
+~95% of trials) across cardinalities and exits non-zero if they don't.
+
+Run from backend/:  python -m benchmarks.bench_unique_viewers [trials]
+"""
+import sys
+import time
+import uuid
+
+from sketch_utils import HyperLogLog, HLL_STD_ERROR
+
+CARDINALITIES = [10, 100, 1_000, 10_000, 100_000]
+REPEATS_PER_VIEWER = 3      # refreshes must not inflate the estimate
+
+
+def main(trials=40):
+    failed = False
+    print(f"sketch size {len(HyperLogLog().to_bytes())} bytes, std error {HLL_STD_ERROR:.2%}")
+    for n in CARDINALITIES:
+        errors = []
+        started = time.perf_counter()
+        for _ in range(trials if n <= 10_000 else max(trials // 8, 3)):
+            sketch = HyperLogLog()
+            for _ in range(n):
+                key = f"u:{uuid.uuid4()}"
+                for _ in range(REPEATS_PER_VIEWER):
+                    sketch.add(key)
+            errors.append(abs(sketch.count() - n) / n)
+        within = sum(e <= 2 * HLL_STD_ERROR for e in errors) / len(errors)
+        elapsed = (time.perf_counter() - started) / len(errors) / (n * REPEATS_PER_VIEWER) * 1e6
+        print(f"n={n:>7}  mean err {sum(errors) / len(errors):6.2%}  max err {max(errors):6.2%}  "
+              f"within 2σ {within:5.0%}  add {elapsed:.2f}µs")
+        if within < 0.85:
+            failed = True
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
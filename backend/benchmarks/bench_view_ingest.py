@@ -0,0 +1,71 @@
+"""View tracking throughput: one INSERT + commit per view (the old track_view)
+vs. the buffered path in view_utils. Uses a throwaway SQLite database and the
+in-process buffer.
+
+Run from backend/:  python -m benchmarks.bench_view_ingest [view_count]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime
+
+_db_dir = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_db_dir, 'bench.db')}"
+os.environ.setdefault("UPLOAD_FOLDER", os.path.join(_db_dir, "uploads"))
+os.environ.pop("REDIS_URL", None)
+
+from app import app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import Listing, ListingView, User  # noqa: E402
+from view_utils import flush_views, record_view  # noqa: E402
+
+LISTINGS = 1000
+
+
+def _seed():
+    user = User(email="bench@example.com")
+    db.session.add(user)
+    db.session.commit()
+    ids = [str(uuid.uuid4()) for _ in range(LISTINGS)]
+    db.session.execute(Listing.__table__.insert(), [{
+        "id": lid, "user_id": user.id, "title": "item", "price_cents": 100, "category": "other",
+        "condition": "used", "pickup_or_shipping": "pickup", "is_sold": False, "is_draft": False,
+        "created_at": datetime.utcnow(),
+    } for lid in ids])
+    db.session.commit()
+    return ids
+
+
+def _per_view(targets):
+    for lid in targets:
+        l = db.session.get(Listing, lid)
+        db.session.add(ListingView(listing_id=l.id))
+        l.view_count += 1
+        db.session.commit()
+
+
+def _buffered(targets):
+    for lid in targets:
+        record_view(lid, key="a:bench")
+    while flush_views():
+        pass
+
+
+def main(n=20_000):
+    rng = random.Random(3)
+    with app.app_context():
+        ids = _seed()
+        targets = [rng.choice(ids) for _ in range(n)]
+        for name, fn in (("per-view commit", _per_view), ("buffered", _buffered)):
+            started = time.perf_counter()
+            fn(targets)
+            elapsed = time.perf_counter() - started
+            print(f"{name:>16}: {n / elapsed:10,.0f} views/sec")
+        print(f"rows written: {ListingView.query.count():,}")
+
+
+if __name__ == "__main__":
+    sys.exit(main(*(int(a) for a in sys.argv[1:])))
@@ -0,0 +1,213 @@
+import os
+import time
+import hashlib
+import tempfile
+from itertools import islice
+
+from flask import send_file
+from sqlalchemy import bindparam, func, literal, select, update
+
+from extensions import db
+from models import ListingImage, ListingImageRendition, User
+
+MIGRATE_BATCH = 100
+SWEEP_BATCH = 500
+SWEEP_GRACE_SECONDS = 3600          # younger blobs may belong to an upload that hasn't committed yet
+URL_DIGEST_LEN = 16
+IMMUTABLE_MAX_AGE = 31536000        # a year; a hashed URL never changes meaning
+
+# (table, legacy bytes column, blob key column, URL column, URL path) for bytes that used to
+# live in the database; the URL column is rewritten to the hashed form once the bytes move
+_LEGACY_COLUMNS = [
+    (ListingImage.__table__, "image_data", "blob_key", "image_url", "/api/listings/image/"),
+    (User.__table__, "avatar_data", "avatar_key", "avatar_url", "/api/auth/avatars/"),
+]
+# Every column holding a blob key; a blob none of them mention is garbage
+_KEY_COLUMNS = [(table, key_col) for table, _, key_col, _, _ in _LEGACY_COLUMNS] + [
+    (ListingImageRendition.__table__, "blob_key"),
+]
+
+_store = None
+
+
+def blob_key(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def url_digest(key):
+    return key[:URL_DIGEST_LEN]
+
+
+def hashed_url(path, key):
+    """path with a digest of the blob appended, so the URL changes whenever the content does."""
+    return f"{path}/{url_digest(key)}"
+
+
+def mark_immutable(resp):
+    """Let browsers and CDNs keep the response for a year without revalidating."""
+    resp.cache_control.public = True
+    resp.cache_control.max_age = IMMUTABLE_MAX_AGE
+    resp.cache_control.immutable = True
+    resp.expires = None
+    return resp
+
+
+class BlobStore:
+    """Content-addressed storage for image bytes, keyed by SHA-256 hex digest.
+
+    Storing the same bytes twice yields the same key and one copy. Nothing is
+    deleted when a row goes away; sweep_blobs removes what is no longer referenced.
+    """
+
+    def put(self, data):
+        """Store data and return its key."""
+        raise NotImplementedError
+
+    def get(self, key):
+        """The stored bytes, or None."""
+        raise NotImplementedError
+
+    def delete(self, key, written_before=None):
+        """Delete the blob, unless it has been written (or re-put) since written_before.
+        Returns whether it was deleted."""
+        raise NotImplementedError
+
+    def keys(self, written_before):
+        """Iterate the keys of blobs last written before the given epoch time."""
+        raise NotImplementedError
+
+    def send(self, key, mimetype, max_age):
+        """A response streaming the blob, or None if it isn't stored."""
+        raise NotImplementedError
+
+
+class LocalBlobStore(BlobStore):
+    """Blobs as files under root/ab/cd/<key>, streamed with send_file (sendfile(2) under gunicorn)."""
+
+    def __init__(self, root):
+        # send_file resolves relative paths against the app root, not the cwd
+        self.root = os.path.abspath(root)
+        os.makedirs(self.root, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key[2:4], key)
+
+    def put(self, data):
+        key = blob_key(data)
+        path = self._path(key)
+        if os.path.exists(path):
+            try:
+                os.utime(path)      # restart the sweep grace period for the new reference
+                return key
+            except FileNotFoundError:
+                pass                # swept just now; write it again
+        folder = os.path.dirname(path)
+        os.makedirs(folder, exist_ok=True)
+        # Write then rename, so a reader or a crash never leaves a partial blob under its key
+        fd, tmp = tempfile.mkstemp(dir=folder, prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as fh:
+                fh.write(data)
+                fh.flush()
+                os.fsync(fh.fileno())
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        return key
+
+    def get(self, key):
+        try:
+            with open(self._path(key), "rb") as fh:
+                return fh.read()
+        except FileNotFoundError:
+            return None
+
+    def delete(self, key, written_before=None):
+        path = self._path(key)
+        try:
+            if written_before is not None and os.stat(path).st_mtime >= written_before:
+                return False
+            os.unlink(path)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def keys(self, written_before):
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                if len(name) == 64 and os.stat(os.path.join(folder, name)).st_mtime < written_before:
+                    yield name
+
+    def send(self, key, mimetype, max_age):
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        return send_file(path, mimetype=mimetype, max_age=max_age, etag=key, conditional=True)
+
+
+def init_blob_store(app):
+    """Create the configured blob store (BLOB_STORE) for this app."""
+    global _store
+    backend = app.config["BLOB_STORE"]
+    if backend == "local":
+        root = app.config["BLOB_ROOT"]
+        if not root:
+            # A container's own disk is wiped on every deploy, taking every image with it
+            if os.getenv("RAILWAY_ENVIRONMENT"):
+                raise ValueError("BLOB_ROOT must be set to a directory on a persistent volume")
+            root = os.path.join(app.config["UPLOAD_FOLDER"], "blobs")
+        _store = LocalBlobStore(root)
+    else:
+        raise ValueError(f"Unknown BLOB_STORE {backend!r}")
+
+
+def get_blob_store():
+    return _store
+
+
+def migrate_blobs(batch=MIGRATE_BATCH):
+    """Move image and avatar bytes still stored in the database into the blob store,
+    one transaction per batch, and give moved rows their hashed URL. Safe to interrupt
+    and rerun. Returns the number of rows moved."""
+    moved = 0
+    for table, data_col, key_col, url_col, path in _LEGACY_COLUMNS:
+        # Only rows that still hold bytes, in case a new upload replaced them meanwhile
+        stmt = update(table).where(
+            table.c.id == bindparam("row_id"), table.c[data_col].isnot(None)
+        ).values({key_col: bindparam("key"), data_col: None})
+        while True:
+            rows = db.session.execute(
+                select(table.c.id, table.c[data_col]).where(table.c[data_col].isnot(None)).limit(batch)
+            ).all()
+            if not rows:
+                break
+            db.session.execute(stmt, [{"row_id": rid, "key": _store.put(data)} for rid, data in rows])
+            db.session.commit()
+            moved += len(rows)
+        # Rows still on their unhashed URL, including any moved before URLs carried a digest
+        unhashed = literal(path) + table.c.id
+        db.session.execute(update(table).where(
+            table.c[key_col].isnot(None), table.c[url_col] == unhashed,
+        ).values({url_col: unhashed + "/" + func.substr(table.c[key_col], 1, URL_DIGEST_LEN)}))
+        db.session.commit()
+    return moved
+
+
+def sweep_blobs(grace=SWEEP_GRACE_SECONDS):
+    """Delete stored blobs that no image or avatar references. Returns the number deleted."""
+    cutoff = time.time() - grace
+    keys = _store.keys(cutoff)
+    removed = 0
+    while chunk := list(islice(keys, SWEEP_BATCH)):
+        live = set()
+        for table, key_col in _KEY_COLUMNS:
+            live.update(db.session.scalars(select(table.c[key_col]).where(table.c[key_col].in_(chunk))))
+        for key in chunk:
+            # An upload of the same bytes since the listing re-puts the blob (fresh mtime)
+            # before its row commits, so the reference query can't have seen it
+            if key not in live and _store.delete(key, written_before=cutoff):
+                removed += 1
+    db.session.rollback()
+    return removed
@@ -0,0 +1,135 @@
+import time
+import hashlib
+import threading
+from datetime import datetime, timezone
+
+from flask import request, make_response
+from sqlalchemy import event, func, select, update
+
+from extensions import db
+from models import (
+    Listing, ListingImage, SafeMeetLocation, Boost, User, BlockedUser, Conversation, Message,
+)
+
+# Columns whose changes don't show up in any cached response
+_UNVERSIONED = {
+    Listing: {"version", "nudged_at", "observing_count", "view_count", "unique_viewers", "viewer_sketch"},
+    User: {"version", "last_seen"},
+}
+
+
+def _bump_version(mapper, connection, target):
+    state = db.inspect(target)
+    changed = {a.key for a in state.attrs if a.history.has_changes()}
+    if changed - _UNVERSIONED[type(target)]:
+        # An SQL expression, so concurrent writers never land on the same version
+        target.version = type(target).version + 1
+
+
+event.listen(Listing, "before_update", _bump_version)
+event.listen(User, "before_update", _bump_version)
+
+
+def bump_listing_version(connection, listing_id):
+    """Invalidate a listing's ETag after a Core write to its children, which skips the ORM events."""
+    connection.execute(
+        update(Listing.__table__).where(Listing.__table__.c.id == listing_id).values(
+            version=Listing.__table__.c.version + 1
+        )
+    )
+
+
+def _bump_parent_listing(mapper, connection, target):
+    bump_listing_version(connection, target.listing_id)
+
+
+for _child in (ListingImage, SafeMeetLocation, Boost):
+    for _event in ("after_insert", "after_update", "after_delete"):
+        event.listen(_child, _event, _bump_parent_listing)
+
+
+def _etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()[:20]
+
+
+def listing_etag(listing_id):
+    """Version token for GET /api/listings/<id> in one query, or None if the listing doesn't
+    exist or its seller is being deleted.
+
+    Counters change on every view without bumping version, so they are part of
+    the token; so is the active boost, which expires without a write.
+    """
+    now = datetime.now(timezone.utc)
+    boost_ends = select(func.max(Boost.ends_at)).where(
+        Boost.listing_id == Listing.id, Boost.status == "active", Boost.ends_at > now,
+    ).scalar_subquery()
+    row = db.session.query(
+        Listing.version, Listing.observing_count, Listing.view_count, Listing.unique_viewers,
+        User.version, boost_ends,
+    ).outerjoin(User, User.id == Listing.user_id).filter(
+        Listing.id == listing_id, User.deleted_at.is_(None),
+    ).first()
+    return _etag("listing", *row) if row else None
+
+
+def profile_etag(user_id, viewer_id):
+    """Version token for GET /api/users/<id>/profile as seen by viewer_id, in one query."""
+    listing_count = select(func.count(Listing.id)).where(Listing.user_id == user_id).scalar_subquery()
+    listing_versions = select(func.coalesce(func.sum(Listing.version), 0)).where(
+        Listing.user_id == user_id
+    ).scalar_subquery()
+    last_message = select(func.max(Message.created_at)).join(
+        Conversation, Conversation.id == Message.conversation_id
+    ).where(Conversation.seller_id == user_id).scalar_subquery()
+    blocked = select(BlockedUser.id).where(
+        BlockedUser.blocker_id == viewer_id, BlockedUser.blocked_id == user_id
+    ).exists()
+    row = db.session.query(
+        User.version, listing_count, listing_versions, last_message, blocked,
+    ).filter(User.id == user_id).first()
+    return _etag("profile", *row) if row else None
+
+
+def not_modified(etag):
+    """A bare 304 response if the request's If-None-Match already has etag, else None."""
+    if etag and etag in request.if_none_match:
+        return with_etag(make_response("", 304), etag)
+    return None
+
+
+def with_etag(resp, etag):
+    """Attach etag and make clients revalidate instead of reusing the response blindly."""
+    if etag:
+        resp.set_etag(etag)
+        resp.headers["Cache-Control"] = "private, no-cache"
+    return resp
+
+
+class TTLCache:
+    """Small thread-safe memo whose entries expire after ttl seconds (per process)."""
+
+    def __init__(self, ttl, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            hit = self._data.get(key)
+            if hit is None:
+                return None
+            expires, value = hit
+            if expires < time.monotonic():
+                del self._data[key]
+                return None
+            return value
+
+    def set(self, key, value):
+        now = time.monotonic()
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._data = {k: v for k, v in self._data.items() if v[0] >= now}
+                if len(self._data) >= self.max_entries:
+                    self._data.clear()
+            self._data[key] = (now + self.ttl, value)
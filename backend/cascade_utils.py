@@ -0,0 +1,342 @@
+import os
+import threading
+from datetime import datetime, timedelta
+
+from flask import current_app
+from sqlalchemy import and_, delete, inspect, or_, select, text, update
+
+from extensions import db
+from models import (
+    Listing, User, DeletionJob, ListingNeighbor, ListingSimilarityBand, ListingDailyStats, SellerDailyStats,
+)
+from counter_utils import release_user_counters, COUNTER_SOURCES
+from search_utils import unindex_listings
+
+DELETE_CHUNK = 500              # ids per IN (...) list, well under SQLite's bound-parameter limit
+DELETION_BATCH = 100            # listings or activity rows an account purge removes per transaction
+DELETION_STALE_SECONDS = 300    # a running purge without progress for this long is taken over
+FK_LOCK_TIMEOUT = "5s"          # longest a foreign key swap waits for its table lock
+
+# Derived tables that carry ids without a foreign key: table -> columns to match
+_UNLINKED = {
+    "listings": {ListingNeighbor: ("listing_id", "neighbor_id"), ListingSimilarityBand: ("listing_id",),
+                 ListingDailyStats: ("listing_id",)},
+    "users": {ListingDailyStats: ("seller_id",), SellerDailyStats: ("seller_id",)},
+}
+
+_db_handled = None              # {(table, column)} whose constraint already does the model's ondelete
+
+_app = None
+_lock = threading.Lock()
+_worker_pid = None
+
+
+def _handled_by_db():
+    """Foreign keys the database itself cascades or nulls. SQLite runs with
+    foreign keys off, so there the service does all of it."""
+    global _db_handled
+    if _db_handled is None:
+        handled = set()
+        if db.engine.dialect.name == "postgresql":
+            insp = inspect(db.engine)
+            for table in db.metadata.sorted_tables:
+                for fk in insp.get_foreign_keys(table.name):
+                    action = (fk.get("options") or {}).get("ondelete")
+                    if action and len(fk["constrained_columns"]) == 1:
+                        handled.add((table.name, fk["constrained_columns"][0], action.upper()))
+        _db_handled = {
+            (fk.parent.table.name, fk.parent.name)
+            for table in db.metadata.sorted_tables for fk in table.foreign_keys
+            if fk.ondelete and (fk.parent.table.name, fk.parent.name, fk.ondelete) in handled
+        }
+    return _db_handled
+
+
+def _referencing(table):
+    return [fk for t in db.metadata.sorted_tables for fk in t.foreign_keys
+            if fk.column.table is table and fk.ondelete]
+
+
+def _cascade(table, where, path=()):
+    """Apply every foreign key's ondelete to the rows referencing the rows of
+    table matching where, deepest first."""
+    path += (table.name,)
+    for fk in _referencing(table):
+        child, col = fk.parent.table, fk.parent
+        if child.name in path:
+            continue
+        child_where = col.in_(select(fk.column).where(where))
+        handled = (child.name, col.name) in _handled_by_db()
+        if fk.ondelete == "SET NULL":
+            if not handled:
+                db.session.execute(child.update().where(child_where).values({col.name: None}))
+            continue
+        # Grandchildren first, even when the database drops the child rows itself
+        _cascade(child, child_where, path)
+        if not handled:
+            db.session.execute(delete(child).where(child_where))
+
+
+def _delete(table, ids):
+    for i in range(0, len(ids), DELETE_CHUNK):
+        chunk = ids[i:i + DELETE_CHUNK]
+        _cascade(table, table.c.id.in_(chunk))
+        for derived, cols in _UNLINKED.get(table.name, {}).items():
+            db.session.execute(delete(derived.__table__).where(
+                or_(*(derived.__table__.c[c].in_(chunk) for c in cols))
+            ))
+        db.session.execute(delete(table).where(table.c.id.in_(chunk)))
+    # Core DELETEs skip ORM events and leave loaded objects in the session
+    gone = set(ids)
+    for key, obj in list(db.session.identity_map.items()):
+        if key[0].__table__ is table and key[1][0] in gone:
+            db.session.expunge(obj)
+
+
+def delete_listings(ids):
+    """Delete listings and everything that references them, one statement per
+    table per DELETE_CHUNK ids. Runs in the caller's transaction."""
+    ids = list(ids)
+    _delete(Listing.__table__, ids)
+    unindex_listings(ids)
+
+
+def delete_users(ids):
+    """Delete users with their listings and every row that references either.
+    Runs in the caller's transaction."""
+    ids = list(ids)
+    listing_ids = []
+    for i in range(0, len(ids), DELETE_CHUNK):
+        listing_ids += [lid for (lid,) in db.session.query(Listing.id).filter(
+            Listing.user_id.in_(ids[i:i + DELETE_CHUNK])
+        )]
+    for uid in ids:
+        release_user_counters(uid)
+    delete_listings(listing_ids)
+    _delete(User.__table__, ids)
+
+
+def migrate_fk_actions():
+    """Recreate PostgreSQL foreign keys made before the models declared ondelete,
+    so the database does the fan-out. Each constraint is swapped in its own short
+    transaction and left NOT VALID; validate_fk_actions checks the existing rows
+    later. Returns constraints changed."""
+    global _db_handled
+    if db.engine.dialect.name != "postgresql":
+        return 0
+    insp = inspect(db.engine)
+    changed = 0
+    for table in db.metadata.sorted_tables:
+        existing = {tuple(fk["constrained_columns"]): fk for fk in insp.get_foreign_keys(table.name)}
+        for fk in table.foreign_keys:
+            current = existing.get((fk.parent.name,))
+            if not fk.ondelete or current is None:
+                continue
+            if ((current.get("options") or {}).get("ondelete") or "").upper() == fk.ondelete:
+                continue
+            name = current["name"]
+            try:
+                # The swap holds an exclusive lock until commit: give up rather than queue behind traffic
+                db.session.execute(text(f"SET LOCAL lock_timeout = '{FK_LOCK_TIMEOUT}'"))
+                db.session.execute(text(
+                    f'ALTER TABLE {table.name} DROP CONSTRAINT "{name}", '
+                    f'ADD CONSTRAINT "{name}" FOREIGN KEY ({fk.parent.name}) '
+                    f'REFERENCES {fk.column.table.name} ({fk.column.name}) ON DELETE {fk.ondelete} NOT VALID'
+                ))
+                db.session.commit()
+                changed += 1
+            except Exception:
+                db.session.rollback()
+    _db_handled = None
+    return changed
+
+
+def validate_fk_actions():
+    """Check existing rows against every NOT VALID foreign key, one constraint per
+    transaction. VALIDATE scans the table but doesn't block reads or writes.
+    Returns constraints validated."""
+    if db.engine.dialect.name != "postgresql":
+        return 0
+    tables = {t.name for t in db.metadata.sorted_tables}
+    pending = db.session.execute(text(
+        "SELECT conrelid::regclass::text, conname FROM pg_constraint WHERE contype = 'f' AND NOT convalidated"
+    )).all()
+    db.session.commit()
+    validated = 0
+    for table, name in pending:
+        if table not in tables:
+            continue
+        try:
+            db.session.execute(text(f'ALTER TABLE {table} VALIDATE CONSTRAINT "{name}"'))
+            db.session.commit()
+            validated += 1
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception(f"Validating {table}.{name} failed")
+    return validated
+
+
+# ── Account deletion jobs ──
+
+def seller_active():
+    """Filter hiding listings whose seller is tombstoned, from the request until the purge removes them."""
+    return Listing.user_id.notin_(select(User.id).where(User.deleted_at.isnot(None)))
+
+
+def is_deleting(user_id):
+    """Whether user_id is tombstoned while a DeletionJob purges their account."""
+    return db.session.query(User.deleted_at).filter(User.id == user_id).scalar() is not None
+
+
+def request_user_deletion(user, requested_by=None):
+    """Tombstone user, queue a DeletionJob to purge everything they own, and
+    start the purge in the background. Returns the job."""
+    job = DeletionJob.query.filter(
+        DeletionJob.user_id == user.id, DeletionJob.status != "done"
+    ).first()
+    if job is None:
+        job = DeletionJob(
+            user_id=user.id, email=user.email, requested_by=requested_by,
+            listings_total=Listing.query.filter_by(user_id=user.id).count(),
+        )
+        db.session.add(job)
+    elif job.status == "failed":
+        job.status, job.error = "queued", None
+    user.deleted_at = datetime.utcnow()
+    db.session.commit()
+    db.session.refresh(job)     # loaded before the purge starts writing
+    wake_deletion_worker()
+    return job
+
+
+def wake_deletion_worker():
+    """Start this process's purge thread unless it is already running."""
+    global _app, _worker_pid
+    _app = current_app._get_current_object()
+    with _lock:
+        # Checked per pid so each forked gunicorn worker gets its own thread
+        if _worker_pid != os.getpid():
+            _worker_pid = os.getpid()
+            threading.Thread(target=_worker_loop, name="account-purge", daemon=True).start()
+
+
+def resume_deletion_jobs():
+    """Restart the purge thread if any job is queued or was abandoned by a
+    dead worker. Returns how many such jobs there are."""
+    pending = _claimable().count()
+    if pending:
+        wake_deletion_worker()
+    return pending
+
+
+def _worker_loop():
+    global _worker_pid
+    while True:
+        try:
+            with _app.app_context():
+                while run_next_deletion_job():
+                    pass
+                # Exit under the lock so a job queued meanwhile either is seen here or starts a new thread
+                with _lock:
+                    if _claimable().first() is None:
+                        _worker_pid = None
+                        return
+        except Exception:
+            _app.logger.exception("Account purge failed")
+            with _lock:
+                _worker_pid = None
+            return
+
+
+def _claimable():
+    stale = datetime.utcnow() - timedelta(seconds=DELETION_STALE_SECONDS)
+    return DeletionJob.query.filter(or_(
+        DeletionJob.status == "queued",
+        and_(DeletionJob.status == "running", DeletionJob.updated_at < stale),
+    ))
+
+
+def run_next_deletion_job():
+    """Claim the oldest queued (or abandoned) job and run it. Returns its id, or None."""
+    while True:
+        job = _claimable().order_by(DeletionJob.created_at).first()
+        if job is None:
+            return None
+        # Conditional UPDATE so two workers never run the same job
+        claimed = db.session.execute(
+            update(DeletionJob.__table__).where(
+                DeletionJob.id == job.id, DeletionJob.status == job.status,
+                DeletionJob.updated_at == job.updated_at,
+            ).values(status="running", updated_at=datetime.utcnow())
+        ).rowcount
+        db.session.commit()
+        if claimed:
+            run_deletion_job(job.id)
+            return job.id
+
+
+def _progress(job, **counts):
+    for name, n in counts.items():
+        setattr(job, name, getattr(job, name) + n)
+    job.updated_at = datetime.utcnow()
+    db.session.commit()
+
+
+def run_deletion_job(job_id):
+    """Purge a tombstoned user in DELETION_BATCH-sized transactions. Resumable:
+    each phase works from what is still in the database."""
+    job = db.session.get(DeletionJob, job_id)
+    uid = job.user_id
+    try:
+        if job.phase == "listings":
+            while True:
+                ids = [lid for (lid,) in db.session.query(Listing.id).filter(
+                    Listing.user_id == uid
+                ).limit(DELETION_BATCH)]
+                if not ids:
+                    break
+                delete_listings(ids)
+                _progress(job, listings_deleted=len(ids))
+            job.phase = "activity"
+            _progress(job)
+
+        if job.phase == "activity":
+            # Rows the user created on other people's listings. Counter sources wait for
+            # the final step, which releases the counters in the same transaction.
+            for fk in _referencing(User.__table__):
+                child, col = fk.parent.table, fk.parent
+                if fk.ondelete != "CASCADE" or child.name in COUNTER_SOURCES or child is Listing.__table__:
+                    continue
+                while True:
+                    ids = [r for (r,) in db.session.execute(
+                        select(child.c.id).where(col == uid).limit(DELETION_BATCH)
+                    )]
+                    if not ids:
+                        break
+                    _delete(child, ids)
+                    _progress(job, rows_deleted=len(ids))
+            job.phase = "account"
+            _progress(job)
+
+        delete_users([uid])
+        job.status = "done"
+        job.finished_at = datetime.utcnow()
+        _progress(job)
+    except Exception as e:
+        db.session.rollback()
+        job.status = "failed"
+        job.error = str(e)[:2000]
+        _progress(job)
+        current_app.logger.exception(f"Account purge {job_id} failed")
+
+
+def deletion_job_to_dict(job):
+    return {
+        "id": job.id, "user_id": job.user_id, "email": job.email, "requested_by": job.requested_by,
+        "status": job.status, "phase": job.phase,
+        "listings_total": job.listings_total, "listings_deleted": job.listings_deleted,
+        "rows_deleted": job.rows_deleted, "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
@@ -19,6 +19,10 @@ class Config:
     RESET_TOKEN_EXPIRES_SECONDS = int(os.getenv("RESET_TOKEN_EXPIRES_SECONDS", "3600"))
 
     UPLOAD_FOLDER = os.getenv("UPLOAD_FOLDER", "uploads")
+    # Listing images and avatars (blob_utils). BLOB_ROOT must be on a persistent volume: unset,
+    # the local store falls back to UPLOAD_FOLDER/blobs for development and won't start on Railway
+    BLOB_STORE = os.getenv("BLOB_STORE", "local")
+    BLOB_ROOT = os.getenv("BLOB_ROOT", "")
     MAX_CONTENT_LENGTH_MB = int(os.getenv("MAX_CONTENT_LENGTH_MB", "50"))
 
     # Session cookie settings for HTTPS (Railway)
@@ -46,6 +50,17 @@ class Config:
     SESSION_KEY_PREFIX = "pm:"
     PERMANENT_SESSION_LIFETIME = 60 * 60 * 24 * 30  # 30 days
 
+    # View tracking buffer: views are written in batches of VIEW_FLUSH_BATCH, at least
+    # every VIEW_FLUSH_INTERVAL_SECONDS (the most a crash can lose without Redis)
+    VIEW_FLUSH_BATCH = int(os.getenv("VIEW_FLUSH_BATCH", "500"))
+    VIEW_FLUSH_INTERVAL_SECONDS = float(os.getenv("VIEW_FLUSH_INTERVAL_SECONDS", "2"))
+
+    # Price-drop email/push alerts are sent off the request, this many at a time per process
+    FANOUT_CONCURRENCY = int(os.getenv("FANOUT_CONCURRENCY", "8"))
+
+    # Image uploads are compressed in a per-process pool of this many worker processes (1 = inline)
+    IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
     # Sentry
     SENTRY_DSN = os.getenv("SENTRY_DSN", "")
 
@@ -0,0 +1,46 @@
+from sqlalchemy import text
+
+from extensions import db
+from models import Listing
+
+# listings column -> (source table, column the source rows reference the user by)
+_COUNTERS = {
+    "observing_count": ("observing", "user_id"),
+    "view_count": ("listing_views", "viewer_id"),
+}
+COUNTER_SOURCES = {source for source, _ in _COUNTERS.values()}
+
+
+def bump_counter(listing_id, column, delta=1):
+    """Adjust a denormalized listing counter in place. Runs in the caller's transaction."""
+    db.session.execute(
+        Listing.__table__.update().where(Listing.id == listing_id).values(
+            {column: getattr(Listing, column) + delta}
+        )
+    )
+
+
+def release_user_counters(uid):
+    """Subtract a user's observing/view rows from the listings they point at.
+
+    Call before deleting those rows, e.g. when a user account is removed.
+    """
+    for column, (source, user_col) in _COUNTERS.items():
+        db.session.execute(text(
+            f"UPDATE listings SET {column} = {column} - "
+            f"(SELECT COUNT(*) FROM {source} s WHERE s.listing_id = listings.id AND s.{user_col} = :uid) "
+            f"WHERE id IN (SELECT listing_id FROM {source} WHERE {user_col} = :uid)"
+        ), {"uid": uid})
+
+
+def reconcile_counters():
+    """Rebuild every listing's counters from the source tables. Returns rows fixed."""
+    fixed = 0
+    for column, (source, _) in _COUNTERS.items():
+        actual = f"(SELECT COUNT(*) FROM {source} s WHERE s.listing_id = listings.id)"
+        result = db.session.execute(text(
+            f"UPDATE listings SET {column} = {actual} WHERE {column} <> {actual}"
+        ))
+        fixed += result.rowcount or 0
+    db.session.commit()
+    return fixed
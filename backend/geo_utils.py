@@ -0,0 +1,164 @@
+import math
+
+from sqlalchemy import event, bindparam
+
+from extensions import db
+from models import Listing
+
+EARTH_RADIUS_KM = 6371.0
+KM_PER_DEGREE = 111.0
+GEOHASH_PRECISION = 9           # ~5m cells; covering queries use a coarser prefix
+MAX_COVER_CELLS = 16            # prefix ranges per radius query
+MAX_RADIUS_KM = 500             # largest radius_km the feed and search accept
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+
+def geohash_encode(lat, lng, precision=GEOHASH_PRECISION):
+    """Standard base32 geohash of a point."""
+    lat_lo, lat_hi = -90.0, 90.0
+    lng_lo, lng_hi = -180.0, 180.0
+    chars = []
+    bits, ch, even = 0, 0, True
+    while len(chars) < precision:
+        if even:
+            mid = (lng_lo + lng_hi) / 2
+            if lng >= mid:
+                ch = (ch << 1) | 1
+                lng_lo = mid
+            else:
+                ch <<= 1
+                lng_hi = mid
+        else:
+            mid = (lat_lo + lat_hi) / 2
+            if lat >= mid:
+                ch = (ch << 1) | 1
+                lat_lo = mid
+            else:
+                ch <<= 1
+                lat_hi = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[ch])
+            bits, ch = 0, 0
+    return "".join(chars)
+
+
+def _cell_degrees(precision):
+    """(lat, lng) size in degrees of a geohash cell at this precision."""
+    total = 5 * precision
+    return 180.0 / 2 ** (total // 2), 360.0 / 2 ** ((total + 1) // 2)
+
+
+def _successor(prefix):
+    """Smallest geohash string sorting after every string starting with prefix."""
+    chars = list(prefix)
+    while chars:
+        i = _BASE32.index(chars[-1])
+        if i + 1 < len(_BASE32):
+            chars[-1] = _BASE32[i + 1]
+            return "".join(chars)
+        chars.pop()
+    return None
+
+
+def covering_cells(lat, lng, radius_km):
+    """Geohash prefixes whose cells together cover the radius_km box around a point.
+
+    Uses the finest precision that needs at most MAX_COVER_CELLS cells. Sample
+    points spaced no wider than a cell, edges included, land in every cell the
+    box touches. Returns [] when even whole-continent cells would take more (a
+    wide radius near a pole); the caller then has only the bounding box.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE
+    lng_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    for precision in range(GEOHASH_PRECISION, 0, -1):
+        cell_lat, cell_lng = _cell_degrees(precision)
+        rows = math.ceil(2 * lat_delta / cell_lat) + 1
+        cols = math.ceil(2 * lng_delta / cell_lng) + 1
+        if rows * cols <= MAX_COVER_CELLS:
+            break
+    else:
+        return []
+    cells = set()
+    for i in range(rows):
+        y = lat - lat_delta + 2 * lat_delta * i / max(rows - 1, 1)
+        y = min(max(y, -90.0), 90.0)
+        for j in range(cols):
+            x = lng - lng_delta + 2 * lng_delta * j / max(cols - 1, 1)
+            x = (x + 180.0) % 360.0 - 180.0
+            cells.add(geohash_encode(y, x, precision))
+    return sorted(cells)
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    p1, p2 = math.radians(lat1), math.radians(lat2)
+    dp = p2 - p1
+    dl = math.radians(lng2 - lng1)
+    a = math.sin(dp / 2) ** 2 + math.cos(p1) * math.cos(p2) * math.sin(dl / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def distance_key(lat, lng):
+    """SQL expression ordering listings by distance from a point.
+
+    Squared equirectangular distance in degrees: plain arithmetic, so it runs on
+    SQLite and PostgreSQL alike and is monotonic with true distance at the radii
+    the feed uses. Exact kilometres come from haversine_km afterwards.
+    """
+    k = math.cos(math.radians(lat))
+    dy = Listing.lat - lat
+    dx = (Listing.lng - lng) * k
+    return dy * dy + dx * dx
+
+
+def apply_radius_filter(query, lat, lng, radius_km):
+    """Restrict a Listing query to listings within radius_km of a point.
+
+    The geohash ranges are index range scans on ix_listings_geohash; the
+    bounding box and distance_key bound then trim the covering cells down to
+    the circle. haversine_km gives the exact figure for the cards. radius_km
+    must be positive (see MAX_RADIUS_KM).
+    """
+    ranges = []
+    for cell in covering_cells(lat, lng, radius_km):
+        upper = _successor(cell)
+        if upper is None:
+            ranges.append(Listing.geohash >= cell)
+        else:
+            ranges.append(db.and_(Listing.geohash >= cell, Listing.geohash < upper))
+    lat_delta = radius_km / KM_PER_DEGREE
+    lng_delta = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+    if ranges:
+        query = query.filter(db.or_(*ranges))
+    return query.filter(
+        Listing.lat.between(lat - lat_delta, lat + lat_delta),
+        Listing.lng.between(lng - lng_delta, lng + lng_delta),
+        distance_key(lat, lng) <= (radius_km / KM_PER_DEGREE) ** 2,
+    )
+
+
+@event.listens_for(Listing, "before_insert")
+@event.listens_for(Listing, "before_update")
+def _set_geohash(mapper, connection, target):
+    if target.lat is None or target.lng is None:
+        target.geohash = None
+    else:
+        target.geohash = geohash_encode(float(target.lat), float(target.lng))
+
+
+def backfill_geohashes(batch_size=1000):
+    """Fill geohash for listings that have coordinates but predate the column."""
+    total = 0
+    while True:
+        rows = db.session.query(Listing.id, Listing.lat, Listing.lng).filter(
+            Listing.geohash.is_(None), Listing.lat.isnot(None), Listing.lng.isnot(None),
+        ).limit(batch_size).all()
+        if not rows:
+            return total
+        db.session.execute(
+            Listing.__table__.update().where(Listing.id == bindparam("lid")).values(geohash=bindparam("gh")),
+            [{"lid": lid, "gh": geohash_encode(lat, lng)} for lid, lat, lng in rows],
+        )
+        db.session.commit()
+        total += len(rows)
@@ -1,25 +1,125 @@
-from PIL import Image, ImageOps
+import io
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
 
+from PIL import Image, ImageOps, features
 
-def compress_image(file_path, max_size=1200, quality=85):
-    """Resize and compress an image in-place."""
+FULL_SIZE = 1200
+# Smaller copies made next to every listing image, by longest edge, smallest first
+RENDITIONS = {"thumb": 160, "card": 480}
+
+# Encodings stored for every size, in order of preference when a client accepts several.
+# Settings trade a little size for encode speed, since they run at upload time.
+_MODERN_FORMATS = [
+    ("image/avif", "avif", "AVIF", {"quality": 60, "speed": 8}),
+    ("image/webp", "webp", "WEBP", {"quality": 80, "method": 4}),
+]
+FORMATS = {mime: (fmt, opts) for mime, feature, fmt, opts in _MODERN_FORMATS if features.check(feature)}
+FORMATS["image/jpeg"] = ("JPEG", {"optimize": True})
+
+_pool = None
+_pool_pid = None
+
+
+def _decode(data, max_size):
+    img = Image.open(io.BytesIO(data))
+    # JPEGs decode straight at 1/2, 1/4 or 1/8 scale, still at least max_size on the long edge
+    img.draft("RGB", (max_size, max_size))
+    img = ImageOps.exif_transpose(img)
+
+    if max(img.size) > max_size:
+        ratio = max_size / max(img.size)
+        new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
+        img = img.resize(new_size, Image.Resampling.LANCZOS)
+
+    if img.mode in ("RGBA", "P", "LA"):
+        bg = Image.new("RGB", img.size, (255, 255, 255))
+        if img.mode in ("RGBA", "LA"):
+            bg.paste(img, mask=img.split()[-1])
+        else:
+            bg.paste(img)
+        img = bg
+    return img
+
+
+def _encode(img, mime, quality):
+    fmt, opts = FORMATS[mime]
+    if mime == "image/jpeg":
+        opts = dict(opts, quality=quality)
+    out = io.BytesIO()
+    img.save(out, fmt, **opts)
+    return out.getvalue()
+
+
+def compress_image_bytes(data, max_size=FULL_SIZE, quality=85):
+    """Resize and re-encode image bytes as JPEG in memory. Returns the input unchanged if it can't be decoded."""
     try:
-        img = Image.open(file_path)
-        img = ImageOps.exif_transpose(img)
-
-        if max(img.size) > max_size:
-            ratio = max_size / max(img.size)
-            new_size = (int(img.size[0] * ratio), int(img.size[1] * ratio))
-            img = img.resize(new_size, Image.Resampling.LANCZOS)
-
-        if img.mode in ("RGBA", "P", "LA"):
-            bg = Image.new("RGB", img.size, (255, 255, 255))
-            if img.mode in ("RGBA", "LA"):
-                bg.paste(img, mask=img.split()[-1])
-            else:
-                bg.paste(img)
-            img = bg
-
-        img.save(file_path, "JPEG", quality=quality, optimize=True)
+        return _encode(_decode(data, max_size), "image/jpeg", quality)
     except Exception as e:
         print(f"Image compression failed: {e}")
+        return data
+
+
+def render_image(data, max_size=FULL_SIZE, quality=85, mimes=None):
+    """The full image and each of RENDITIONS in every format of mimes (default: all FORMATS), from a single decode.
+
+    Returns {"full": {"image/jpeg": bytes, "image/webp": bytes, ...}, "thumb": {...}, ...};
+    just {"full": {"image/jpeg": data}} if the input can't be decoded. quality applies to JPEG.
+    """
+    mimes = mimes or list(FORMATS)
+    try:
+        img = _decode(data, max_size)
+        out = {"full": {mime: _encode(img, mime, quality) for mime in mimes}}
+        for name, size in sorted(RENDITIONS.items(), key=lambda r: -r[1]):
+            # Each step down starts from the previous (larger) copy
+            if max(img.size) > size:
+                img = img.copy()
+                img.thumbnail((size, size), Image.Resampling.LANCZOS)
+            out[name] = {mime: _encode(img, mime, quality) for mime in mimes}
+        return out
+    except Exception as e:
+        print(f"Image compression failed: {e}")
+        return {"full": {"image/jpeg": data}}
+
+
+def rendition_url(image_url, size):
+    """URL of a rendition of the image served at image_url (see serve_image)."""
+    return f"{image_url}?size={size}" if image_url else image_url
+
+
+def compress_image(file_path, max_size=FULL_SIZE, quality=85):
+    """Resize and compress an image in-place."""
+    with open(file_path, "rb") as fh:
+        data = fh.read()
+    out = compress_image_bytes(data, max_size, quality)
+    if out is not data:
+        with open(file_path, "wb") as fh:
+            fh.write(out)
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    # One pool per process; forkserver keeps the request threads' locks out of the workers
+    if _pool is None or _pool_pid != os.getpid():
+        ctx = multiprocessing.get_context("forkserver")
+        ctx.set_forkserver_preload(["image_utils"])
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=ctx)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def render_images(blobs, workers, max_size=FULL_SIZE, quality=85, mimes=None):
+    """render_image over several images, up to workers at a time in a process pool."""
+    job = partial(render_image, max_size=max_size, quality=quality, mimes=mimes)
+    if len(blobs) < 2 or workers < 2:
+        return [job(b) for b in blobs]
+    global _pool
+    try:
+        return list(_get_pool(workers).map(job, blobs))
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool next time and finish this upload here
+        _pool = None
+        return [job(b) for b in blobs]
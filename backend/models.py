@@ -19,8 +19,9 @@ class User(UserMixin, db.Model):
     display_name = db.Column(db.String(120))
     google_sub = db.Column(db.String(255), unique=True, nullable=True, index=True)
     avatar_url = db.Column(db.Text, nullable=True)
-    avatar_data = db.Column(db.LargeBinary, nullable=True)
+    avatar_data = db.deferred(db.Column(db.LargeBinary, nullable=True))  # only serve_avatar reads it
     avatar_mime = db.Column(db.String(32), nullable=True)
+    avatar_key = db.Column(db.String(64), nullable=True, index=True)  # blob_utils key; avatar_data is legacy
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
     rating_avg = db.Column(db.Numeric, default=0)
@@ -32,8 +33,12 @@ class User(UserMixin, db.Model):
     is_test_account = db.Column(db.Boolean, default=False)
     is_admin = db.Column(db.Boolean, default=False)
     is_banned = db.Column(db.Boolean, default=False)
+    deleted_at = db.Column(db.DateTime(timezone=True), nullable=True)  # tombstone while a DeletionJob purges
     last_seen = db.Column(db.DateTime(timezone=True), nullable=True)
     pro_free_boost_last_used_day = db.Column(db.String(10), nullable=True)  # "YYYY-MM-DD" UTC
+    version = db.Column(db.Integer, nullable=False, default=1)  # bumped on writes; see cache_utils
+    # Union of the viewer sketches of this seller's listings (sketch_utils)
+    viewer_sketch = db.deferred(db.Column(db.LargeBinary, nullable=True))
 
     def set_password(self, pw: str) -> None:
         self.password_hash = generate_password_hash(pw)
@@ -45,7 +50,7 @@ class Listing(db.Model):
     __tablename__ = "listings"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     title = db.Column(db.Text, nullable=False)
     description = db.Column(db.Text)
@@ -59,33 +64,61 @@ class Listing(db.Model):
 
     lat = db.Column(db.Float, nullable=True)
     lng = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(12), nullable=True)  # set from lat/lng by geo_utils
+    rank_score = db.Column(db.Float, nullable=True)  # "newest" feed order; kept current by ranking_utils
 
     pickup_or_shipping = db.Column(db.String(16), nullable=False)  # "pickup"|"shipping"
     is_sold = db.Column(db.Boolean, default=False)
     is_draft = db.Column(db.Boolean, default=False)
-    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True, index=True)
+    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="SET NULL"), nullable=True, index=True)
 
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
     renewed_at = db.Column(db.DateTime(timezone=True), nullable=True)
     nudged_at = db.Column(db.DateTime(timezone=True), nullable=True)
     bundle_discount_pct = db.Column(db.Integer, nullable=True)  # e.g. 10 for 10% off
+    version = db.Column(db.Integer, nullable=False, default=1)  # bumped on writes; see cache_utils
+
+    # Denormalized from observing / listing_views; see counter_utils
+    observing_count = db.Column(db.Integer, nullable=False, default=0)
+    view_count = db.Column(db.Integer, nullable=False, default=0)
+    # HyperLogLog of viewer keys (sketch_utils) and its cached estimate
+    unique_viewers = db.Column(db.Integer, nullable=False, default=0)
+    viewer_sketch = db.deferred(db.Column(db.LargeBinary, nullable=True))
 
 class ListingImage(db.Model):
     __tablename__ = "listing_images"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
     image_url = db.Column(db.Text, nullable=False)
-    image_data = db.Column(db.LargeBinary, nullable=True)
+    image_data = db.deferred(db.Column(db.LargeBinary, nullable=True))  # only serve_image reads it
     image_mime = db.Column(db.String(32), nullable=True)
+    blob_key = db.Column(db.String(64), nullable=True, index=True)  # blob_utils key; image_data is legacy
+    position = db.Column(db.Integer, nullable=False, default=0)  # gallery order, 0 = cover photo
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+    __table_args__ = (db.Index("ix_listing_images_listing_position", "listing_id", "position"),)
+
+class ListingImageRendition(db.Model):
+    """A smaller copy (image_utils.RENDITIONS) or another encoding (image_utils.FORMATS) of a
+    listing image, stored in the blob store. The full-size JPEG is ListingImage.blob_key."""
+    __tablename__ = "listing_image_renditions"
+
+    id = db.Column(db.String(36), primary_key=True, default=_uuid)
+    image_id = db.Column(db.String(36), db.ForeignKey("listing_images.id", ondelete="CASCADE"), nullable=False)
+    size = db.Column(db.String(16), nullable=False)  # a RENDITIONS name or "full"
+    mime = db.Column(db.String(32), nullable=False, default="image/jpeg")
+    blob_key = db.Column(db.String(64), nullable=False, index=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
+    __table_args__ = (db.UniqueConstraint("image_id", "size", "mime", name="uq_listing_image_rendition"),)
+
 class Observing(db.Model):
     __tablename__ = "observing"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
     __table_args__ = (db.UniqueConstraint("user_id", "listing_id", name="uq_observing_user_listing"),)
@@ -94,10 +127,10 @@ class Conversation(db.Model):
     __tablename__ = "conversations"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
 
-    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    seller_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    seller_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
@@ -107,8 +140,8 @@ class Message(db.Model):
     __tablename__ = "messages"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    conversation_id = db.Column(db.String(36), db.ForeignKey("conversations.id"), nullable=False, index=True)
-    sender_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    conversation_id = db.Column(db.String(36), db.ForeignKey("conversations.id", ondelete="CASCADE"), nullable=False, index=True)
+    sender_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     body = db.Column(db.Text, nullable=False)
     image_url = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -117,7 +150,7 @@ class SafeMeetLocation(db.Model):
     __tablename__ = "safe_meet_locations"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
 
     place_name = db.Column(db.String(255), nullable=False)
     address = db.Column(db.String(255), nullable=False)
@@ -131,8 +164,8 @@ class SafetyAckEvent(db.Model):
     __tablename__ = "safety_ack_events"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=True, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=True, index=True)
 
     event_type = db.Column(db.String(64), nullable=False)  # e.g. "private_location_ack"
     ack_text = db.Column(db.Text, nullable=False)
@@ -143,7 +176,7 @@ class Boost(db.Model):
     __tablename__ = "boosts"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
 
     starts_at = db.Column(db.DateTime(timezone=True), nullable=False)
     ends_at = db.Column(db.DateTime(timezone=True), nullable=False)
@@ -158,15 +191,15 @@ class BoostImpression(db.Model):
     __tablename__ = "boost_impressions"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    boost_id = db.Column(db.String(36), db.ForeignKey("boosts.id"), nullable=False, index=True)
-    viewer_user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True, index=True)
+    boost_id = db.Column(db.String(36), db.ForeignKey("boosts.id", ondelete="CASCADE"), nullable=False, index=True)
+    viewer_user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
     shown_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
 class Subscription(db.Model):
     __tablename__ = "subscriptions"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
 
     stripe_customer_id = db.Column(db.String(255))
     stripe_subscription_id = db.Column(db.String(255))
@@ -180,8 +213,8 @@ class Notification(db.Model):
     __tablename__ = "notifications"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=True, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=True, index=True)
     message = db.Column(db.Text, nullable=False)
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -190,9 +223,9 @@ class Offer(db.Model):
     __tablename__ = "offers"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
-    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    seller_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
+    buyer_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    seller_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     amount_cents = db.Column(db.Integer, nullable=False)
     status = db.Column(db.String(32), nullable=False, default="pending")  # "pending"|"accepted"|"declined"|"countered"
     counter_cents = db.Column(db.Integer, nullable=True)
@@ -202,7 +235,7 @@ class SavedSearch(db.Model):
     __tablename__ = "saved_searches"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     search_query = db.Column("query", db.String(255), nullable=False)
     category = db.Column(db.String(64), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -211,8 +244,8 @@ class BlockedUser(db.Model):
     __tablename__ = "blocked_users"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    blocker_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    blocked_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    blocker_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    blocked_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
     __table_args__ = (db.UniqueConstraint("blocker_id", "blocked_id", name="uq_block_pair"),)
@@ -221,13 +254,13 @@ class Report(db.Model):
     __tablename__ = "reports"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    reporter_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    reported_user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True, index=True)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=True, index=True)
+    reporter_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    reported_user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=True, index=True)
     reason = db.Column(db.Text, nullable=False)
     status = db.Column(db.String(32), default="open")  # "open"|"reviewed"|"resolved"
     admin_notes = db.Column(db.Text, nullable=True)
-    resolved_by = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True)
+    resolved_by = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True)
     resolved_at = db.Column(db.DateTime(timezone=True), nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
@@ -235,7 +268,7 @@ class PriceHistory(db.Model):
     __tablename__ = "price_history"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
     old_cents = db.Column(db.Integer, nullable=False)
     new_cents = db.Column(db.Integer, nullable=False)
     changed_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -244,9 +277,9 @@ class Review(db.Model):
     __tablename__ = "reviews"
 
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    reviewer_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    seller_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    reviewer_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    seller_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
     is_positive = db.Column(db.Boolean, nullable=False)
     comment = db.Column(db.Text, nullable=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
@@ -267,14 +300,14 @@ class Ad(db.Model):
 class ListingView(db.Model):
     __tablename__ = "listing_views"
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
-    viewer_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=True, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
+    viewer_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=True, index=True)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
 
 class MeetupConfirmation(db.Model):
     __tablename__ = "meetup_confirmations"
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id"), nullable=False, index=True)
+    listing_id = db.Column(db.String(36), db.ForeignKey("listings.id", ondelete="CASCADE"), nullable=False, index=True)
     token = db.Column(db.String(64), unique=True, nullable=False)
     buyer_confirmed = db.Column(db.Boolean, default=False)
     seller_confirmed = db.Column(db.Boolean, default=False)
@@ -283,8 +316,58 @@ class MeetupConfirmation(db.Model):
 class PushSubscription(db.Model):
     __tablename__ = "push_subscriptions"
     id = db.Column(db.String(36), primary_key=True, default=_uuid)
-    user_id = db.Column(db.String(36), db.ForeignKey("users.id"), nullable=False, index=True)
+    user_id = db.Column(db.String(36), db.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     endpoint = db.Column(db.Text, nullable=False, unique=True)
     p256dh = db.Column(db.Text, nullable=False)
     auth = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+
+# Derived similarity index (similar_utils). No foreign keys: rows for deleted
+# listings are skipped on read and dropped by the next rebuild.
+class ListingNeighbor(db.Model):
+    __tablename__ = "listing_neighbors"
+    listing_id = db.Column(db.String(36), primary_key=True)
+    neighbor_id = db.Column(db.String(36), primary_key=True)
+    score = db.Column(db.Float, nullable=False)
+
+class ListingSimilarityBand(db.Model):
+    __tablename__ = "listing_similarity_bands"
+    band = db.Column(db.BigInteger, primary_key=True)  # hash of one MinHash LSH band
+    listing_id = db.Column(db.String(36), primary_key=True, index=True)
+
+# Daily rollups for seller analytics (rollup_utils), kept current as events happen
+class ListingDailyStats(db.Model):
+    __tablename__ = "listing_daily_stats"
+    listing_id = db.Column(db.String(36), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    seller_id = db.Column(db.String(36), nullable=False)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    observes = db.Column(db.Integer, nullable=False, default=0)
+    offers = db.Column(db.Integer, nullable=False, default=0)
+    messages_started = db.Column(db.Integer, nullable=False, default=0)
+
+class SellerDailyStats(db.Model):
+    __tablename__ = "seller_daily_stats"
+    seller_id = db.Column(db.String(36), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    views = db.Column(db.Integer, nullable=False, default=0)
+    observes = db.Column(db.Integer, nullable=False, default=0)
+    offers = db.Column(db.Integer, nullable=False, default=0)
+    messages_started = db.Column(db.Integer, nullable=False, default=0)
+
+# Background purge of a deleted account (cascade_utils). No foreign key: the job outlives the user row.
+class DeletionJob(db.Model):
+    __tablename__ = "deletion_jobs"
+    id = db.Column(db.String(36), primary_key=True, default=_uuid)
+    user_id = db.Column(db.String(36), nullable=False, index=True)
+    email = db.Column(db.String(255), nullable=True)
+    requested_by = db.Column(db.String(36), nullable=True)
+    status = db.Column(db.String(16), nullable=False, default="queued")  # "queued"|"running"|"done"|"failed"
+    phase = db.Column(db.String(16), nullable=False, default="listings")  # "listings"|"activity"|"account"
+    listings_total = db.Column(db.Integer, nullable=False, default=0)
+    listings_deleted = db.Column(db.Integer, nullable=False, default=0)
+    rows_deleted = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime(timezone=True), default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime(timezone=True), nullable=True)
@@ -0,0 +1,159 @@
+import os
+import json
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+from flask import current_app
+from sqlalchemy import String, and_, delete, false, literal, select
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from extensions import db
+from models import Notification, Observing, PushSubscription, User
+from email_utils import send_price_drop_alert
+from push_utils import push_payload, send_push
+
+_REDIS_KEY = "pm:fanout_jobs"
+_LOOKUP_CHUNK = 500
+
+_app = None
+_redis = None
+_jobs = queue.Queue()               # used when Redis isn't configured
+_lock = threading.Lock()
+_worker_pid = None
+
+
+class new_uuid(FunctionElement):
+    """A random UUID4 string generated by the database, for INSERT ... SELECT."""
+    type = String()
+    inherit_cache = True
+
+
+@compiles(new_uuid)
+def _new_uuid_default(element, compiler, **kw):
+    return "CAST(gen_random_uuid() AS VARCHAR)"
+
+
+@compiles(new_uuid, "sqlite")
+def _new_uuid_sqlite(element, compiler, **kw):
+    return (
+        "lower(hex(randomblob(4)) || '-' || hex(randomblob(2)) || '-4' || substr(hex(randomblob(2)), 2) || '-' "
+        "|| substr('89ab', 1 + (abs(random()) % 4), 1) || substr(hex(randomblob(2)), 2) || '-' "
+        "|| hex(randomblob(6)))"
+    )
+
+
+def init_fanout(app):
+    """Bind the fan-out queue to the app. The worker starts on the first job in each process,
+    or with Redis on the first request, so jobs another process queued are picked up."""
+    global _app, _redis
+    _app = app
+    redis_url = app.config.get("REDIS_URL")
+    if redis_url:
+        import redis
+        _redis = redis.from_url(redis_url)
+        # Jobs left in Redis by a restarted or crashed process have no enqueue here to start a worker
+        app.before_request(_ensure_worker)
+
+
+def notify_observers(listing_id, seller_id, messages):
+    """Add an in-app notification per message for everyone observing the listing,
+    one INSERT ... SELECT per message. Runs in the caller's transaction."""
+    now = datetime.utcnow()
+    for msg in messages:
+        rows = select(
+            new_uuid(), Observing.user_id, literal(listing_id), literal(msg), false(), literal(now),
+        ).where(Observing.listing_id == listing_id, Observing.user_id != seller_id)
+        db.session.execute(Notification.__table__.insert().from_select(
+            ["id", "user_id", "listing_id", "message", "is_read", "created_at"], rows,
+        ))
+
+
+def enqueue_price_drop(listing_id, seller_id, title, old_cents, new_cents):
+    """Queue email and push alerts to the listing's observers; delivery happens off the request."""
+    job = {"kind": "price_drop", "listing_id": listing_id, "seller_id": seller_id,
+           "title": title, "old_cents": old_cents, "new_cents": new_cents}
+    if _redis is not None:
+        _redis.rpush(_REDIS_KEY, json.dumps(job))
+    else:
+        _jobs.put(job)
+    _ensure_worker()
+
+
+def _ensure_worker():
+    global _worker_pid
+    # Checked per pid so each forked gunicorn worker gets its own thread
+    if _worker_pid == os.getpid():
+        return
+    with _lock:
+        if _worker_pid != os.getpid():
+            _worker_pid = os.getpid()
+            threading.Thread(target=_worker_loop, name="notify-fanout", daemon=True).start()
+
+
+def _next_job():
+    if _redis is not None:
+        item = _redis.blpop(_REDIS_KEY, timeout=30)
+        return json.loads(item[1]) if item else None
+    try:
+        return _jobs.get(timeout=30)
+    except queue.Empty:
+        return None
+
+
+def _worker_loop():
+    pool = ThreadPoolExecutor(_app.config["FANOUT_CONCURRENCY"], thread_name_prefix="notify-send")
+    while True:
+        job = _next_job()
+        if job is None:
+            continue
+        try:
+            with _app.app_context():
+                deliver_price_drop(pool, job)
+        except Exception:
+            _app.logger.exception("Price drop fan-out failed")
+
+
+def _in_context(fn, *args):
+    with _app.app_context():
+        return fn(*args)
+
+
+def deliver_price_drop(pool, job):
+    """Email and push every observer of the listing, at most FANOUT_CONCURRENCY
+    sends at a time. Subscriptions the push service reports gone are removed."""
+    lid = job["listing_id"]
+    observers = db.session.query(User.id, User.email, User.display_name).join(
+        Observing, and_(Observing.user_id == User.id, Observing.listing_id == lid)
+    ).filter(User.id != job["seller_id"]).all()
+    observer_ids = [uid for uid, _, _ in observers]
+    subs = []
+    for i in range(0, len(observer_ids), _LOOKUP_CHUNK):
+        subs += db.session.query(PushSubscription.endpoint, PushSubscription.p256dh, PushSubscription.auth).filter(
+            PushSubscription.user_id.in_(observer_ids[i:i + _LOOKUP_CHUNK])
+        ).all()
+    db.session.rollback()           # nothing to write; don't hold a transaction open while sending
+
+    payload = push_payload(
+        "Price Drop!", f"{job['title']} dropped to ${job['new_cents'] / 100:.2f}",
+        url=f"/listing/{lid}", tag=f"price_drop_{lid}",
+    )
+    emails = [
+        pool.submit(_in_context, send_price_drop_alert, email, name, job["title"], lid,
+                    job["old_cents"], job["new_cents"])
+        for _, email, name in observers if email
+    ]
+    pushes = {pool.submit(_in_context, send_push, *sub, payload): sub[0] for sub in subs}
+
+    for f in emails:
+        try:
+            f.result()
+        except Exception as e:
+            current_app.logger.error(f"Price drop email failed: {e}")
+    gone = [endpoint for f, endpoint in pushes.items() if f.result()]
+    if gone:
+        db.session.execute(delete(PushSubscription.__table__).where(PushSubscription.endpoint.in_(gone)))
+        db.session.commit()
+    return len(emails), len(pushes)
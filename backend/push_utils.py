@@ -6,36 +6,44 @@ from extensions import db
 from models import PushSubscription
 
 
-def send_push_to_user(user_id, title, body, url="/", tag="default"):
-    """Send a web push notification to all of a user's subscribed devices."""
-    subs = PushSubscription.query.filter_by(user_id=user_id).all()
-    if not subs:
-        return
+def push_payload(title, body, url="/", tag="default"):
+    return json.dumps({"title": title, "body": body, "url": url, "tag": tag})
+
 
+def send_push(endpoint, p256dh, auth, payload):
+    """Deliver one push. Returns True when the endpoint is gone and its subscription should be dropped."""
     vapid_private = current_app.config.get("VAPID_PRIVATE_KEY")
     vapid_claims = current_app.config.get("VAPID_CLAIMS", {})
     if not vapid_private:
-        return
+        return False
+    try:
+        webpush(
+            subscription_info={
+                "endpoint": endpoint,
+                "keys": {"p256dh": p256dh, "auth": auth},
+            },
+            data=payload,
+            vapid_private_key=vapid_private,
+            vapid_claims=vapid_claims,
+        )
+    except WebPushException as e:
+        if e.response and e.response.status_code in (404, 410):
+            return True
+        current_app.logger.error(f"Push failed: {e}")
+    except Exception as e:
+        current_app.logger.error(f"Push error: {e}")
+    return False
 
-    payload = json.dumps({"title": title, "body": body, "url": url, "tag": tag})
 
+def send_push_to_user(user_id, title, body, url="/", tag="default"):
+    """Send a web push notification to all of a user's subscribed devices."""
+    subs = PushSubscription.query.filter_by(user_id=user_id).all()
+    if not subs or not current_app.config.get("VAPID_PRIVATE_KEY"):
+        return
+
+    payload = push_payload(title, body, url, tag)
     for sub in subs:
-        try:
-            webpush(
-                subscription_info={
-                    "endpoint": sub.endpoint,
-                    "keys": {"p256dh": sub.p256dh, "auth": sub.auth},
-                },
-                data=payload,
-                vapid_private_key=vapid_private,
-                vapid_claims=vapid_claims,
-            )
-        except WebPushException as e:
-            if e.response and e.response.status_code in (404, 410):
-                db.session.delete(sub)
-            else:
-                current_app.logger.error(f"Push failed: {e}")
-        except Exception as e:
-            current_app.logger.error(f"Push error: {e}")
+        if send_push(sub.endpoint, sub.p256dh, sub.auth, payload):
+            db.session.delete(sub)
 
     db.session.commit()
@@ -0,0 +1,108 @@
+from datetime import datetime, timezone
+
+from sqlalchemy import Float, case, cast, event, exists, func, inspect, update
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+
+from extensions import db
+from models import Boost, Listing, User
+from geo_utils import distance_key, KM_PER_DEGREE
+
+# ── Configurable ranking weights ──
+# Scores are in hours: a bonus of N hours ranks a listing as if it had been
+# posted (or renewed) N hours later than it was.
+PRO_SELLER_BONUS_HOURS = 12         # Pro sellers' listings float above same-age ones
+ACTIVE_BOOST_BONUS_HOURS = 24       # listings with a running boost
+DISTANCE_PENALTY_HOURS_PER_KM = 0.5 # only applied when the request has an origin
+
+
+class epoch_hours(FunctionElement):
+    """Hours since the Unix epoch for a timestamp column."""
+    type = Float()
+    inherit_cache = True
+
+
+@compiles(epoch_hours)
+def _epoch_hours_default(element, compiler, **kw):
+    return "(EXTRACT(EPOCH FROM %s) / 3600.0)" % compiler.process(element.clauses, **kw)
+
+
+@compiles(epoch_hours, "sqlite")
+def _epoch_hours_sqlite(element, compiler, **kw):
+    return "((julianday(%s) - 2440587.5) * 24.0)" % compiler.process(element.clauses, **kw)
+
+
+def rank_score_expr():
+    """SQL score stored in Listing.rank_score, higher first.
+
+    The log of an exponential recency decay with multiplicative bonuses, i.e.
+    posted-at hours plus bonus hours. It doesn't depend on the current time,
+    so a stored score only has to change when the listing is renewed, a boost
+    starts or ends, or the seller's Pro status changes (the mapper events
+    below, plus the expire-boosts cron for boosts that run out).
+    """
+    now = datetime.now(timezone.utc)
+    is_pro = exists().where(User.id == Listing.user_id, User.is_pro == True)
+    is_boosted = exists().where(Boost.listing_id == Listing.id, Boost.status == "active", Boost.ends_at > now)
+    return cast(
+        epoch_hours(func.coalesce(Listing.renewed_at, Listing.created_at))
+        + case((is_pro, PRO_SELLER_BONUS_HOURS), else_=0)
+        + case((is_boosted, ACTIVE_BOOST_BONUS_HOURS), else_=0),
+        Float,
+    )
+
+
+def rank_key(lat=None, lng=None):
+    """Sort key for the "newest" feed, higher first.
+
+    Without an origin it is the stored rank_score, which ix_listings_rank
+    serves in order. With one, a distance penalty is subtracted per row; those
+    requests are limited to the radius filter's rows, so the sort stays bounded.
+    """
+    score = Listing.rank_score
+    if lat is not None and lng is not None and DISTANCE_PENALTY_HOURS_PER_KM:
+        km = func.sqrt(distance_key(lat, lng)) * KM_PER_DEGREE
+        score = cast(score - km * DISTANCE_PENALTY_HOURS_PER_KM, Float)
+    return score
+
+
+def refresh_rank_scores(where=None):
+    """Recompute rank_score for the listings matching where (all of them if None)
+    in one UPDATE, in the caller's transaction. Returns the number of rows."""
+    stmt = update(Listing.__table__).values(rank_score=rank_score_expr())
+    if where is not None:
+        stmt = stmt.where(where)
+    return db.session.execute(stmt).rowcount
+
+
+def _rerank(connection, where):
+    connection.execute(update(Listing.__table__).where(where).values(rank_score=rank_score_expr()))
+
+
+def _changed(target, *attrs):
+    state = inspect(target)
+    return any(state.attrs[a].history.has_changes() for a in attrs)
+
+
+@event.listens_for(Listing, "after_insert")
+def _rank_new_listing(mapper, connection, target):
+    _rerank(connection, Listing.id == target.id)
+
+
+@event.listens_for(Listing, "after_update")
+def _rank_listing(mapper, connection, target):
+    if _changed(target, "created_at", "renewed_at", "user_id"):
+        _rerank(connection, Listing.id == target.id)
+
+
+@event.listens_for(Boost, "after_insert")
+@event.listens_for(Boost, "after_delete")
+@event.listens_for(Boost, "after_update")
+def _rank_boosted(mapper, connection, target):
+    _rerank(connection, Listing.id == target.listing_id)
+
+
+@event.listens_for(User, "after_update")
+def _rank_seller(mapper, connection, target):
+    if _changed(target, "is_pro"):
+        _rerank(connection, Listing.user_id == target.id)
@@ -0,0 +1,92 @@
+from collections import defaultdict
+
+from sqlalchemy import func, select
+
+from extensions import db
+from models import ListingImage, ListingImageRendition
+from blob_utils import get_blob_store
+from image_utils import FORMATS, RENDITIONS, render_image
+
+BUILD_BATCH = 100
+
+# Every (size, mime) stored as a ListingImageRendition; the full JPEG lives on ListingImage itself
+VARIANTS = {(size, mime) for size in ["full", *RENDITIONS] for mime in FORMATS} - {("full", "image/jpeg")}
+
+
+def add_renditions(image_id, rendered):
+    """Store the variants from image_utils.render_image for a listing image, in the caller's transaction."""
+    store = get_blob_store()
+    for size, encodings in rendered.items():
+        for mime, data in encodings.items():
+            if (size, mime) in VARIANTS:
+                db.session.add(ListingImageRendition(
+                    image_id=image_id, size=size, mime=mime, blob_key=store.put(data),
+                ))
+
+
+def pick_rendition(size=None, width=None):
+    """The smallest rendition that covers the requested size name or pixel width; None means the full image."""
+    if size in RENDITIONS:
+        return size
+    if width:
+        for name, px in RENDITIONS.items():
+            if px >= width:
+                return name
+    return None
+
+
+def accepted_formats(accept):
+    """FORMATS the client named in its Accept header, best first, always ending with JPEG.
+
+    Wildcards don't count: older browsers send image/* without being able to decode WebP.
+    """
+    named = {value for value, quality in accept if quality > 0}
+    return [mime for mime in FORMATS if mime in named or mime == "image/jpeg"]
+
+
+def rendition_variant(image_id, size, accept):
+    """(blob key, mime) of the best stored variant of the image at size for the Accept header, or (None, None)."""
+    stored = dict(db.session.query(ListingImageRendition.mime, ListingImageRendition.blob_key).filter(
+        ListingImageRendition.image_id == image_id, ListingImageRendition.size == size,
+    ))
+    for mime in accepted_formats(accept):
+        if mime in stored:
+            return stored[mime], mime
+    return None, None
+
+
+def build_renditions(batch=BUILD_BATCH):
+    """Create missing variants for images uploaded before they existed (or before a size or
+    format was added), one transaction per batch. Returns the number of images updated."""
+    store = get_blob_store()
+    have = select(func.count(ListingImageRendition.id)).where(
+        ListingImageRendition.image_id == ListingImage.id
+    ).scalar_subquery()
+    updated = 0
+    last_id = ""
+    while True:
+        # Keyset on id, so images that can't be decoded are passed over rather than retried forever
+        rows = db.session.query(ListingImage.id, ListingImage.blob_key, ListingImage.image_data).filter(
+            have < len(VARIANTS), ListingImage.id > last_id,
+        ).order_by(ListingImage.id).limit(batch).all()
+        if not rows:
+            break
+        existing = defaultdict(set)
+        for image_id, size, mime in db.session.query(
+            ListingImageRendition.image_id, ListingImageRendition.size, ListingImageRendition.mime,
+        ).filter(ListingImageRendition.image_id.in_([r.id for r in rows])):
+            existing[image_id].add((size, mime))
+        for image_id, key, data in rows:
+            source = store.get(key) if key else data
+            if not source:
+                continue
+            missing = {
+                size: {mime: out for mime, out in encodings.items() if (size, mime) not in existing[image_id]}
+                for size, encodings in render_image(source).items()
+            }
+            if any((size, mime) in VARIANTS for size, encodings in missing.items() for mime in encodings):
+                add_renditions(image_id, missing)
+                updated += 1
+        db.session.commit()
+        last_id = rows[-1].id
+    return updated
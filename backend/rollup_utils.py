@@ -0,0 +1,111 @@
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event, func, select, delete
+
+from extensions import db
+from models import (
+    Listing, ListingView, Observing, Offer, Conversation, ListingDailyStats, SellerDailyStats,
+)
+
+METRICS = ("views", "observes", "offers", "messages_started")
+
+
+def _upsert(table, keys):
+    """INSERT ... ON CONFLICT DO UPDATE that adds the row's metrics to the existing ones."""
+    if db.engine.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    stmt = insert(table)
+    return stmt.on_conflict_do_update(
+        index_elements=keys,
+        set_={m: table.c[m] + getattr(stmt.excluded, m) for m in METRICS},
+    )
+
+
+def record_daily(conn, rows):
+    """Add per-(listing, day) metric increments to both rollup tables.
+
+    rows: [{"listing_id", "seller_id", "day", <metric>: n, ...}]. conn is a
+    Connection or the session, so callers stay in their own transaction.
+    """
+    if not rows:
+        return
+    listing_rows = [{"listing_id": r["listing_id"], "seller_id": r["seller_id"], "day": r["day"],
+                     **{m: r.get(m, 0) for m in METRICS}} for r in rows]
+    seller_totals = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for r in listing_rows:
+        totals = seller_totals[(r["seller_id"], r["day"])]
+        for m in METRICS:
+            totals[m] += r[m]
+    conn.execute(_upsert(ListingDailyStats.__table__, ["listing_id", "day"]), listing_rows)
+    conn.execute(_upsert(SellerDailyStats.__table__, ["seller_id", "day"]), [
+        {"seller_id": seller_id, "day": day, **totals} for (seller_id, day), totals in seller_totals.items()
+    ])
+
+
+def _day(ts):
+    return (ts or datetime.utcnow()).date()
+
+
+@event.listens_for(Observing, "after_insert")
+def _observe_added(mapper, connection, target):
+    seller_id = connection.execute(select(Listing.user_id).where(Listing.id == target.listing_id)).scalar()
+    if seller_id:
+        record_daily(connection, [{"listing_id": target.listing_id, "seller_id": seller_id,
+                                   "day": _day(target.created_at), "observes": 1}])
+
+
+@event.listens_for(Offer, "after_insert")
+def _offer_added(mapper, connection, target):
+    record_daily(connection, [{"listing_id": target.listing_id, "seller_id": target.seller_id,
+                               "day": _day(target.created_at), "offers": 1}])
+
+
+@event.listens_for(Conversation, "after_insert")
+def _conversation_added(mapper, connection, target):
+    record_daily(connection, [{"listing_id": target.listing_id, "seller_id": target.seller_id,
+                               "day": _day(target.created_at), "messages_started": 1}])
+
+
+def daily_series(days, seller_id=None, listing_id=None):
+    """Zero-filled [{"day", <metrics>}] for the last `days` days (today included)."""
+    table = ListingDailyStats if listing_id else SellerDailyStats
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    query = db.session.query(table).filter(table.day >= since)
+    query = query.filter(table.listing_id == listing_id) if listing_id else query.filter(table.seller_id == seller_id)
+    by_day = {r.day: r for r in query}
+    series = []
+    for i in range(days):
+        day = since + timedelta(days=i)
+        r = by_day.get(day)
+        series.append({"day": day.isoformat(), **{m: getattr(r, m) if r else 0 for m in METRICS}})
+    return series
+
+
+def rebuild_daily_stats():
+    """Recompute both rollup tables from the raw event tables. Returns listing-day rows written."""
+    sources = [
+        ("views", ListingView.listing_id, ListingView.created_at),
+        ("observes", Observing.listing_id, Observing.created_at),
+        ("offers", Offer.listing_id, Offer.created_at),
+        ("messages_started", Conversation.listing_id, Conversation.created_at),
+    ]
+    counts = defaultdict(lambda: dict.fromkeys(METRICS, 0))
+    for metric, listing_col, created_col in sources:
+        day = func.date(created_col)
+        for listing_id, seller_id, d, n in db.session.query(
+            listing_col, Listing.user_id, day, func.count()
+        ).join(Listing, Listing.id == listing_col).group_by(listing_col, Listing.user_id, day):
+            if isinstance(d, str):
+                d = date.fromisoformat(d)
+            counts[(listing_id, seller_id, d)][metric] += n
+
+    db.session.execute(delete(ListingDailyStats))
+    db.session.execute(delete(SellerDailyStats))
+    rows = [{"listing_id": lid, "seller_id": sid, "day": d, **m} for (lid, sid, d), m in counts.items()]
+    for i in range(0, len(rows), 5000):
+        record_daily(db.session, rows[i:i + 5000])
+    db.session.commit()
+    return len(rows)
@@ -3,10 +3,12 @@ from datetime import datetime, timezone, timedelta
 
 from flask import Blueprint, request, jsonify, current_app
 from flask_login import login_required, current_user
-from sqlalchemy import text, func
+from sqlalchemy import func
 
 from extensions import db
-from models import User, Listing, ListingImage, Report, Review, Ad
+from models import User, Listing, ListingImage, Report, Review, Ad, DeletionJob
+from cascade_utils import delete_listings, deletion_job_to_dict, request_user_deletion
+from image_utils import rendition_url
 
 admin_bp = Blueprint("admin", __name__)
 
@@ -84,6 +86,7 @@ def list_users():
             "is_pro": bool(u.is_pro), "is_verified": bool(u.is_verified),
             "is_banned": bool(getattr(u, "is_banned", False)),
             "is_admin": bool(getattr(u, "is_admin", False)),
+            "is_deleting": u.deleted_at is not None,
         } for u in users],
         "total": total,
         "page": page,
@@ -113,59 +116,29 @@ def delete_user(user_id):
     if u.id == current_user.id:
         return jsonify({"error": "Cannot delete yourself"}), 400
 
-    uid = u.id
-
-    # Delete all user's listings and their dependents
-    user_listings = Listing.query.filter_by(user_id=uid).all()
-    for listing in user_listings:
-        lid = listing.id
-        for stmt in [
-            "DELETE FROM boost_impressions WHERE boost_id IN (SELECT id FROM boosts WHERE listing_id=:lid)",
-            "DELETE FROM boosts WHERE listing_id=:lid",
-            "DELETE FROM messages WHERE conversation_id IN (SELECT id FROM conversations WHERE listing_id=:lid)",
-            "DELETE FROM conversations WHERE listing_id=:lid",
-            "DELETE FROM safe_meet_locations WHERE listing_id=:lid",
-            "DELETE FROM safety_ack_events WHERE listing_id=:lid",
-            "DELETE FROM observing WHERE listing_id=:lid",
-            "DELETE FROM notifications WHERE listing_id=:lid",
-            "DELETE FROM offers WHERE listing_id=:lid",
-            "DELETE FROM price_history WHERE listing_id=:lid",
-            "DELETE FROM reviews WHERE listing_id=:lid",
-            "DELETE FROM listing_views WHERE listing_id=:lid",
-            "DELETE FROM meetup_confirmations WHERE listing_id=:lid",
-            "DELETE FROM listing_images WHERE listing_id=:lid",
-            "DELETE FROM reports WHERE listing_id=:lid",
-        ]:
-            db.session.execute(text(stmt), {"lid": lid})
-        db.session.delete(listing)
-
-    # Nullify buyer_id on other people's listings where this user was the buyer
-    db.session.execute(text("UPDATE listings SET buyer_id=NULL WHERE buyer_id=:uid"), {"uid": uid})
-
-    # Delete user-level data (order matters for FK constraints)
-    for stmt in [
-        "DELETE FROM boost_impressions WHERE viewer_user_id=:uid",
-        # Delete ALL messages in conversations involving this user (not just sender)
-        "DELETE FROM messages WHERE conversation_id IN (SELECT id FROM conversations WHERE buyer_id=:uid OR seller_id=:uid)",
-        "DELETE FROM messages WHERE sender_id=:uid",
-        "DELETE FROM conversations WHERE buyer_id=:uid OR seller_id=:uid",
-        "DELETE FROM observing WHERE user_id=:uid",
-        "DELETE FROM notifications WHERE user_id=:uid",
-        "DELETE FROM offers WHERE buyer_id=:uid OR seller_id=:uid",
-        "DELETE FROM reviews WHERE reviewer_id=:uid OR seller_id=:uid",
-        "DELETE FROM reports WHERE reporter_id=:uid OR reported_user_id=:uid OR resolved_by=:uid",
-        "DELETE FROM safety_ack_events WHERE user_id=:uid",
-        "DELETE FROM saved_searches WHERE user_id=:uid",
-        "DELETE FROM subscriptions WHERE user_id=:uid",
-        "DELETE FROM push_subscriptions WHERE user_id=:uid",
-        "DELETE FROM blocked_users WHERE blocker_id=:uid OR blocked_id=:uid",
-        "DELETE FROM listing_views WHERE viewer_id=:uid",
-    ]:
-        db.session.execute(text(stmt), {"uid": uid})
-
-    db.session.delete(u)
-    db.session.commit()
-    return jsonify({"ok": True})
+    # Tombstone now and purge in the background; large accounts take many batches
+    job = request_user_deletion(u, requested_by=current_user.id)
+    return jsonify({"ok": True, "job": deletion_job_to_dict(job)}), 202
+
+
+@admin_bp.get("/deletion-jobs")
+@admin_required
+def list_deletion_jobs():
+    query = DeletionJob.query
+    status = request.args.get("status")
+    if status:
+        query = query.filter_by(status=status)
+    jobs = query.order_by(DeletionJob.created_at.desc()).limit(50).all()
+    return jsonify({"jobs": [deletion_job_to_dict(j) for j in jobs]})
+
+
+@admin_bp.get("/deletion-jobs/<job_id>")
+@admin_required
+def get_deletion_job(job_id):
+    job = db.session.get(DeletionJob, job_id)
+    if not job:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": deletion_job_to_dict(job)})
 
 
 @admin_bp.post("/users/<user_id>/toggle-pro")
@@ -209,14 +182,14 @@ def list_listings():
 
     result = []
     for l in listings:
-        img = ListingImage.query.filter_by(listing_id=l.id).first()
+        img = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.position.asc()).first()
         seller = db.session.get(User, l.user_id)
         result.append({
             "id": l.id, "title": l.title,
             "price_cents": l.price_cents, "category": l.category,
             "is_sold": l.is_sold, "is_draft": l.is_draft,
             "created_at": l.created_at.isoformat() if l.created_at else None,
-            "image_url": img.image_url if img else None,
+            "image_url": rendition_url(img.image_url, "thumb") if img else None,
             "seller_email": seller.email if seller else None,
         })
 
@@ -230,33 +203,7 @@ def delete_listing(listing_id):
     if not listing:
         return jsonify({"error": "Listing not found"}), 404
 
-    # Cascade delete dependents
-    for tbl, col in [
-        ("boost_impressions", "boost_id IN (SELECT id FROM boosts WHERE listing_id=:lid)"),
-        ("boosts", "listing_id=:lid"),
-        ("messages", "conversation_id IN (SELECT id FROM conversations WHERE listing_id=:lid)"),
-        ("conversations", "listing_id=:lid"),
-        ("safe_meet_locations", "listing_id=:lid"),
-        ("safety_ack_events", "listing_id=:lid"),
-        ("observing", "listing_id=:lid"),
-        ("notifications", "listing_id=:lid"),
-        ("offers", "listing_id=:lid"),
-        ("price_history", "listing_id=:lid"),
-        ("reviews", "listing_id=:lid"),
-        ("listing_views", "listing_id=:lid"),
-        ("meetup_confirmations", "listing_id=:lid"),
-        ("listing_images", "listing_id=:lid"),
-    ]:
-        try:
-            db.session.execute(text(f"DELETE FROM {tbl} WHERE {col}"), {"lid": listing_id})
-        except Exception:
-            db.session.rollback()
-    try:
-        db.session.execute(text("DELETE FROM reports WHERE listing_id=:lid"), {"lid": listing_id})
-    except Exception:
-        db.session.rollback()
-
-    db.session.delete(listing)
+    delete_listings([listing.id])
     db.session.commit()
     return jsonify({"ok": True})
 
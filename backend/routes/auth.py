@@ -9,6 +9,7 @@ from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
 from extensions import db, limiter
 from models import User
 from email_utils import send_welcome, send_password_reset, send_verification_email
+from blob_utils import IMMUTABLE_MAX_AGE, blob_key, get_blob_store, hashed_url, mark_immutable, url_digest
 
 auth_bp = Blueprint("auth", __name__)
 
@@ -85,7 +86,7 @@ def login():
     password = data.get("password") or ""
 
     u = User.query.filter_by(email=email).first()
-    if not u or not u.password_hash or not u.check_password(password):
+    if not u or u.deleted_at or not u.password_hash or not u.check_password(password):
         return jsonify({"error": "Invalid credentials"}), 401
 
     login_user(u)
@@ -109,20 +110,31 @@ def upload_avatar():
     if ext not in mime_map:
         return jsonify({"error": "Only jpg/jpeg/png/webp allowed"}), 400
 
-    current_user.avatar_data = f.read()
+    current_user.avatar_key = get_blob_store().put(f.read())
+    current_user.avatar_data = None
     current_user.avatar_mime = mime_map[ext]
-    current_user.avatar_url = f"/api/auth/avatars/{current_user.id}"
+    current_user.avatar_url = hashed_url(f"/api/auth/avatars/{current_user.id}", current_user.avatar_key)
     db.session.commit()
 
     return jsonify({"ok": True, "avatar_url": current_user.avatar_url}), 200
 
 
 @auth_bp.get("/avatars/<path:user_id>")
-def serve_avatar(user_id):
+@auth_bp.get("/avatars/<user_id>/<digest>")
+def serve_avatar(user_id, digest=None):
+    """The user's current avatar. Immutable under the hashed URL of that avatar; an old
+    hashed URL or the bare one gets the current picture with a short max-age."""
     u = db.session.get(User, user_id)
-    if not u or not u.avatar_data:
-        return jsonify({"error": "Not found"}), 404
-    return Response(u.avatar_data, mimetype=u.avatar_mime, headers={"Cache-Control": "public, max-age=3600"})
+    if u and u.avatar_key:
+        current = digest == url_digest(u.avatar_key)
+        resp = get_blob_store().send(u.avatar_key, u.avatar_mime, max_age=IMMUTABLE_MAX_AGE if current else 3600)
+        if resp:
+            return mark_immutable(resp) if current else resp
+    elif u and u.avatar_data:
+        resp = Response(u.avatar_data, mimetype=u.avatar_mime, headers={"Cache-Control": "public, max-age=3600"})
+        resp.set_etag(blob_key(u.avatar_data))
+        return resp.make_conditional(request)
+    return jsonify({"error": "Not found"}), 404
 
 
 @auth_bp.post("/forgot")
@@ -132,7 +144,7 @@ def forgot():
     email = (data.get("email") or "").strip().lower()
 
     u = User.query.filter_by(email=email).first()
-    if not u:
+    if not u or u.deleted_at:
         return jsonify({"ok": True}), 200
 
     token = _serializer().dumps({"user_id": u.id})
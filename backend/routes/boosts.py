@@ -7,6 +7,9 @@ from flask_login import current_user, login_required
 
 from extensions import db
 from models import Boost, BoostImpression, Listing, ListingImage, Subscription, User
+from image_utils import rendition_url
+from ranking_utils import refresh_rank_scores
+from cascade_utils import seller_active
 
 boosts_bp = Blueprint("boosts", __name__)
 
@@ -52,13 +55,18 @@ def _seconds_until_reset():
     return int((midnight - now).total_seconds())
 
 
-def _expire_stale_boosts():
-    """Expire any boosts past their ends_at. Called before boost operations."""
+def _expire_stale_boosts(listing_id=None):
+    """Expire boosts past their ends_at in one UPDATE. Reads treat them as expired
+    already, so this only runs from write paths and the expire-boosts cron."""
     now = datetime.utcnow()
-    count = Boost.query.filter(
-        Boost.status == "active", Boost.ends_at <= now,
-    ).update({"status": "expired"})
+    query = Boost.query.filter(Boost.status == "active", Boost.ends_at <= now)
+    if listing_id:
+        query = query.filter(Boost.listing_id == listing_id)
+    listing_ids = [lid for (lid,) in query.with_entities(Boost.listing_id)]
+    count = query.update({"status": "expired"}, synchronize_session=False)
     if count:
+        # A bulk UPDATE skips the Boost mapper events, so take the ranking bonus away here
+        refresh_rank_scores(Listing.id.in_(listing_ids))
         db.session.commit()
     return count
 
@@ -71,6 +79,7 @@ def _listing_to_dict(l, imgs, seller, boost_ends_at=None):
         "price_cents": l.price_cents,
         "is_sold": l.is_sold,
         "images": [i.image_url for i in imgs],
+        "thumbnail": rendition_url(imgs[0].image_url, "card") if imgs else None,
         "is_pro_seller": bool(seller and seller.is_pro),
         "created_at": l.created_at.isoformat(),
     }
@@ -83,10 +92,9 @@ def _listing_to_dict(l, imgs, seller, boost_ends_at=None):
 def featured():
     global _rotation_offset
     now = datetime.utcnow()
-    _expire_stale_boosts()
 
-    active = Boost.query.filter(
-        Boost.status == "active", Boost.ends_at > now,
+    active = Boost.query.join(Listing, Listing.id == Boost.listing_id).filter(
+        Boost.status == "active", Boost.ends_at > now, seller_active(),
     ).order_by(Boost.created_at.asc()).all()
 
     # ── Weighted selection ──
@@ -138,7 +146,7 @@ def featured():
         l = db.session.get(Listing, lid)
         if not l:
             continue
-        imgs = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.created_at.asc()).all()
+        imgs = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.position.asc()).all()
         seller = db.session.get(User, l.user_id)
         featured_listings.append(_listing_to_dict(l, imgs, seller, boost_ends_map.get(lid)))
 
@@ -164,7 +172,6 @@ def durations():
 @login_required
 def boost_status():
     """Return Pro boost status: whether free boost is available, countdown, etc."""
-    _expire_stale_boosts()
     is_pro = current_user.is_pro
     free_available = _free_boost_available(current_user)
     countdown_seconds = 0 if free_available else _seconds_until_reset()
@@ -195,7 +202,6 @@ def boost_rules():
 @login_required
 def activate_boost():
     """Activate a FREE daily Pro boost only. Paid boosts go through /create-checkout."""
-    _expire_stale_boosts()
     data = request.get_json(force=True)
     listing_id = data.get("listing_id")
 
@@ -226,6 +232,9 @@ def activate_boost():
     if existing:
         return jsonify({"error": "This listing already has an active boost"}), 409
 
+    # Free up the partial unique index if an old boost for this listing hasn't been swept yet
+    _expire_stale_boosts(listing_id)
+
     boost = Boost(
         listing_id=listing_id,
         starts_at=now,
@@ -256,7 +265,6 @@ def activate_boost():
 @login_required
 def create_boost_checkout():
     """Create a Stripe Checkout session for a paid boost."""
-    _expire_stale_boosts()
     stripe.api_key = current_app.config["STRIPE_SECRET_KEY"]
 
     data = request.get_json(force=True)
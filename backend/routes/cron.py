@@ -4,6 +4,10 @@ from datetime import datetime, timedelta
 from extensions import db
 from models import Listing, Offer, User
 from email_utils import send_stale_listing_nudge
+from counter_utils import reconcile_counters
+from cascade_utils import resume_deletion_jobs
+from blob_utils import sweep_blobs
+from .boosts import _expire_stale_boosts
 
 cron_bp = Blueprint("cron", __name__)
 
@@ -38,3 +42,40 @@ def nudge_stale_listings():
 
     db.session.commit()
     return jsonify({"ok": True, "stale_found": len(stale), "nudged": nudged}), 200
+
+
+@cron_bp.post("/expire-boosts")
+def expire_boosts():
+    if request.headers.get("X-Cron-Secret") != current_app.config.get("CRON_SECRET"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    expired = _expire_stale_boosts()
+    return jsonify({"ok": True, "expired": expired}), 200
+
+
+@cron_bp.post("/reconcile-counters")
+def reconcile_listing_counters():
+    if request.headers.get("X-Cron-Secret") != current_app.config.get("CRON_SECRET"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    fixed = reconcile_counters()
+    return jsonify({"ok": True, "fixed": fixed}), 200
+
+
+@cron_bp.post("/resume-deletions")
+def resume_account_deletions():
+    if request.headers.get("X-Cron-Secret") != current_app.config.get("CRON_SECRET"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    pending = resume_deletion_jobs()
+    return jsonify({"ok": True, "pending": pending}), 200
+
+
+@cron_bp.post("/sweep-blobs")
+def sweep_unused_blobs():
+    if request.headers.get("X-Cron-Secret") != current_app.config.get("CRON_SECRET"):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    removed = sweep_blobs()
+    return jsonify({"ok": True, "removed": removed}), 200
+
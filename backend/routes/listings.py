@@ -1,74 +1,233 @@
 import os
+import json
 import uuid
+import base64
+from collections import defaultdict
 from datetime import datetime, timedelta, timezone
-from flask import Blueprint, request, jsonify, current_app, send_from_directory, Response
+from flask import Blueprint, request, jsonify, current_app, send_from_directory, Response, session
 from flask_login import login_required, current_user
 
-from sqlalchemy import func
+from sqlalchemy import func, case
 from extensions import db
+from cache_utils import TTLCache, bump_listing_version, listing_etag, not_modified, with_etag
+from blob_utils import IMMUTABLE_MAX_AGE, blob_key, get_blob_store, hashed_url, mark_immutable, url_digest
+from cascade_utils import delete_listings, seller_active, DELETE_CHUNK
+from geo_utils import apply_radius_filter, distance_key, haversine_km, MAX_RADIUS_KM
+from image_utils import render_images, rendition_url
+from ranking_utils import rank_key
+from rendition_utils import accepted_formats, add_renditions, pick_rendition, rendition_variant
+from notify_utils import enqueue_price_drop, notify_observers
+from rollup_utils import daily_series, METRICS
+from search_utils import apply_text_search, fuzzy_search, search_key, suggest_query, FUZZY_MIN_RESULTS
+from similar_utils import index_listing
+from sketch_utils import HyperLogLog
+from view_utils import record_view
 from models import (
-    Listing, ListingImage, SafeMeetLocation, Boost, BoostImpression,
-    Observing, Notification, User, PriceHistory, ListingView,
-    Conversation, Message, SafetyAckEvent, Offer, Report, Review, MeetupConfirmation,
+    Listing, ListingImage, SafeMeetLocation, Boost, User, PriceHistory, MeetupConfirmation, ListingNeighbor,
+    SellerDailyStats,
 )
 
 listings_bp = Blueprint("listings", __name__)
 
 def _listing_to_dict(l: Listing):
-    imgs = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.created_at.asc()).all()
-    meet = SafeMeetLocation.query.filter_by(listing_id=l.id).first()
-    # Expire stale boosts for this listing so is_boosted is accurate
+    return _listings_to_dicts([l])[0]
+
+
+def _listings_to_dicts(listings):
+    """Serialize many listings with a fixed number of grouped queries."""
+    if not listings:
+        return []
+    ids = [l.id for l in listings]
     now = datetime.utcnow()
-    stale = Boost.query.filter(
-        Boost.listing_id == l.id, Boost.status == "active", Boost.ends_at <= now,
-    ).update({"status": "expired"})
-    if stale:
-        db.session.commit()
-    active_boost = Boost.query.filter(
-        Boost.listing_id == l.id,
+
+    images = defaultdict(list)
+    for listing_id, image_url in db.session.query(ListingImage.listing_id, ListingImage.image_url).filter(
+        ListingImage.listing_id.in_(ids)
+    ).order_by(ListingImage.position.asc()):
+        images[listing_id].append(image_url)
+
+    meets = {}
+    for m in SafeMeetLocation.query.filter(SafeMeetLocation.listing_id.in_(ids)):
+        meets.setdefault(m.listing_id, m)
+
+    # Boosts past ends_at count as expired here; /api/cron/expire-boosts flips their status
+    boost_ends = {}
+    for listing_id, ends_at in db.session.query(Boost.listing_id, Boost.ends_at).filter(
+        Boost.listing_id.in_(ids),
         Boost.status == "active",
-        Boost.ends_at > now
-    ).first()
-    observing_count = db.session.query(func.count(Observing.id)).filter_by(listing_id=l.id).scalar()
-    view_count = db.session.query(func.count(ListingView.id)).filter_by(listing_id=l.id).scalar()
+        Boost.ends_at > now,
+    ):
+        boost_ends.setdefault(listing_id, ends_at)
+
+    seller_ids = {l.user_id for l in listings}
+    sellers = {u.id: u for u in User.query.filter(User.id.in_(seller_ids))}
+
+    result = []
+    for l in listings:
+        seller = sellers.get(l.user_id)
+        meet = meets.get(l.id)
+        ends_at = boost_ends.get(l.id)
+        result.append({
+            "id": l.id,
+            "user_id": l.user_id,
+            "seller_name": (seller.display_name or seller.email) if seller else "Unknown",
+            "seller_avatar": seller.avatar_url if seller else None,
+            "title": l.title,
+            "description": l.description,
+            "price_cents": l.price_cents,
+            "category": l.category,
+            "condition": l.condition,
+            "city": l.city,
+            "zip": l.zip,
+            "lat": l.lat,
+            "lng": l.lng,
+            "pickup_or_shipping": l.pickup_or_shipping,
+            "is_sold": l.is_sold,
+            "created_at": l.created_at.isoformat(),
+            "images": images.get(l.id, []),
+            "thumbnail": rendition_url(images[l.id][0], "card") if images.get(l.id) else None,
+            "safe_meet": None if not meet else {
+                "place_name": meet.place_name,
+                "address": meet.address,
+                "lat": float(meet.lat),
+                "lng": float(meet.lng),
+                "place_type": meet.place_type
+            },
+            "renewed_at": l.renewed_at.isoformat() if l.renewed_at else None,
+            "bundle_discount_pct": l.bundle_discount_pct,
+            "is_boosted": ends_at is not None,
+            "boost_ends_at": ends_at.isoformat() if ends_at else None,
+            "observing_count": l.observing_count,
+            "view_count": l.view_count,
+            "unique_viewers": l.unique_viewers,
+            "is_pro_seller": bool(seller and seller.is_pro),
+            "is_verified_seller": bool(seller and seller.is_verified),
+            "seller_rating_avg": float(seller.rating_avg) if seller and seller.rating_avg else 0,
+            "seller_rating_count": seller.rating_count if seller else 0,
+        })
+    return result
+
+
+def _within(lat, lng, radius_km):
+    """_paginate keep predicate: the exact radius check apply_radius_filter's SQL bound approximates."""
+    return lambda l: haversine_km(lat, lng, l.lat, l.lng) <= radius_km
+
+
+def _radius_error(radius_km):
+    """400 response for a radius_km apply_radius_filter can't serve, else None."""
+    if not 0 < radius_km <= MAX_RADIUS_KM:     # also rejects nan
+        return jsonify({"error": f"radius_km must be > 0 and <= {MAX_RADIUS_KM}"}), 400
+    return None
+
+
+def _reindex_similar(listing_id):
+    """Update the similar-listings index after a commit. The listing is already saved, so a
+    failure here is logged rather than failing the request; rebuild-similar repairs it."""
+    try:
+        index_listing(listing_id)
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception(f"Similar-listings index update failed for {listing_id}")
+
+
+def _with_distances(dicts, lat, lng, radius_km):
+    """Add exact distance_km to each card, dropping the few the SQL approximation let past radius_km."""
+    result = []
+    for d in dicts:
+        km = haversine_km(lat, lng, d["lat"], d["lng"])
+        if km <= radius_km:
+            d["distance_km"] = round(km, 2)
+            result.append(d)
+    return result
+
+
+# (label, min cents inclusive, max cents exclusive) for the price facet
+PRICE_BUCKETS = [
+    ("under_25", 0, 2500),
+    ("25_50", 2500, 5000),
+    ("50_100", 5000, 10000),
+    ("100_250", 10000, 25000),
+    ("250_500", 25000, 50000),
+    ("500_plus", 50000, None),
+]
+FACET_CACHE_TTL = 30            # seconds a facet result is reused for the same filters
+SIMILAR_SHOWN = 6
+STATS_RECENT_DAYS = 30
+STATS_SERIES_DAYS = (7, 30, 90)
+
+_facet_cache = TTLCache(FACET_CACHE_TTL)
+
+# sort mode -> (key expression, descending); id breaks ties
+SORT_KEYS = {
+    "newest": (func.coalesce(Listing.renewed_at, Listing.created_at), True),
+    "oldest": (Listing.created_at, False),
+    "price_low": (Listing.price_cents, False),
+    "price_high": (Listing.price_cents, True),
+}
+DEFAULT_SORT_KEY = (Listing.created_at, True)
+
+
+def _encode_cursor(sort, value, listing_id):
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([sort, value, listing_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_cursor(sort, cursor):
+    """Return (key value, listing id) from a cursor; ValueError if it's bad or from another sort."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        cursor_sort, value, last_id = json.loads(raw)
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if cursor_sort != sort or not isinstance(last_id, str):
+        raise ValueError("Invalid cursor")
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, (int, float)):
+        raise ValueError("Invalid cursor")
+    return value, last_id
+
+
+def _paginate(query, sort, page, per_page, cursor=None, sort_key=None, keep=None):
+    """Fetch one page in sort order. Returns (rows, has_more, next_cursor).
+
+    With a cursor the page starts right after the previous page's last row
+    (keyset), so deep pages cost the same as the first one. Without one it
+    falls back to OFFSET paging for older clients. sort_key overrides the
+    SORT_KEYS entry for computed orders such as search relevance. Rows that
+    fail keep(listing) are dropped and more are fetched until the page is full.
+    """
+    col, desc = sort_key or SORT_KEYS.get(sort, DEFAULT_SORT_KEY)
+    query = query.add_columns(col.label("sort_key"))
+    if desc:
+        query = query.order_by(col.desc(), Listing.id.desc())
+    else:
+        query = query.order_by(col.asc(), Listing.id.asc())
+
+    def after(value, last_id):
+        if desc:
+            return query.filter(db.or_(col < value, db.and_(col == value, Listing.id < last_id)))
+        return query.filter(db.or_(col > value, db.and_(col == value, Listing.id > last_id)))
+
+    if cursor:
+        batch_query = after(*_decode_cursor(sort, cursor))
+    else:
+        batch_query = query.offset((page - 1) * per_page)
+
+    rows = []
+    while True:
+        batch = batch_query.limit(per_page + 1).all()
+        rows += [r for r in batch if keep is None or keep(r[0])]
+        if len(rows) > per_page or len(batch) <= per_page:
+            break
+        batch_query = after(batch[-1].sort_key, batch[-1][0].id)
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    next_cursor = _encode_cursor(sort, rows[-1].sort_key, rows[-1][0].id) if has_more else None
+    return [r[0] for r in rows], has_more, next_cursor
 
-    seller = db.session.get(User, l.user_id)
-    return {
-        "id": l.id,
-        "user_id": l.user_id,
-        "seller_name": (seller.display_name or seller.email) if seller else "Unknown",
-        "seller_avatar": seller.avatar_url if seller else None,
-        "title": l.title,
-        "description": l.description,
-        "price_cents": l.price_cents,
-        "category": l.category,
-        "condition": l.condition,
-        "city": l.city,
-        "zip": l.zip,
-        "lat": l.lat,
-        "lng": l.lng,
-        "pickup_or_shipping": l.pickup_or_shipping,
-        "is_sold": l.is_sold,
-        "created_at": l.created_at.isoformat(),
-        "images": [i.image_url for i in imgs],
-        "safe_meet": None if not meet else {
-            "place_name": meet.place_name,
-            "address": meet.address,
-            "lat": float(meet.lat),
-            "lng": float(meet.lng),
-            "place_type": meet.place_type
-        },
-        "renewed_at": l.renewed_at.isoformat() if l.renewed_at else None,
-        "bundle_discount_pct": l.bundle_discount_pct,
-        "is_boosted": bool(active_boost),
-        "boost_ends_at": active_boost.ends_at.isoformat() if active_boost else None,
-        "observing_count": observing_count,
-        "view_count": view_count,
-        "is_pro_seller": bool(seller and seller.is_pro),
-        "is_verified_seller": bool(seller and seller.is_verified),
-        "seller_rating_avg": float(seller.rating_avg) if seller and seller.rating_avg else 0,
-        "seller_rating_count": seller.rating_count if seller else 0,
-    }
 
 @listings_bp.get("/uploads/<path:filename>")
 def uploads(filename):
@@ -77,63 +236,117 @@ def uploads(filename):
 
 
 @listings_bp.get("/image/<image_id>")
-def serve_image(image_id):
-    """Serve listing image from database storage."""
-    img = db.session.get(ListingImage, image_id)
-    if not img or not img.image_data:
+@listings_bp.get("/image/<image_id>/<digest>")
+def serve_image(image_id, digest=None):
+    """Serve listing image from the blob store (or the database, until migrate-blobs has moved it).
+
+    ?size=thumb|card or ?w=<px> picks the smallest rendition that covers it, and the Accept
+    header picks AVIF/WebP over JPEG where stored. Images without those variants yet fall
+    back to the full-size JPEG. The hashed URL the serializers emit is cached as immutable
+    when its digest matches the image and the client got the size and format it asked for;
+    a fallback would change once build-renditions fills the gap. The bare URL is kept for
+    old links.
+    """
+    size = pick_rendition(request.args.get("size"), request.args.get("w", type=int)) or "full"
+    preferred = accepted_formats(request.accept_mimetypes)[0]
+    key, mime = rendition_variant(image_id, size, request.accept_mimetypes)
+    lookup = db.session.query(ListingImage.blob_key, ListingImage.image_mime).filter(ListingImage.id == image_id)
+    row = lookup.first() if digest or not key else None
+    current = bool(digest and row and row.blob_key and digest == url_digest(row.blob_key))
+
+    resp = None
+    if key:
+        immutable = current and mime == preferred
+        resp = get_blob_store().send(key, mime, max_age=IMMUTABLE_MAX_AGE if immutable else 86400)
+    if resp is None:
+        # The stored full-size JPEG is the exact variant only when that is what was asked for
+        immutable = current and size == "full" and preferred == "image/jpeg"
+        if row is None:
+            row = lookup.first()
+        if row and row.blob_key:
+            resp = get_blob_store().send(row.blob_key, row.image_mime or "image/jpeg",
+                                         max_age=IMMUTABLE_MAX_AGE if immutable else 86400)
+        elif row:
+            data = db.session.query(ListingImage.image_data).filter(ListingImage.id == image_id).scalar()
+            if data:
+                resp = Response(
+                    data,
+                    mimetype=row.image_mime or "image/jpeg",
+                    headers={"Cache-Control": "public, max-age=86400"},
+                )
+                resp.set_etag(blob_key(data))
+                resp.make_conditional(request)
+    if resp is None:
         return jsonify({"error": "Not found"}), 404
-    return Response(
-        img.image_data,
-        mimetype=img.image_mime or "image/jpeg",
-        headers={"Cache-Control": "public, max-age=86400"},
-    )
+    if immutable:
+        mark_immutable(resp)
+    # The same URL answers with different formats, so caches must key on Accept too
+    resp.vary.add("Accept")
+    return resp
 
 @listings_bp.get("/mine")
 @login_required
 def my_listings():
     rows = Listing.query.filter_by(user_id=current_user.id).order_by(Listing.created_at.desc()).all()
-    return jsonify({"listings": [_listing_to_dict(l) for l in rows]}), 200
+    return jsonify({"listings": _listings_to_dicts(rows)}), 200
 
 
 @listings_bp.get("/purchases")
 @login_required
 def purchases():
     rows = Listing.query.filter_by(buyer_id=current_user.id).order_by(Listing.created_at.desc()).all()
-    return jsonify({"purchases": [_listing_to_dict(l) for l in rows]}), 200
+    return jsonify({"purchases": _listings_to_dicts(rows)}), 200
 
 
 @listings_bp.get("/my-stats")
 @login_required
 def my_stats():
-    listings = Listing.query.filter_by(user_id=current_user.id, is_draft=False).all()
-    total_listed = len(listings)
-    total_sold = sum(1 for l in listings if l.is_sold)
-    total_earned = sum(l.price_cents for l in listings if l.is_sold)
-    active = sum(1 for l in listings if not l.is_sold)
-
-    listing_ids = [l.id for l in listings]
-    total_views = 0
-    if listing_ids:
-        total_views = db.session.query(func.count(ListingView.id)).filter(
-            ListingView.listing_id.in_(listing_ids)
-        ).scalar() or 0
+    total_listed, total_sold, total_earned, total_views = db.session.query(
+        func.count(Listing.id),
+        func.coalesce(func.sum(case((Listing.is_sold == True, 1), else_=0)), 0),
+        func.coalesce(func.sum(case((Listing.is_sold == True, Listing.price_cents), else_=0)), 0),
+        func.coalesce(func.sum(Listing.view_count), 0),
+    ).filter(Listing.user_id == current_user.id, Listing.is_draft == False).one()
+
+    sketch = db.session.query(User.viewer_sketch).filter(User.id == current_user.id).scalar()
+
+    since = datetime.utcnow().date() - timedelta(days=STATS_RECENT_DAYS - 1)
+    recent = db.session.query(*[func.coalesce(func.sum(getattr(SellerDailyStats, m)), 0) for m in METRICS]).filter(
+        SellerDailyStats.seller_id == current_user.id, SellerDailyStats.day >= since,
+    ).one()
 
     return jsonify({
         "stats": {
             "total_listed": total_listed,
-            "total_sold": total_sold,
-            "total_earned_cents": total_earned,
-            "active": active,
-            "total_views": total_views,
+            "total_sold": int(total_sold),
+            "total_earned_cents": int(total_earned),
+            "active": total_listed - int(total_sold),
+            "total_views": int(total_views),
+            "unique_viewers": HyperLogLog(sketch).count() if sketch else 0,
+            f"last_{STATS_RECENT_DAYS}_days": dict(zip(METRICS, map(int, recent))),
         }
     }), 200
 
 
+@listings_bp.get("/my-stats/daily")
+@login_required
+def my_stats_daily():
+    days = request.args.get("days", 30, type=int)
+    if days not in STATS_SERIES_DAYS:
+        return jsonify({"error": f"days must be one of {list(STATS_SERIES_DAYS)}"}), 400
+    listing_id = request.args.get("listing_id")
+    if listing_id:
+        l = db.session.get(Listing, listing_id)
+        if not l or l.user_id != current_user.id:
+            return jsonify({"error": "Not found"}), 404
+    return jsonify({"days": daily_series(days, seller_id=current_user.id, listing_id=listing_id)}), 200
+
+
 @listings_bp.get("/drafts")
 @login_required
 def my_drafts():
     rows = Listing.query.filter_by(user_id=current_user.id, is_draft=True).order_by(Listing.created_at.desc()).all()
-    return jsonify({"listings": [_listing_to_dict(l) for l in rows]}), 200
+    return jsonify({"listings": _listings_to_dicts(rows)}), 200
 
 
 @listings_bp.post("/bulk")
@@ -145,38 +358,20 @@ def bulk_action():
     if not ids or action not in ("sold", "delete", "renew"):
         return jsonify({"error": "Invalid action or no listings"}), 400
 
-    count = 0
-    for lid in ids:
-        l = db.session.get(Listing, lid)
-        if not l or l.user_id != current_user.id:
-            continue
+    owned = []
+    for i in range(0, len(ids), DELETE_CHUNK):
+        owned += Listing.query.filter(
+            Listing.id.in_(ids[i:i + DELETE_CHUNK]), Listing.user_id == current_user.id
+        ).all()
+
+    if action == "delete":
+        delete_listings([l.id for l in owned])
+    for l in owned:
         if action == "sold":
             l.is_sold = True
-        elif action == "delete":
-            # Clean up all FK references before deleting
-            boost_ids = [b.id for b in Boost.query.filter_by(listing_id=l.id).all()]
-            if boost_ids:
-                BoostImpression.query.filter(BoostImpression.boost_id.in_(boost_ids)).delete(synchronize_session=False)
-            Boost.query.filter_by(listing_id=l.id).delete()
-            conv_ids = [c.id for c in Conversation.query.filter_by(listing_id=l.id).all()]
-            if conv_ids:
-                Message.query.filter(Message.conversation_id.in_(conv_ids)).delete(synchronize_session=False)
-            Conversation.query.filter_by(listing_id=l.id).delete()
-            ListingImage.query.filter_by(listing_id=l.id).delete()
-            SafeMeetLocation.query.filter_by(listing_id=l.id).delete()
-            SafetyAckEvent.query.filter_by(listing_id=l.id).delete()
-            Observing.query.filter_by(listing_id=l.id).delete()
-            Notification.query.filter_by(listing_id=l.id).delete()
-            Offer.query.filter_by(listing_id=l.id).delete()
-            PriceHistory.query.filter_by(listing_id=l.id).delete()
-            Review.query.filter_by(listing_id=l.id).delete()
-            Report.query.filter_by(listing_id=l.id).delete()
-            ListingView.query.filter_by(listing_id=l.id).delete()
-            MeetupConfirmation.query.filter_by(listing_id=l.id).delete()
-            db.session.delete(l)
         elif action == "renew":
             l.renewed_at = datetime.utcnow()
-        count += 1
+    count = len(owned)
 
     db.session.commit()
     return jsonify({"ok": True, "affected": count}), 200
@@ -215,79 +410,173 @@ def confirm_meetup(token):
     }), 200
 
 
+def _search_filters(args):
+    """Search filters from request args, shared by search() and search_facets()
+    so the facet counts always describe the results next to them."""
+    lat = args.get("lat", type=float)
+    lng = args.get("lng", type=float)
+    return {
+        "q": (args.get("q") or "").strip(),
+        "category": (args.get("category") or "").strip(),
+        "city": (args.get("city") or "").strip(),
+        "zip": (args.get("zip") or "").strip(),
+        "condition": (args.get("condition") or "").strip().lower(),
+        "min_price": args.get("min_price", type=float),
+        "max_price": args.get("max_price", type=float),
+        "has_safe_meet": args.get("has_safe_meet") == "1",
+        "lat": lat if lng is not None else None,
+        "lng": lng if lat is not None else None,
+        "radius_km": args.get("radius_km", 50, type=float),
+    }
+
+
+def _search_query(f, skip=()):
+    """Listing query for a filter dict from _search_filters, text match excluded.
+
+    Filters named in skip are left out (used for per-facet counts).
+    """
+    query = Listing.query.filter(Listing.is_sold == False, Listing.is_draft == False, seller_active())
+
+    if f["category"] and "category" not in skip:
+        query = query.filter(Listing.category == f["category"])
+    if f["city"]:
+        query = query.filter(Listing.city.ilike(f"%{f['city']}%"))
+    if f["zip"]:
+        query = query.filter(Listing.zip == f["zip"])
+    if f["condition"] and "condition" not in skip:
+        query = query.filter(Listing.condition.ilike(f["condition"]))
+    if f["min_price"] is not None:
+        query = query.filter(Listing.price_cents >= int(f["min_price"] * 100))
+    if f["max_price"] is not None:
+        query = query.filter(Listing.price_cents <= int(f["max_price"] * 100))
+
+    if f["has_safe_meet"]:
+        query = query.filter(
+            db.session.query(SafeMeetLocation).filter(
+                SafeMeetLocation.listing_id == Listing.id
+            ).exists()
+        )
+
+    if f["lat"] is not None:
+        query = apply_radius_filter(query, f["lat"], f["lng"], f["radius_km"])
+    return query
+
+
 @listings_bp.get("/search")
 def search():
-    q = (request.args.get("q") or "").strip()
-    category = (request.args.get("category") or "").strip()
-    city = (request.args.get("city") or "").strip()
-    zip_code = (request.args.get("zip") or "").strip()
-    condition = (request.args.get("condition") or "").strip()
-    min_price = request.args.get("min_price", type=float)
-    max_price = request.args.get("max_price", type=float)
+    f = _search_filters(request.args)
+    error = _radius_error(f["radius_km"])
+    if error:
+        return error
+    q = f["q"]
     sort = (request.args.get("sort") or "newest").strip()
     page = max(int(request.args.get("page", 1)), 1)
     per_page = min(max(int(request.args.get("per_page", 20)), 1), 100)
 
-    query = Listing.query.filter(Listing.is_sold == False, Listing.is_draft == False)
+    user_lat, user_lng, radius_km = f["lat"], f["lng"], f["radius_km"]
+    has_origin = user_lat is not None
 
+    filtered = query = _search_query(f)
+    sort_key = None
     if q:
-        query = query.filter(
-            db.or_(
-                Listing.title.ilike(f"%{q}%"),
-                Listing.description.ilike(f"%{q}%"),
-            )
-        )
-    if category:
-        query = query.filter_by(category=category)
-    if city:
-        query = query.filter(Listing.city.ilike(f"%{city}%"))
-    if zip_code:
-        query = query.filter(Listing.zip == zip_code)
-    if condition:
-        query = query.filter(Listing.condition.ilike(condition))
-    if min_price is not None:
-        query = query.filter(Listing.price_cents >= int(min_price * 100))
-    if max_price is not None:
-        query = query.filter(Listing.price_cents <= int(max_price * 100))
-
-    has_safe_meet = request.args.get("has_safe_meet") == "1"
-    if has_safe_meet:
-        query = query.filter(
-            db.session.query(SafeMeetLocation).filter(
-                SafeMeetLocation.listing_id == Listing.id
-            ).exists()
+        query, rank = apply_text_search(filtered, q)
+        if sort == "relevance" and rank is not None:
+            sort_key = (rank, True)
+    if sort == "relevance" and sort_key is None:
+        sort = "newest"
+    if sort == "distance":
+        if has_origin:
+            sort_key = (distance_key(user_lat, user_lng), False)
+        else:
+            sort = "newest"
+    if sort_key is None and sort not in SORT_KEYS:
+        sort = "newest"
+    if sort == "newest":
+        sort_key = (rank_key(user_lat, user_lng), True)
+
+    cursor = request.args.get("cursor")
+    try:
+        results, has_more, next_cursor = _paginate(
+            query, sort, page, per_page, cursor, sort_key,
+            keep=_within(user_lat, user_lng, radius_km) if has_origin else None,
         )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    dicts = _listings_to_dicts(results)
+
+    # Few exact hits on the first page: add ranked near matches and a "did you mean"
+    suggestion = None
+    near_matches = 0
+    if q and not has_more and not cursor and page == 1 and len(results) < FUZZY_MIN_RESULTS:
+        suggestion = suggest_query(q)
+        near = fuzzy_search(filtered, q, exclude_ids=[l.id for l in results], limit=per_page - len(results))
+        near_matches = len(near)
+        dicts.extend(_listings_to_dicts(near))
+
+    if has_origin:
+        dicts = _with_distances(dicts, user_lat, user_lng, radius_km)
+    return jsonify({
+        "listings": dicts, "page": page, "has_more": has_more, "next_cursor": next_cursor,
+        "suggestion": suggestion, "near_matches": near_matches,
+    }), 200
 
-    user_lat = request.args.get("lat", type=float)
-    user_lng = request.args.get("lng", type=float)
-    radius_km = request.args.get("radius_km", 50, type=float)
 
-    if user_lat is not None and user_lng is not None:
-        import math
-        lat_delta = radius_km / 111.0
-        lng_delta = radius_km / (111.0 * max(math.cos(math.radians(user_lat)), 0.01))
-        query = query.filter(
-            Listing.lat.isnot(None),
-            Listing.lng.isnot(None),
-            Listing.lat.between(user_lat - lat_delta, user_lat + lat_delta),
-            Listing.lng.between(user_lng - lng_delta, user_lng + lng_delta),
-        )
+@listings_bp.get("/search/facets")
+def search_facets():
+    f = _search_filters(request.args)
+    error = _radius_error(f["radius_km"])
+    if error:
+        return error
+    # Queries that match the same rows share a cache entry
+    key = tuple(sorted({**f, "q": search_key(f["q"])}.items()))
+    facets = _facet_cache.get(key)
+    if facets is None:
+        facets = _facet_counts(f)
+        _facet_cache.set(key, facets)
+    return jsonify({"facets": facets}), 200
+
+
+def _facet_counts(f):
+    """Counts per category, condition and price bucket in one grouped query.
+
+    Category and condition counts ignore their own filter, so the UI can show
+    what switching to another value would return; everything else applies.
+    """
+    query = _search_query(f, skip=("category", "condition"))
+    if f["q"]:
+        query, _ = apply_text_search(query, f["q"])
+
+    bucket = case(
+        *[(Listing.price_cents < hi, label) for label, _, hi in PRICE_BUCKETS if hi is not None],
+        else_=PRICE_BUCKETS[-1][0],
+    )
+    condition = func.lower(Listing.condition)
+    rows = query.with_entities(Listing.category, condition, bucket, func.count(Listing.id)).group_by(
+        Listing.category, condition, bucket
+    ).all()
+
+    want_category = f["category"]
+    want_condition = f["condition"]
+    categories, conditions, prices = defaultdict(int), defaultdict(int), defaultdict(int)
+    for category, cond, price_bucket, n in rows:
+        category_ok = not want_category or category == want_category
+        condition_ok = not want_condition or cond == want_condition
+        if condition_ok:
+            categories[category] += n
+        if category_ok:
+            conditions[cond] += n
+        if category_ok and condition_ok:
+            prices[price_bucket] += n
 
-    sort_map = {
-        "newest": func.coalesce(Listing.renewed_at, Listing.created_at).desc(),
-        "oldest": Listing.created_at.asc(),
-        "price_low": Listing.price_cents.asc(),
-        "price_high": Listing.price_cents.desc(),
+    return {
+        "category": [{"value": k, "count": v} for k, v in sorted(categories.items(), key=lambda kv: -kv[1])],
+        "condition": [{"value": k, "count": v} for k, v in sorted(conditions.items(), key=lambda kv: -kv[1])],
+        "price": [
+            {"value": label, "min_cents": lo, "max_cents": hi, "count": prices.get(label, 0)}
+            for label, lo, hi in PRICE_BUCKETS
+        ],
+        "total": sum(prices.values()),
     }
-    order = sort_map.get(sort, Listing.created_at.desc())
-
-    results = query.order_by(order).limit(per_page + 1).offset((page - 1) * per_page).all()
-    has_more = len(results) > per_page
-    results = results[:per_page]
-    dicts = [_listing_to_dict(l) for l in results]
-    if sort == "newest" or sort not in sort_map:
-        dicts.sort(key=lambda d: (not d["is_pro_seller"], 0))
-    return jsonify({"listings": dicts, "page": page, "has_more": has_more}), 200
 
 
 @listings_bp.get("")
@@ -296,46 +585,55 @@ def feed():
     per_page = min(max(int(request.args.get("per_page", 20)), 1), 100)
     sort = (request.args.get("sort") or "newest").strip()
 
-    sort_map = {
-        "newest": func.coalesce(Listing.renewed_at, Listing.created_at).desc(),
-        "oldest": Listing.created_at.asc(),
-        "price_low": Listing.price_cents.asc(),
-        "price_high": Listing.price_cents.desc(),
-    }
-    order = sort_map.get(sort, Listing.created_at.desc())
-
-    query = Listing.query.filter_by(is_draft=False).order_by(order)
+    query = Listing.query.filter(Listing.is_draft == False, seller_active())
 
     user_lat = request.args.get("lat", type=float)
     user_lng = request.args.get("lng", type=float)
     radius_km = request.args.get("radius_km", 50, type=float)
-
-    if user_lat is not None and user_lng is not None:
-        import math
-        lat_delta = radius_km / 111.0
-        lng_delta = radius_km / (111.0 * max(math.cos(math.radians(user_lat)), 0.01))
-        query = query.filter(
-            Listing.lat.isnot(None),
-            Listing.lng.isnot(None),
-            Listing.lat.between(user_lat - lat_delta, user_lat + lat_delta),
-            Listing.lng.between(user_lng - lng_delta, user_lng + lng_delta),
+    error = _radius_error(radius_km)
+    if error:
+        return error
+
+    has_origin = user_lat is not None and user_lng is not None
+    if has_origin:
+        query = apply_radius_filter(query, user_lat, user_lng, radius_km)
+
+    sort_key = None
+    if sort == "distance":
+        if has_origin:
+            sort_key = (distance_key(user_lat, user_lng), False)
+        else:
+            sort = "newest"
+    if sort_key is None and sort not in SORT_KEYS:
+        sort = "newest"
+    if sort == "newest":
+        sort_key = (rank_key(user_lat, user_lng), True)
+
+    try:
+        listings, has_more, next_cursor = _paginate(
+            query, sort, page, per_page, request.args.get("cursor"), sort_key,
+            keep=_within(user_lat, user_lng, radius_km) if has_origin else None,
         )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
-    total_query = query.limit(per_page + 1).offset((page - 1) * per_page).all()
-    has_more = len(total_query) > per_page
-    listings = total_query[:per_page]
-
-    dicts = [_listing_to_dict(l) for l in listings]
-    if sort == "newest" or sort not in sort_map:
-        dicts.sort(key=lambda d: (not d["is_pro_seller"], 0))
-    return jsonify({"listings": dicts, "page": page, "has_more": has_more}), 200
+    dicts = _listings_to_dicts(listings)
+    if has_origin:
+        dicts = _with_distances(dicts, user_lat, user_lng, radius_km)
+    return jsonify({"listings": dicts, "page": page, "has_more": has_more, "next_cursor": next_cursor}), 200
 
 @listings_bp.get("/<listing_id>")
 def get_listing(listing_id):
+    etag = listing_etag(listing_id)
+    if etag is None:
+        return jsonify({"error": "Not found"}), 404
+    cached = not_modified(etag)
+    if cached:
+        return cached
     l = db.session.get(Listing, listing_id)
     if not l:
         return jsonify({"error": "Not found"}), 404
-    return jsonify({"listing": _listing_to_dict(l)}), 200
+    return with_etag(jsonify({"listing": _listing_to_dict(l)}), etag), 200
 
 @listings_bp.post("")
 @login_required
@@ -366,6 +664,8 @@ def create_listing():
 
     db.session.add(l)
     db.session.commit()
+    if not l.is_draft:
+        _reindex_similar(l.id)
 
     return jsonify({"ok": True, "listing": _listing_to_dict(l)}), 201
 
@@ -403,6 +703,8 @@ def update_listing(listing_id):
         db.session.add(PriceHistory(listing_id=l.id, old_cents=old_price, new_cents=l.price_cents))
 
     db.session.commit()
+    if not l.is_draft and any(k in data for k in ("title", "description", "category", "price_cents")):
+        _reindex_similar(l.id)
 
     # Notify observers about meaningful changes
     messages = []
@@ -420,28 +722,10 @@ def update_listing(listing_id):
             messages.append(f'"{l.title}" is available again!')
 
     if messages:
-        is_price_drop = "price_cents" in data and l.price_cents < old_price
-        observers = Observing.query.filter_by(listing_id=l.id).all()
-        for obs in observers:
-            if obs.user_id == current_user.id:
-                continue
-            for msg in messages:
-                db.session.add(Notification(user_id=obs.user_id, listing_id=l.id, message=msg))
-            if is_price_drop:
-                obs_user = db.session.get(User, obs.user_id)
-                if obs_user:
-                    try:
-                        from email_utils import send_price_drop_alert
-                        send_price_drop_alert(obs_user.email, obs_user.display_name, l.title, l.id, old_price, l.price_cents)
-                    except Exception:
-                        pass
-                    try:
-                        from push_utils import send_push_to_user
-                        new_d = l.price_cents / 100
-                        send_push_to_user(obs.user_id, "Price Drop!", f"{l.title} dropped to ${new_d:.2f}", url=f"/listing/{l.id}", tag=f"price_drop_{l.id}")
-                    except Exception:
-                        pass
+        notify_observers(l.id, current_user.id, messages)
         db.session.commit()
+        if "price_cents" in data and l.price_cents < old_price:
+            enqueue_price_drop(l.id, current_user.id, l.title, old_price, l.price_cents)
 
     return jsonify({"ok": True, "listing": _listing_to_dict(l)}), 200
 
@@ -454,35 +738,7 @@ def delete_listing(listing_id):
     if l.user_id != current_user.id:
         return jsonify({"error": "Forbidden"}), 403
 
-    lid = l.id
-
-    # Delete all dependent records (order matters for FK chains)
-    # BoostImpressions → Boosts
-    boost_ids = [b.id for b in Boost.query.filter_by(listing_id=lid).all()]
-    if boost_ids:
-        BoostImpression.query.filter(BoostImpression.boost_id.in_(boost_ids)).delete(synchronize_session=False)
-    Boost.query.filter_by(listing_id=lid).delete()
-
-    # Messages → Conversations
-    conv_ids = [c.id for c in Conversation.query.filter_by(listing_id=lid).all()]
-    if conv_ids:
-        Message.query.filter(Message.conversation_id.in_(conv_ids)).delete(synchronize_session=False)
-    Conversation.query.filter_by(listing_id=lid).delete()
-
-    # All other direct FK references
-    ListingImage.query.filter_by(listing_id=lid).delete()
-    SafeMeetLocation.query.filter_by(listing_id=lid).delete()
-    SafetyAckEvent.query.filter_by(listing_id=lid).delete()
-    Observing.query.filter_by(listing_id=lid).delete()
-    Notification.query.filter_by(listing_id=lid).delete()
-    Offer.query.filter_by(listing_id=lid).delete()
-    PriceHistory.query.filter_by(listing_id=lid).delete()
-    Review.query.filter_by(listing_id=lid).delete()
-    Report.query.filter_by(listing_id=lid).delete()
-    ListingView.query.filter_by(listing_id=lid).delete()
-    MeetupConfirmation.query.filter_by(listing_id=lid).delete()
-
-    db.session.delete(l)
+    delete_listings([l.id])
     db.session.commit()
     return jsonify({"ok": True}), 200
 
@@ -503,37 +759,34 @@ def upload_images(listing_id):
         return jsonify({"error": "No files"}), 400
 
     max_photos = 10 if current_user.is_pro else 5
-    existing = ListingImage.query.filter_by(listing_id=l.id).count()
+    existing, next_position = db.session.query(
+        func.count(ListingImage.id), func.coalesce(func.max(ListingImage.position) + 1, 0)
+    ).filter(ListingImage.listing_id == l.id).one()
     if existing + len(files) > max_photos:
         return jsonify({"error": f"Max {max_photos} photos{' (upgrade to Pro for 10)' if not current_user.is_pro else ''}"}), 400
 
-    saved = []
-    import tempfile
-    from image_utils import compress_image
-
+    blobs = []
     for f in files:
         ext = os.path.splitext(f.filename)[1].lower()
         if ext not in [".jpg",".jpeg",".png",".webp"]:
             return jsonify({"error": "Only jpg/jpeg/png/webp allowed"}), 400
+        blobs.append(f.read())
 
-        # Compress via temp file, then store bytes in DB
-        with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-            tmp_path = tmp.name
-            f.save(tmp_path)
-        compress_image(tmp_path)
-        with open(tmp_path, "rb") as fh:
-            image_bytes = fh.read()
-        os.unlink(tmp_path)
-
+    # Render every size and format of the whole upload in parallel, in memory, then write them to the blob store
+    saved = []
+    for rendered in render_images(blobs, current_app.config["IMAGE_WORKERS"]):
+        img_id = str(uuid.uuid4())
+        key = get_blob_store().put(rendered["full"]["image/jpeg"])
         img_record = ListingImage(
+            id=img_id,
             listing_id=l.id,
-            image_url="",  # placeholder, updated after flush
-            image_data=image_bytes,
-            image_mime="image/jpeg",  # compress_image always saves as JPEG
+            image_url=hashed_url(f"/api/listings/image/{img_id}", key),
+            blob_key=key,
+            image_mime="image/jpeg",  # the other formats are renditions
+            position=next_position + len(saved),
         )
         db.session.add(img_record)
-        db.session.flush()  # get the id
-        img_record.image_url = f"/api/listings/image/{img_record.id}"
+        add_renditions(img_id, rendered)
         saved.append(img_record.image_url)
 
     db.session.commit()
@@ -560,27 +813,25 @@ def delete_listing_image(listing_id, image_id):
 
 @listings_bp.get("/<listing_id>/similar")
 def similar_listings(listing_id):
-    l = db.session.get(Listing, listing_id)
-    if not l:
-        return jsonify({"listings": []}), 200
-
-    similar = Listing.query.filter(
-        Listing.category == l.category,
-        Listing.id != l.id,
+    first_image = db.session.query(ListingImage.image_url).filter(
+        ListingImage.listing_id == Listing.id
+    ).order_by(ListingImage.position.asc()).limit(1).scalar_subquery()
+    rows = db.session.query(
+        Listing.id, Listing.title, Listing.price_cents, Listing.created_at, first_image,
+    ).join(ListingNeighbor, ListingNeighbor.neighbor_id == Listing.id).filter(
+        ListingNeighbor.listing_id == listing_id,
         Listing.is_sold == False,
-    ).order_by(Listing.created_at.desc()).limit(6).all()
+        Listing.is_draft == False,
+        seller_active(),
+    ).order_by(ListingNeighbor.score.desc(), Listing.id).limit(SIMILAR_SHOWN).all()
 
-    result = []
-    for s in similar:
-        img = ListingImage.query.filter_by(listing_id=s.id).order_by(ListingImage.created_at.asc()).first()
-        result.append({
-            "id": s.id,
-            "title": s.title,
-            "price_cents": s.price_cents,
-            "image": img.image_url if img else None,
-            "created_at": s.created_at.isoformat(),
-        })
-    return jsonify({"listings": result}), 200
+    return jsonify({"listings": [{
+        "id": lid,
+        "title": title,
+        "price_cents": price_cents,
+        "image": rendition_url(image, "card"),
+        "created_at": created_at.isoformat(),
+    } for lid, title, price_cents, created_at, image in rows]}), 200
 
 
 @listings_bp.get("/<listing_id>/price-history")
@@ -628,29 +879,23 @@ def reorder_images(listing_id):
     if not image_ids:
         return jsonify({"error": "image_ids required"}), 400
 
-    # Assign ascending timestamps in the given order
-    base_time = datetime(2000, 1, 1)
-    for idx, img_id in enumerate(image_ids):
-        img = db.session.get(ListingImage, img_id)
-        if img and img.listing_id == l.id:
-            img.created_at = base_time + timedelta(seconds=idx)
-
+    # One UPDATE for the whole gallery; images missing from the request keep their order after the rest
+    order = {img_id: idx for idx, img_id in enumerate(dict.fromkeys(image_ids))}
+    db.session.execute(
+        ListingImage.__table__.update().where(ListingImage.listing_id == l.id).values(
+            position=case(order, value=ListingImage.id, else_=len(order) + ListingImage.position)
+        )
+    )
+    bump_listing_version(db.session, l.id)
     db.session.commit()
     return jsonify({"ok": True}), 200
 
 
 @listings_bp.post("/<listing_id>/view")
 def track_view(listing_id):
-    from flask_login import current_user as cu
-    l = db.session.get(Listing, listing_id)
-    if not l:
-        return jsonify({"error": "Not found"}), 404
-    viewer_id = cu.id if hasattr(cu, 'id') and cu.is_authenticated else None
-    # Don't track owner views
-    if viewer_id and viewer_id == l.user_id:
-        return jsonify({"ok": True}), 200
-    db.session.add(ListingView(listing_id=listing_id, viewer_id=viewer_id))
-    db.session.commit()
+    # Read the id from the session rather than current_user, which would load the User row.
+    # Unknown listings and owner views are filtered out when the buffer is flushed.
+    record_view(listing_id, session.get("_user_id"))
     return jsonify({"ok": True}), 200
 
 
@@ -666,6 +911,7 @@ def publish_draft(listing_id):
         return jsonify({"error": "Set a price before publishing"}), 400
     l.is_draft = False
     db.session.commit()
+    _reindex_similar(l.id)
     return jsonify({"ok": True, "listing": _listing_to_dict(l)}), 200
 
 
@@ -5,6 +5,8 @@ from flask_login import login_required, current_user
 
 from extensions import db, limiter
 from models import Conversation, Message, Listing, User, ListingImage
+from image_utils import rendition_url
+from cascade_utils import is_deleting
 
 messages_bp = Blueprint("messages", __name__)
 
@@ -46,7 +48,7 @@ def start_conversation():
         return jsonify({"error": "listing_id and seller_id required"}), 400
 
     l = db.session.get(Listing, listing_id)
-    if not l:
+    if not l or is_deleting(l.user_id):
         return jsonify({"error": "Listing not found"}), 404
 
     buyer_id = current_user.id
@@ -75,13 +77,13 @@ def my_conversations():
         other_user = db.session.get(User, other_id)
         listing = db.session.get(Listing, c.listing_id)
         last_msg = Message.query.filter_by(conversation_id=c.id).order_by(Message.created_at.desc()).first()
-        first_img = ListingImage.query.filter_by(listing_id=c.listing_id).order_by(ListingImage.created_at.asc()).first()
+        first_img = ListingImage.query.filter_by(listing_id=c.listing_id).order_by(ListingImage.position.asc()).first()
 
         result.append({
             "id": c.id,
             "listing_id": c.listing_id,
             "listing_title": listing.title if listing else "Deleted",
-            "listing_image": first_img.image_url if first_img else None,
+            "listing_image": rendition_url(first_img.image_url, "thumb") if first_img else None,
             "other_user_name": other_user.display_name or "User" if other_user else "User",
             "other_user_avatar": other_user.avatar_url if other_user else None,
             "last_message": last_msg.body if last_msg else None,
@@ -128,6 +130,8 @@ def send_message(conversation_id):
         return jsonify({"error": "Not found"}), 404
     if current_user.id not in [c.buyer_id, c.seller_id]:
         return jsonify({"error": "Forbidden"}), 403
+    if is_deleting(c.seller_id):
+        return jsonify({"error": "Listing not found"}), 404
 
     data = request.get_json(force=True)
     body = (data.get("body") or "").strip()
@@ -152,6 +156,8 @@ def send_chat_image(conversation_id):
         return jsonify({"error": "Not found"}), 404
     if current_user.id not in [c.buyer_id, c.seller_id]:
         return jsonify({"error": "Forbidden"}), 403
+    if is_deleting(c.seller_id):
+        return jsonify({"error": "Listing not found"}), 404
 
     if "file" not in request.files:
         return jsonify({"error": "No file provided"}), 400
@@ -60,12 +60,15 @@ def google_callback():
     if not user and email:
         user = User.query.filter_by(email=email).first()
 
+    if user and user.deleted_at:
+        return redirect(current_app.config["FRONTEND_ORIGIN"] + "/login?error=account_deleted")
+
     is_new = False
     if user:
         # Link Google to existing account and update profile
         user.google_sub = sub
         # Only use Google picture if user hasn't uploaded a custom avatar
-        if not user.avatar_data:
+        if not user.avatar_key and not user.avatar_data:
             user.avatar_url = picture or user.avatar_url
         user.display_name = user.display_name or name
     else:
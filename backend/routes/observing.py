@@ -1,8 +1,8 @@
 from flask import Blueprint, jsonify
 from flask_login import login_required, current_user
-from sqlalchemy import func
 from extensions import db
 from models import Observing, Listing
+from counter_utils import bump_counter
 
 observing_bp = Blueprint("observing", __name__)
 
@@ -12,16 +12,18 @@ def toggle(listing_id):
     existing = Observing.query.filter_by(user_id=current_user.id, listing_id=listing_id).first()
     if existing:
         db.session.delete(existing)
+        bump_counter(listing_id, "observing_count", -1)
         db.session.commit()
-        count = db.session.query(func.count(Observing.id)).filter_by(listing_id=listing_id).scalar()
+        count = db.session.query(Listing.observing_count).filter_by(id=listing_id).scalar() or 0
         return jsonify({"ok": True, "observing": False, "observing_count": count}), 200
 
     if not db.session.get(Listing, listing_id):
         return jsonify({"error": "Listing not found"}), 404
 
     db.session.add(Observing(user_id=current_user.id, listing_id=listing_id))
+    bump_counter(listing_id, "observing_count")
     db.session.commit()
-    count = db.session.query(func.count(Observing.id)).filter_by(listing_id=listing_id).scalar()
+    count = db.session.query(Listing.observing_count).filter_by(id=listing_id).scalar() or 0
     return jsonify({"ok": True, "observing": True, "observing_count": count}), 200
 
 @observing_bp.get("")
@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 
 from extensions import db, limiter
 from models import Offer, Listing, Notification, User, Conversation, Message
+from cascade_utils import is_deleting
 
 offers_bp = Blueprint("offers", __name__)
 
@@ -19,7 +20,7 @@ def make_offer():
         return jsonify({"error": "Offer must be > $0"}), 400
 
     l = db.session.get(Listing, listing_id)
-    if not l:
+    if not l or is_deleting(l.user_id):
         return jsonify({"error": "Listing not found"}), 404
     if l.user_id == current_user.id:
         return jsonify({"error": "Can't offer on your own listing"}), 400
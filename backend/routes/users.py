@@ -4,7 +4,9 @@ from flask_login import login_required, current_user
 from sqlalchemy import func
 from extensions import db
 from models import User, Listing, ListingImage, BlockedUser, Report, Conversation, Message
+from cache_utils import profile_etag, not_modified, with_etag
 from email_utils import send_report_auto_reply, notify_report
+from image_utils import rendition_url
 
 users_bp = Blueprint("users", __name__)
 
@@ -12,8 +14,15 @@ users_bp = Blueprint("users", __name__)
 @users_bp.get("/<user_id>/profile")
 @login_required
 def public_profile(user_id):
+    etag = profile_etag(user_id, current_user.id)
+    if etag is None:
+        return jsonify({"error": "User not found"}), 404
+    cached = not_modified(etag)
+    if cached:
+        return cached
+
     u = db.session.get(User, user_id)
-    if not u:
+    if not u or u.deleted_at:
         return jsonify({"error": "User not found"}), 404
 
     listings = Listing.query.filter_by(user_id=user_id).order_by(Listing.created_at.desc()).all()
@@ -42,13 +51,13 @@ def public_profile(user_id):
 
     listing_dicts = []
     for l in listings:
-        img = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.created_at.asc()).first()
+        img = ListingImage.query.filter_by(listing_id=l.id).order_by(ListingImage.position.asc()).first()
         listing_dicts.append({
             "id": l.id,
             "title": l.title,
             "price_cents": l.price_cents,
             "is_sold": l.is_sold,
-            "image": img.image_url if img else None,
+            "image": rendition_url(img.image_url, "card") if img else None,
             "created_at": l.created_at.isoformat(),
         })
 
@@ -56,7 +65,7 @@ def public_profile(user_id):
     if current_user.is_authenticated:
         is_blocked = BlockedUser.query.filter_by(blocker_id=current_user.id, blocked_id=user_id).first() is not None
 
-    return jsonify({
+    return with_etag(jsonify({
         "profile": {
             "id": u.id,
             "display_name": u.display_name or "User",
@@ -70,7 +79,7 @@ def public_profile(user_id):
             "is_blocked": is_blocked,
         },
         "listings": listing_dicts,
-    }), 200
+    }), etag), 200
 
 
 @users_bp.post("/<user_id>/block")
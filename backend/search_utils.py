@@ -0,0 +1,374 @@
+import re
+import time
+import threading
+from array import array
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+
+from flask import current_app
+from sqlalchemy import text, func, literal, literal_column, table, column, event, cast, BigInteger, Float
+from sqlalchemy.orm import Session, object_session
+
+from extensions import db
+from models import Listing
+
+MAX_TERMS = 8
+RANK_SCALE = 1000000            # relevance is sorted and paged on round(score * RANK_SCALE)
+
+# ── Fuzzy matching ──
+FUZZY_MIN_RESULTS = 5           # fewer exact hits than this on page 1 triggers near matches
+FUZZY_THRESHOLD = 0.4           # share of query trigrams a title must contain
+SUGGEST_MIN_RATIO = 0.75        # edit similarity a vocabulary word needs to be suggested
+TRIGRAM_INDEX_TTL = 600         # seconds before the in-process index is rebuilt from the DB
+MAX_POSTING_SCAN = 20000        # trigrams this common are skipped when gathering candidates
+FUZZY_CANDIDATES = 200          # candidates re-scored exactly per fuzzy search
+
+# Set by init_search_index(): "postgresql", "sqlite", or None (substring fallback)
+_backend = None
+# True when pg_trgm and its GIN index on listings.title are available
+_pg_trgm = False
+
+# PostgreSQL: stored generated tsvector (title weighted above description) + GIN index
+_PG_STATEMENTS = [
+    "ALTER TABLE listings ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')) STORED",
+    "CREATE INDEX IF NOT EXISTS ix_listings_search_vector ON listings USING GIN (search_vector)",
+]
+
+# SQLite: FTS5 external-content table over listings, kept in sync by triggers
+_SQLITE_STATEMENTS = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5("
+    "title, description, content='listings', tokenize='porter unicode61')",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_ai AFTER INSERT ON listings BEGIN "
+    "INSERT INTO listings_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_ad AFTER DELETE ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS listings_fts_au AFTER UPDATE OF title, description ON listings BEGIN "
+    "INSERT INTO listings_fts(listings_fts, rowid, title, description) "
+    "VALUES ('delete', old.rowid, old.title, old.description); "
+    "INSERT INTO listings_fts(rowid, title, description) VALUES (new.rowid, new.title, new.description); END",
+    # VACUUM may renumber listings.rowid, so re-derive the index from the table on startup
+    "INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')",
+]
+
+_PG_TRGM_STATEMENTS = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_listings_title_trgm ON listings USING GIN (title gin_trgm_ops)",
+]
+
+_fts = table("listings_fts", column("rowid"), column("rank"))
+
+
+def init_search_index():
+    """Create the full-text (and on PostgreSQL, trigram) indexes. Called once at startup."""
+    global _backend, _pg_trgm
+    dialect = db.engine.dialect.name
+    statements = {"postgresql": _PG_STATEMENTS, "sqlite": _SQLITE_STATEMENTS}.get(dialect)
+    if not statements:
+        _backend = None
+        return
+    try:
+        for stmt in statements:
+            db.session.execute(text(stmt))
+        db.session.commit()
+        _backend = dialect
+    except Exception as e:
+        db.session.rollback()
+        _backend = None
+        current_app.logger.warning(f"Full-text search unavailable, using substring match: {e}")
+
+    _pg_trgm = False
+    if dialect == "postgresql":
+        try:
+            for stmt in _PG_TRGM_STATEMENTS:
+                db.session.execute(text(stmt))
+            db.session.commit()
+            _pg_trgm = True
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.warning(f"pg_trgm unavailable, using in-process trigram index: {e}")
+
+
+def search_terms(q):
+    """Lowercased word tokens of a search string (punctuation dropped)."""
+    return re.findall(r"\w+", (q or "").lower())[:MAX_TERMS]
+
+
+def search_key(q):
+    """A form of q that is equal for any two queries apply_text_search matches alike:
+    the terms when full-text search applies, else q itself for the substring fallback."""
+    terms = search_terms(q)
+    return " ".join(terms) if terms and _backend is not None else q
+
+
+def apply_text_search(query, q):
+    """Restrict a Listing query to rows matching every term of q (stemmed, prefix-matched).
+
+    Returns (query, rank) where rank sorts best matches first when descending,
+    or rank=None when only the substring fallback is available. rank is an
+    integer, so a keyset cursor compares it exactly rather than as a float.
+    """
+    terms = search_terms(q)
+    if not terms or _backend is None:
+        return query.filter(
+            db.or_(
+                Listing.title.ilike(f"%{q}%"),
+                Listing.description.ilike(f"%{q}%"),
+            )
+        ), None
+
+    if _backend == "postgresql":
+        tsquery = func.to_tsquery("english", " & ".join(f"{t}:*" for t in terms))
+        vector = literal_column("listings.search_vector")
+        query = query.filter(vector.op("@@")(tsquery))
+        return query, cast(func.round(func.ts_rank_cd(vector, tsquery).cast(Float) * RANK_SCALE), BigInteger)
+
+    match = " AND ".join(f'"{t}"*' for t in terms)
+    query = query.join(_fts, _fts.c.rowid == literal_column("listings.rowid")).filter(
+        literal_column("listings_fts").op("MATCH")(match)
+    )
+    # FTS5 rank is bm25, where lower is better
+    return query, cast(func.round(-_fts.c.rank * RANK_SCALE), BigInteger)
+
+
+def trigrams(text_):
+    """pg_trgm-style trigrams: each word lowercased and padded with two leading
+    spaces and one trailing space."""
+    grams = set()
+    for word in re.findall(r"[^\W_]+", (text_ or "").lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+
+class TrigramIndex:
+    """In-process trigram index over listing titles plus their word vocabulary.
+
+    Backs fuzzy matching where pg_trgm isn't available (SQLite) and "did you
+    mean" suggestions everywhere. Postings are compact int arrays; updated
+    titles are re-added under a new doc number and the old one is tombstoned
+    until the next reload. Candidate gathering skips trigrams common enough
+    to exceed MAX_POSTING_SCAN, so lookup cost stays bounded as listings grow.
+    """
+
+    def __init__(self):
+        self.doc_ids = []                   # doc number -> listing id
+        self.doc_titles = []                # doc number -> title
+        self.doc_of = {}                    # listing id -> live doc number
+        self.postings = defaultdict(lambda: array("I"))
+        self.vocab = Counter()              # title word -> listing count
+        self.word_postings = defaultdict(set)
+
+    def add(self, listing_id, title):
+        self.remove(listing_id)
+        doc = len(self.doc_ids)
+        self.doc_ids.append(listing_id)
+        self.doc_titles.append(title or "")
+        self.doc_of[listing_id] = doc
+        for gram in trigrams(title):
+            self.postings[gram].append(doc)
+        for word in set(re.findall(r"[^\W_]+", (title or "").lower())):
+            if not self.vocab[word]:
+                for gram in trigrams(word):
+                    self.word_postings[gram].add(word)
+            self.vocab[word] += 1
+
+    def remove(self, listing_id):
+        doc = self.doc_of.pop(listing_id, None)
+        if doc is None:
+            return
+        for word in set(re.findall(r"[^\W_]+", self.doc_titles[doc].lower())):
+            self.vocab[word] -= 1
+            if self.vocab[word] <= 0:
+                del self.vocab[word]
+                for gram in trigrams(word):
+                    self.word_postings[gram].discard(word)
+        self.doc_titles[doc] = ""
+
+    def search(self, q, limit=FUZZY_CANDIDATES):
+        """Return [(listing_id, score)] for titles containing at least
+        FUZZY_THRESHOLD of q's trigrams, best first."""
+        q_grams = trigrams(q)
+        if not q_grams:
+            return []
+        counts = Counter()
+        for gram in q_grams:
+            posting = self.postings.get(gram)
+            if posting is not None and len(posting) <= MAX_POSTING_SCAN:
+                counts.update(posting)
+        scored = []
+        for doc, _ in counts.most_common(limit):
+            listing_id = self.doc_ids[doc]
+            if self.doc_of.get(listing_id) != doc:
+                continue
+            score = len(q_grams & trigrams(self.doc_titles[doc])) / len(q_grams)
+            if score >= FUZZY_THRESHOLD:
+                scored.append((listing_id, score))
+        scored.sort(key=lambda x: -x[1])
+        return scored
+
+    def correct(self, word):
+        """Closest vocabulary word to word, or None if nothing is close enough."""
+        if word in self.vocab or len(word) < 3:
+            return None
+        shared = Counter()
+        for gram in trigrams(word):
+            shared.update(self.word_postings.get(gram, ()))
+        best, best_key = None, None
+        for candidate, _ in shared.most_common(50):
+            ratio = SequenceMatcher(None, word, candidate).ratio()
+            if ratio < SUGGEST_MIN_RATIO:
+                continue
+            key = (ratio, self.vocab[candidate])
+            if best_key is None or key > best_key:
+                best, best_key = candidate, key
+        return best
+
+
+_index = None
+_index_loaded_at = 0.0
+_index_lock = threading.Lock()
+# listing id -> title (None = gone) committed while a rebuild reads the table; None when idle
+_journal = None
+
+
+def _apply(index, listing_id, title):
+    if title is None:
+        index.remove(listing_id)
+    else:
+        index.add(listing_id, title)
+
+
+def _load_index():
+    index = TrigramIndex()
+    rows = db.session.query(Listing.id, Listing.title).filter(
+        Listing.is_sold == False, Listing.is_draft == False,
+    ).yield_per(5000)
+    for listing_id, title in rows:
+        index.add(listing_id, title)
+    return index
+
+
+def _rebuild_index(app):
+    global _index, _index_loaded_at, _journal
+    try:
+        with app.app_context():
+            index = _load_index()
+    except Exception:
+        app.logger.exception("Trigram index rebuild failed")
+        with _index_lock:
+            _journal = None
+        return
+    with _index_lock:
+        # Commits made while the rows were read may or may not be in them; replaying is idempotent
+        for listing_id, title in _journal.items():
+            _apply(index, listing_id, title)
+        _index, _index_loaded_at, _journal = index, time.monotonic(), None
+
+
+def _trigram_index():
+    """The process-wide TrigramIndex, or None until its first build finishes.
+
+    When missing or older than TRIGRAM_INDEX_TTL (so other workers' writes show
+    up) it is rebuilt in a background thread; requests keep using the old one
+    until the new one is swapped in.
+    """
+    global _journal
+    with _index_lock:
+        stale = _index is None or time.monotonic() - _index_loaded_at > TRIGRAM_INDEX_TTL
+        if stale and _journal is None:
+            _journal = {}
+            threading.Thread(
+                target=_rebuild_index, args=(current_app._get_current_object(),),
+                name="trigram-index", daemon=True,
+            ).start()
+        return _index
+
+
+def _pending(session):
+    return session.info.setdefault("trigram_pending", {})
+
+
+@event.listens_for(Listing, "after_insert")
+@event.listens_for(Listing, "after_update")
+def _index_listing(mapper, connection, target):
+    _pending(object_session(target))[target.id] = None if target.is_sold or target.is_draft else target.title
+
+
+@event.listens_for(Listing, "after_delete")
+def _unindex_listing(mapper, connection, target):
+    _pending(object_session(target))[target.id] = None
+
+
+def unindex_listings(ids):
+    """Drop listings removed with a bulk DELETE, which skips the ORM delete event."""
+    pending = _pending(db.session)
+    for listing_id in ids:
+        pending[listing_id] = None
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session):
+    """Index changes are applied once their transaction commits, never from a rolled-back flush."""
+    pending = session.info.pop("trigram_pending", None)
+    if not pending:
+        return
+    with _index_lock:
+        for listing_id, title in pending.items():
+            if _index is not None:
+                _apply(_index, listing_id, title)
+            if _journal is not None:
+                _journal[listing_id] = title
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending(session):
+    session.info.pop("trigram_pending", None)
+
+
+def fuzzy_search(query, q, exclude_ids=(), limit=20):
+    """Near matches for q among the rows of a filtered Listing query, best first.
+
+    Uses pg_trgm's word similarity on PostgreSQL and the in-process
+    TrigramIndex otherwise (nothing until its first build is ready).
+    """
+    if limit <= 0 or not trigrams(q):
+        return []
+    if exclude_ids:
+        query = query.filter(~Listing.id.in_(list(exclude_ids)))
+
+    if _pg_trgm:
+        db.session.execute(
+            text("SELECT set_config('pg_trgm.word_similarity_threshold', :t, true)"),
+            {"t": str(FUZZY_THRESHOLD)},
+        )
+        return query.filter(literal(q).op("<%")(Listing.title)).order_by(
+            func.word_similarity(q, Listing.title).desc(), Listing.id,
+        ).limit(limit).all()
+
+    index = _trigram_index()
+    scored = index.search(q) if index else []
+    if not scored:
+        return []
+    score_of = dict(scored)
+    rows = query.filter(Listing.id.in_(list(score_of))).all()
+    rows.sort(key=lambda l: (-score_of[l.id], l.id))
+    return rows[:limit]
+
+
+def suggest_query(q):
+    """A corrected query built from the indexed title vocabulary, or None when
+    every term is already a known word (or has no close match)."""
+    terms = search_terms(q)
+    if not terms:
+        return None
+    index = _trigram_index()
+    if index is None:
+        return None
+    corrected = [index.correct(t) or t for t in terms]
+    if corrected == terms:
+        return None
+    return " ".join(corrected)
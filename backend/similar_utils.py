@@ -0,0 +1,197 @@
+import re
+import hashlib
+from collections import Counter, defaultdict
+from functools import lru_cache
+
+from sqlalchemy import bindparam, delete, select, union_all
+
+from extensions import db
+from models import Listing, ListingNeighbor, ListingSimilarityBand
+from geo_utils import haversine_km
+
+# ── Similarity weights ──
+TEXT_WEIGHT = 0.6               # Jaccard overlap of title/description tokens
+CATEGORY_WEIGHT = 0.15
+PRICE_WEIGHT = 0.15             # cheaper/dearer ratio, 1.0 for the same price
+DISTANCE_WEIGHT = 0.1           # 1.0 at the same spot, halves every DISTANCE_SCALE_KM
+DISTANCE_SCALE_KM = 25
+
+NEIGHBORS_PER_LISTING = 12      # stored; the endpoint shows the best unsold ones
+MAX_CANDIDATES = 50             # scored per listing, most shared bands first
+MAX_BUCKET_SCAN = 200           # listings read from any one band bucket
+MAX_DESCRIPTION_TOKENS = 20
+
+# MinHash LSH: BANDS bands of ROWS hashes. Two listings whose token sets have
+# Jaccard J share a band with probability 1 - (1 - J**ROWS)**BANDS (~0.85 at J=1/3).
+BANDS = 16
+ROWS = 2
+
+_STOPWORDS = {
+    "a", "an", "and", "the", "for", "with", "of", "in", "on", "to", "or", "is", "it", "my",
+    "new", "used", "good", "great", "condition", "like", "very", "only", "sale", "selling",
+}
+_PRIME = (1 << 61) - 1
+_PERMUTATIONS = [
+    (int.from_bytes(hashlib.blake2b(f"a{i}".encode(), digest_size=8).digest(), "big") % _PRIME or 1,
+     int.from_bytes(hashlib.blake2b(f"b{i}".encode(), digest_size=8).digest(), "big") % _PRIME)
+    for i in range(BANDS * ROWS)
+]
+
+
+def listing_tokens(title, description):
+    """Token set compared between listings: title words plus the start of the description."""
+    words = lambda s: [w for w in re.findall(r"[^\W_]+", (s or "").lower()) if w not in _STOPWORDS and len(w) > 1]
+    return frozenset(words(title) + words(description)[:MAX_DESCRIPTION_TOKENS])
+
+
+@lru_cache(maxsize=200_000)
+def _token_signature(token):
+    h = int.from_bytes(hashlib.blake2b(token.encode(), digest_size=8).digest(), "big")
+    return tuple((a * h + b) % _PRIME for a, b in _PERMUTATIONS)
+
+
+def band_keys(tokens):
+    """One 63-bit key per LSH band of the token set's MinHash signature."""
+    if not tokens:
+        return []
+    signature = list(map(min, zip(*map(_token_signature, tokens))))
+    keys = []
+    for i in range(BANDS):
+        raw = f"{i}:" + ",".join(map(str, signature[i * ROWS:(i + 1) * ROWS]))
+        keys.append(int.from_bytes(hashlib.blake2b(raw.encode(), digest_size=8).digest(), "big") >> 1)
+    return keys
+
+
+class _Doc:
+    __slots__ = ("id", "tokens", "category", "price_cents", "lat", "lng")
+
+    def __init__(self, row):
+        self.id, title, description, self.category, self.price_cents, self.lat, self.lng = row
+        self.tokens = listing_tokens(title, description)
+
+
+_DOC_COLUMNS = (Listing.id, Listing.title, Listing.description, Listing.category,
+                Listing.price_cents, Listing.lat, Listing.lng)
+
+
+def similarity(a, b):
+    union = len(a.tokens | b.tokens)
+    score = TEXT_WEIGHT * (len(a.tokens & b.tokens) / union if union else 0)
+    if a.category == b.category:
+        score += CATEGORY_WEIGHT
+    if a.price_cents > 0 and b.price_cents > 0:
+        score += PRICE_WEIGHT * min(a.price_cents, b.price_cents) / max(a.price_cents, b.price_cents)
+    if None not in (a.lat, a.lng, b.lat, b.lng):
+        km = haversine_km(a.lat, a.lng, b.lat, b.lng)
+        score += DISTANCE_WEIGHT * 0.5 ** (km / DISTANCE_SCALE_KM)
+    return round(score, 6)
+
+
+def _top(doc, candidates):
+    scored = sorted(((similarity(doc, c), c.id) for c in candidates if c.id != doc.id), reverse=True)
+    return scored[:NEIGHBORS_PER_LISTING]
+
+
+def index_listing(listing_id):
+    """(Re)compute one listing's bands and neighbors, and offer it to its
+    neighbors' lists. Call after the listing is created, edited or published."""
+    row = db.session.query(*_DOC_COLUMNS).filter(Listing.id == listing_id, Listing.is_draft == False).first()
+    db.session.execute(delete(ListingSimilarityBand).where(ListingSimilarityBand.listing_id == listing_id))
+    db.session.execute(delete(ListingNeighbor).where(ListingNeighbor.listing_id == listing_id))
+    if row is None:
+        db.session.commit()
+        return
+    doc = _Doc(row)
+    keys = band_keys(doc.tokens)
+    if keys:
+        db.session.execute(ListingSimilarityBand.__table__.insert(), [
+            {"band": k, "listing_id": doc.id} for k in keys
+        ])
+
+    # Bounded read per bucket so a band shared by thousands of listings stays cheap
+    shared = Counter()
+    if keys:
+        buckets = [
+            select(ListingSimilarityBand.listing_id).where(ListingSimilarityBand.band == k)
+            .limit(MAX_BUCKET_SCAN).subquery() for k in keys
+        ]
+        for (lid,) in db.session.execute(union_all(*(select(b.c.listing_id) for b in buckets))):
+            if lid != doc.id:
+                shared[lid] += 1
+    candidate_ids = [lid for lid, _ in shared.most_common(MAX_CANDIDATES)]
+    candidates = [_Doc(r) for r in db.session.query(*_DOC_COLUMNS).filter(Listing.id.in_(candidate_ids))]
+
+    top = _top(doc, candidates)
+    if top:
+        db.session.execute(ListingNeighbor.__table__.insert(), [
+            {"listing_id": doc.id, "neighbor_id": nid, "score": s} for s, nid in top
+        ])
+
+    # Similarity is symmetric: slot this listing into candidates' lists where it beats their worst
+    scores = {nid: s for s, nid in top}
+    current = defaultdict(list)
+    for lid, nid, s in db.session.query(
+        ListingNeighbor.listing_id, ListingNeighbor.neighbor_id, ListingNeighbor.score
+    ).filter(ListingNeighbor.listing_id.in_(list(scores))):
+        current[lid].append((s, nid))
+    inserts, evictions = [], []
+    for lid, s in scores.items():
+        existing = [e for e in current[lid] if e[1] != doc.id]
+        if len(existing) < NEIGHBORS_PER_LISTING:
+            inserts.append({"listing_id": lid, "neighbor_id": doc.id, "score": s})
+        else:
+            worst = min(existing)
+            if s > worst[0]:
+                inserts.append({"listing_id": lid, "neighbor_id": doc.id, "score": s})
+                evictions.append({"lid": lid, "nid": worst[1]})
+        if any(e[1] == doc.id for e in current[lid]):
+            evictions.append({"lid": lid, "nid": doc.id})
+    if evictions:
+        neighbors = ListingNeighbor.__table__
+        db.session.execute(delete(neighbors).where(
+            neighbors.c.listing_id == bindparam("lid"), neighbors.c.neighbor_id == bindparam("nid"),
+        ), evictions)
+    if inserts:
+        db.session.execute(ListingNeighbor.__table__.insert(), inserts)
+    db.session.commit()
+
+
+def rebuild_similarity_index(batch_size=5000):
+    """Recompute every band and neighbor list from scratch, in memory. Returns listings indexed."""
+    docs = [_Doc(r) for r in db.session.query(*_DOC_COLUMNS).filter(
+        Listing.is_draft == False
+    ).order_by(Listing.created_at).yield_per(batch_size)]
+
+    buckets = defaultdict(list)
+    doc_keys = {}
+    for i, doc in enumerate(docs):
+        doc_keys[i] = band_keys(doc.tokens)
+        for k in doc_keys[i]:
+            buckets[k].append(i)
+
+    db.session.execute(delete(ListingSimilarityBand))
+    db.session.execute(delete(ListingNeighbor))
+    band_rows, neighbor_rows = [], []
+    for i, doc in enumerate(docs):
+        shared = defaultdict(int)
+        for k in doc_keys[i]:
+            band_rows.append({"band": k, "listing_id": doc.id})
+            for j in buckets[k][-MAX_BUCKET_SCAN:]:  # newest in the bucket
+                if j != i:
+                    shared[j] += 1
+        best = sorted(shared, key=shared.get, reverse=True)[:MAX_CANDIDATES]
+        for s, nid in _top(doc, (docs[j] for j in best)):
+            neighbor_rows.append({"listing_id": doc.id, "neighbor_id": nid, "score": s})
+        if len(band_rows) >= batch_size * BANDS or len(neighbor_rows) >= batch_size * NEIGHBORS_PER_LISTING:
+            _write(band_rows, neighbor_rows)
+            band_rows, neighbor_rows = [], []
+    _write(band_rows, neighbor_rows)
+    db.session.commit()
+    return len(docs)
+
+
+def _write(band_rows, neighbor_rows):
+    if band_rows:
+        db.session.execute(ListingSimilarityBand.__table__.insert(), band_rows)
+    if neighbor_rows:
+        db.session.execute(ListingNeighbor.__table__.insert(), neighbor_rows)
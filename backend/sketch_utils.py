@@ -0,0 +1,42 @@
+import hashlib
+from math import log
+
+HLL_PRECISION = 9                   # 2**9 = 512 one-byte registers per sketch
+_M = 1 << HLL_PRECISION
+_ALPHA = 0.7213 / (1 + 1.079 / _M)
+
+# Relative standard error of HyperLogLog is 1.04 / sqrt(m): about 4.6% at m=512,
+# so ~95% of estimates land within ±9.2% of the true count. Below ~2.5*m distinct
+# items linear counting is used instead, which is close to exact for small counts.
+# benchmarks/bench_unique_viewers.py checks this bound.
+HLL_STD_ERROR = 1.04 / _M ** 0.5
+
+
+class HyperLogLog:
+    """Fixed-size distinct-count sketch; serializes to 2**HLL_PRECISION bytes."""
+
+    def __init__(self, data=None):
+        self.registers = bytearray(data) if data else bytearray(_M)
+        if len(self.registers) != _M:
+            raise ValueError("Sketch has the wrong size")
+
+    def add(self, key):
+        h = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "big")
+        idx = h >> (64 - HLL_PRECISION)
+        rest = h & ((1 << (64 - HLL_PRECISION)) - 1)
+        rank = (64 - HLL_PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[idx]:
+            self.registers[idx] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+        estimate = _ALPHA * _M * _M / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * _M and zeros:
+            estimate = _M * log(_M / zeros)
+        return int(round(estimate))
+
+    def to_bytes(self):
+        return bytes(self.registers)
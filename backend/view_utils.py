@@ -0,0 +1,275 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import atexit
+import threading
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import bindparam
+
+from extensions import db
+from models import Listing, ListingView, User
+from sketch_utils import HyperLogLog
+from rollup_utils import record_daily
+
+_REDIS_KEY = "pm:view_events"
+_DEAD_KEY = "pm:view_events:dead"   # events given up on, kept for inspection
+MAX_FLUSH_ATTEMPTS = 12             # failed flushes before an event failing on its own is dead-lettered
+MAX_FLUSH_BACKOFF_SECONDS = 300     # longest wait between flushes while they keep failing
+
+_app = None
+_redis = None
+# (listing_id, viewer_id, epoch seconds, viewer key, failed flushes) when Redis isn't configured
+_events = deque()
+_lock = threading.Lock()
+_wake = threading.Event()
+_flusher_pid = None
+
+
+def init_view_buffer(app):
+    """Bind the buffer to the app. The flusher thread starts on the first view in each process."""
+    global _app, _redis
+    _app = app
+    redis_url = app.config.get("REDIS_URL")
+    if redis_url:
+        import redis
+        _redis = redis.from_url(redis_url)
+    atexit.register(_flush_at_exit)
+
+
+def viewer_key(viewer_id=None):
+    """Identity a view counts toward unique viewers: the user id, or for anonymous
+    visitors a salted hash of their IP and user agent."""
+    if viewer_id:
+        return f"u:{viewer_id}"
+    raw = f"{current_app.config['SECRET_KEY']}|{request.remote_addr}|{request.user_agent.string}"
+    return "a:" + hashlib.sha256(raw.encode()).hexdigest()[:32]
+
+
+def record_view(listing_id, viewer_id=None, key=None):
+    """Queue a view; it reaches listing_views within VIEW_FLUSH_INTERVAL_SECONDS."""
+    event = (listing_id, viewer_id, time.time(), key or viewer_key(viewer_id), 0)
+    if _redis is not None:
+        pending = _redis.rpush(_REDIS_KEY, json.dumps(event))
+    else:
+        with _lock:
+            _events.append(event)
+            pending = len(_events)
+    _ensure_flusher()
+    if pending >= _app.config["VIEW_FLUSH_BATCH"]:
+        _wake.set()
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    # Checked per pid so each forked gunicorn worker gets its own thread
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid != os.getpid():
+            _flusher_pid = os.getpid()
+            threading.Thread(target=_flush_loop, name="view-flusher", daemon=True).start()
+
+
+def _flush_loop():
+    interval = _app.config["VIEW_FLUSH_INTERVAL_SECONDS"]
+    failures = 0
+    while True:
+        if failures:
+            # Back off while the database is down; a full buffer can't wake us early
+            time.sleep(min(interval * 2 ** failures, MAX_FLUSH_BACKOFF_SECONDS))
+        else:
+            _wake.wait(interval)
+        _wake.clear()
+        try:
+            with _app.app_context():
+                while flush_views():
+                    pass
+            failures = 0
+        except Exception:
+            failures += 1
+            _app.logger.exception("View flush failed")
+
+
+def _flush_at_exit():
+    if _app is None:
+        return
+    try:
+        with _app.app_context():
+            while flush_views():
+                pass
+    except Exception:
+        pass
+
+
+def _parse(raw):
+    event = tuple(json.loads(raw))
+    # Events queued before the attempt count existed have four fields
+    return event if len(event) == 5 else event + (0,)
+
+
+def _batch_size(limit, attempts):
+    """Halve the batch for each time its first event has failed, down to single events,
+    so a batch with one unwritable event narrows down to just that event."""
+    return max(limit >> attempts, 1)
+
+
+def _take_batch(limit):
+    if _redis is not None:
+        head = _redis.lindex(_REDIS_KEY, 0)
+        if head is None:
+            return []
+        limit = _batch_size(limit, _parse(head)[4])
+        pipe = _redis.pipeline()
+        pipe.lrange(_REDIS_KEY, 0, limit - 1)
+        pipe.ltrim(_REDIS_KEY, limit, -1)
+        raw, _ = pipe.execute()
+        return [_parse(r) for r in raw]
+    with _lock:
+        if not _events:
+            return []
+        limit = _batch_size(limit, _events[0][4])
+        return [_events.popleft() for _ in range(min(limit, len(_events)))]
+
+
+def _requeue(batch):
+    """Put a failed batch back at the head of the queue with one more failure each.
+    An event that has failed MAX_FLUSH_ATTEMPTS times and still fails on its own is
+    dead-lettered so it can't stall ingestion."""
+    retry = [e[:4] + (e[4] + 1,) for e in batch]
+    dead = []
+    if len(retry) == 1 and retry[0][4] >= MAX_FLUSH_ATTEMPTS:
+        dead, retry = retry, []
+        current_app.logger.error(f"Dropping view after {MAX_FLUSH_ATTEMPTS} failed flushes: {json.dumps(dead[0])}")
+    if _redis is not None:
+        if retry:
+            _redis.lpush(_REDIS_KEY, *(json.dumps(e) for e in reversed(retry)))
+        if dead:
+            _redis.rpush(_DEAD_KEY, *(json.dumps(e) for e in dead))
+    elif retry:
+        with _lock:
+            _events.extendleft(reversed(retry))
+
+
+def flush_views():
+    """Write one batch of buffered views with multi-row INSERTs. Returns events taken.
+
+    A batch that fails to commit goes back on the queue, and the next flush takes
+    half as many of its events (see _batch_size), so the good events get written
+    and only one that keeps failing on its own is dead-lettered.
+    """
+    batch = _take_batch(current_app.config["VIEW_FLUSH_BATCH"])
+    if not batch:
+        return 0
+    try:
+        _write_batch(batch)
+    except Exception:
+        db.session.rollback()
+        _requeue(batch)
+        raise
+    return len(batch)
+
+
+def _write_batch(batch):
+    # The endpoint doesn't touch the DB, so views of deleted listings, by deleted
+    # users, and owners' own views are dropped here
+    owners = dict(db.session.query(Listing.id, Listing.user_id).filter(
+        Listing.id.in_({e[0] for e in batch})
+    ))
+    viewers = {uid for (uid,) in db.session.query(User.id).filter(User.id.in_({e[1] for e in batch if e[1]}))}
+    batch = [e for e in batch if e[0] in owners and (e[1] is None or (e[1] in viewers and e[1] != owners[e[0]]))]
+    if batch:
+        db.session.execute(ListingView.__table__.insert(), [
+            {"id": str(uuid.uuid4()), "listing_id": listing_id, "viewer_id": viewer_id,
+             "created_at": datetime.utcfromtimestamp(ts)}
+            for listing_id, viewer_id, ts, _, _ in batch
+        ])
+
+        per_listing = Counter(e[0] for e in batch)
+        per_day = Counter((e[0], datetime.utcfromtimestamp(e[2]).date()) for e in batch)
+        record_daily(db.session, [
+            {"listing_id": lid, "seller_id": owners[lid], "day": day, "views": n}
+            for (lid, day), n in per_day.items()
+        ])
+        # Each process flushes on its own, so the sketch read-merge-writes hold the rows,
+        # sellers then listings (the order a Pro change re-ranks them in), each in id order.
+        # NO KEY UPDATE doesn't block other inserts' foreign-key checks. SQLite has no row
+        # locks, but allows one writer at a time and fails a write from a transaction whose
+        # reads went stale; that batch is retried.
+        seller_sketches = {
+            uid: HyperLogLog(data) for uid, data in db.session.query(User.id, User.viewer_sketch).filter(
+                User.id.in_({owners[lid] for lid in per_listing})
+            ).order_by(User.id).with_for_update(key_share=True)
+        }
+        sketches = {
+            lid: HyperLogLog(data) for lid, data in db.session.query(Listing.id, Listing.viewer_sketch).filter(
+                Listing.id.in_(list(per_listing))
+            ).order_by(Listing.id).with_for_update(key_share=True)
+        }
+        for listing_id, _, _, key, _ in batch:
+            sketches[listing_id].add(key)
+        db.session.execute(
+            Listing.__table__.update().where(Listing.id == bindparam("lid")).values(
+                view_count=Listing.view_count + bindparam("n"),
+                viewer_sketch=bindparam("sketch"),
+                unique_viewers=bindparam("uniques"),
+            ),
+            [{"lid": lid, "n": n, "sketch": sketches[lid].to_bytes(), "uniques": sketches[lid].count()}
+             for lid, n in per_listing.items()],
+        )
+
+        for listing_id, _, _, key, _ in batch:
+            seller_sketches[owners[listing_id]].add(key)
+        db.session.execute(
+            User.__table__.update().where(User.id == bindparam("uid")).values(viewer_sketch=bindparam("sketch")),
+            [{"uid": uid, "sketch": s.to_bytes()} for uid, s in seller_sketches.items()],
+        )
+    db.session.commit()
+
+
+def rebuild_viewer_sketches(batch_size=500):
+    """Build listing and seller sketches from listing_views for data that predates them.
+
+    Anonymous rows carry no visitor key, so each counts as its own viewer.
+    """
+    rebuilt = 0
+    while True:
+        ids = [lid for (lid,) in db.session.query(Listing.id).filter(
+            Listing.viewer_sketch.is_(None), Listing.view_count > 0,
+        ).limit(batch_size)]
+        if not ids:
+            break
+        sketches = {lid: HyperLogLog() for lid in ids}
+        for view_id, listing_id, viewer_id in db.session.query(
+            ListingView.id, ListingView.listing_id, ListingView.viewer_id
+        ).filter(ListingView.listing_id.in_(ids)):
+            sketches[listing_id].add(f"u:{viewer_id}" if viewer_id else f"v:{view_id}")
+        db.session.execute(
+            Listing.__table__.update().where(Listing.id == bindparam("lid")).values(
+                viewer_sketch=bindparam("sketch"), unique_viewers=bindparam("uniques"),
+            ),
+            [{"lid": lid, "sketch": s.to_bytes(), "uniques": s.count()} for lid, s in sketches.items()],
+        )
+        db.session.commit()
+        rebuilt += len(ids)
+
+    # Seller sketches are the union of their listings' sketches
+    seller_ids = [uid for (uid,) in db.session.query(Listing.user_id).filter(
+        Listing.viewer_sketch.isnot(None)
+    ).join(User, User.id == Listing.user_id).filter(User.viewer_sketch.is_(None)).distinct()]
+    for i in range(0, len(seller_ids), batch_size):
+        merged = {uid: HyperLogLog() for uid in seller_ids[i:i + batch_size]}
+        for uid, data in db.session.query(Listing.user_id, Listing.viewer_sketch).filter(
+            Listing.user_id.in_(list(merged)), Listing.viewer_sketch.isnot(None),
+        ):
+            merged[uid].merge(HyperLogLog(data))
+        db.session.execute(
+            User.__table__.update().where(User.id == bindparam("uid")).values(viewer_sketch=bindparam("sketch")),
+            [{"uid": uid, "sketch": s.to_bytes()} for uid, s in merged.items()],
+        )
+        db.session.commit()
+    return rebuilt
@@ -86,6 +86,7 @@ export default function Home({ me, notify, unreadNotifs = 0 }){
   const nav = useNavigate();
   const sentinelRef = useRef(null);
   const hasMoreRef = useRef(false);
+  const cursorRef = useRef(null);
   const loadingMoreRef = useRef(false);
 
   // Rotate search placeholder
@@ -104,7 +105,7 @@ export default function Home({ me, notify, unreadNotifs = 0 }){
     const p = reset ? 1 : page + 1;
     try{
       const [feed, feat] = await Promise.all([
-        api.feed(p, sort),
+        api.feed(p, sort, reset ? null : cursorRef.current),
         ...(reset ? [api.featured()] : []),
       ]);
       if (reset) {
@@ -114,6 +115,7 @@ export default function Home({ me, notify, unreadNotifs = 0 }){
         setListings(prev => [...prev, ...(feed.listings || [])]);
       }
       setPage(p);
+      cursorRef.current = feed.next_cursor || null;
       setHasMore(feed.has_more || false);
       hasMoreRef.current = feed.has_more || false;
     }catch(err){
@@ -293,7 +295,7 @@ export default function Home({ me, notify, unreadNotifs = 0 }){
                 <Card noPadding>
                   <div style={{ position:"relative" }}>
                     {l.images?.length > 0 ? (
-                      <img src={`${api.base}${l.images[0]}`} alt={l.title} className="card-image"
+                      <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt={l.title} className="card-image"
                         onError={e => { e.target.onerror=null; e.target.src=""; e.target.className="card-image-placeholder"; }} />
                     ) : (
                       <div className="card-image-placeholder"><IconCamera size={28} /></div>
@@ -353,7 +355,7 @@ export default function Home({ me, notify, unreadNotifs = 0 }){
             <Card noPadding>
               <div style={{ position:"relative" }}>
                 {l.images?.length > 0 ? (
-                  <img src={`${api.base}${l.images[0]}`} alt={l.title} className="card-image"
+                  <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt={l.title} className="card-image"
                     onError={e => { e.target.onerror=null; e.target.src=""; e.target.className="card-image-placeholder"; }} />
                 ) : (
                   <div className="card-image-placeholder"><IconCamera size={28} /></div>
@@ -45,7 +45,7 @@ export default function Observing({ notify }){
         <Link key={l.id} to={`/listing/${l.id}`} style={{ display:"block", marginBottom:8 }}>
           <div className="panel obs-item">
             {l.images?.length > 0 ? (
-              <img src={`${api.base}${l.images[0]}`} className="obs-item-thumb" alt={l.title}
+              <img src={`${api.base}${l.thumbnail || l.images[0]}`} className="obs-item-thumb" alt={l.title}
                    onError={e => { e.target.onerror=null; e.target.style.background="var(--panel2)"; e.target.src=""; }} />
             ) : (
               <div className="obs-item-thumb" style={{
@@ -280,7 +280,7 @@ export default function Profile({ me, notify, refreshMe }){
                   display:"flex", alignItems:"center", justifyContent:"center",
                 }}>
                   {l.images?.length > 0 ? (
-                    <img src={`${api.base}${l.images[0]}`} alt="" style={{ width:"100%", height:"100%", objectFit:"cover" }} />
+                    <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt="" style={{ width:"100%", height:"100%", objectFit:"cover" }} />
                   ) : (
                     <IconCamera size={18} color="var(--muted)" />
                   )}
@@ -434,7 +434,7 @@ export default function Profile({ me, notify, refreshMe }){
                     display:"flex", alignItems:"center", justifyContent:"center",
                   }}>
                     {l.images?.length > 0 ? (
-                      <img src={`${api.base}${l.images[0]}`} alt="" style={{ width:"100%", height:"100%", objectFit:"cover" }} />
+                      <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt="" style={{ width:"100%", height:"100%", objectFit:"cover" }} />
                     ) : (
                       <IconCamera size={22} color="var(--muted)" />
                     )}
@@ -248,7 +248,7 @@ export default function Saved({ notify }){
                     <Card noPadding>
                       <div style={{ position:"relative" }}>
                         {l.images?.length > 0 ? (
-                          <img src={`${api.base}${l.images[0]}`} alt={l.title} className="card-image" />
+                          <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt={l.title} className="card-image" />
                         ) : (
                           <div className="card-image-placeholder"><IconCamera size={24} /></div>
                         )}
@@ -309,7 +309,7 @@ export default function Saved({ notify }){
                         display:"flex", alignItems:"center", justifyContent:"center",
                       }}>
                         {l.images?.length > 0 ? (
-                          <img src={`${api.base}${l.images[0]}`} alt={l.title} style={{ width:"100%", height:"100%", objectFit:"cover" }} />
+                          <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt={l.title} style={{ width:"100%", height:"100%", objectFit:"cover" }} />
                         ) : (
                           <IconCamera size={22} color="var(--muted)" />
                         )}
@@ -448,7 +448,7 @@ export default function Saved({ notify }){
                     display:"flex", alignItems:"center", justifyContent:"center",
                   }}>
                     {(l.image || l.images?.[0]) ? (
-                      <img src={`${api.base}${l.image || l.images[0]}`} alt={l.title} style={{ width:"100%", height:"100%", objectFit:"cover" }} />
+                      <img src={`${api.base}${l.image || l.thumbnail || l.images[0]}`} alt={l.title} style={{ width:"100%", height:"100%", objectFit:"cover" }} />
                     ) : (
                       <IconCamera size={22} color="var(--muted)" />
                     )}
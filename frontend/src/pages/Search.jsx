@@ -24,6 +24,8 @@ const CATEGORIES = ["electronics","clothing","furniture","art","books","sports",
 const CONDITIONS = ["new","like new","used","fair"];
 const SORT_OPTIONS = [
   { value:"newest", label:"Newest" },
+  { value:"relevance", label:"Best match" },
+  { value:"distance", label:"Nearest" },
   { value:"oldest", label:"Oldest" },
   { value:"price_low", label:"Price: Low → High" },
   { value:"price_high", label:"Price: High → Low" },
@@ -105,6 +107,7 @@ function AccordionSection({ title, isOpen, onToggle, children, activeCount }){
 export default function Search({ notify }){
   const [query, setQuery] = useState("");
   const [results, setResults] = useState([]);
+  const [suggestion, setSuggestion] = useState(null);
   const [busy, setBusy] = useState(false);
   const [searched, setSearched] = useState(false);
   const inputRef = useRef(null);
@@ -220,6 +223,7 @@ export default function Search({ notify }){
         safeMeet: appliedSafeMeet, lat: appliedLat, lng: appliedLng,
       });
       setResults(data.listings || []);
+      setSuggestion(data.suggestion || null);
       const params = { q: term };
       if (appliedCategory) params.category = appliedCategory;
       setSearchParams(params, { replace: true });
@@ -256,6 +260,7 @@ export default function Search({ notify }){
           safeMeet: pendingSafeMeet, lat: pendingLat, lng: pendingLng,
         });
         setResults(data.listings || []);
+        setSuggestion(data.suggestion || null);
       } catch(err) { notify(err.message); }
       finally { setBusy(false); }
     }
@@ -351,6 +356,15 @@ export default function Search({ notify }){
       </div>
 
       {/* Results */}
+      {!busy && searched && suggestion && (
+        <div className="muted" style={{ fontSize:13, marginBottom:8 }}>
+          Did you mean{" "}
+          <button onClick={() => { setQuery(suggestion); doSearch(suggestion); }} style={{
+            background:"none", border:"none", padding:0, color:"var(--cyan)",
+            fontSize:13, fontWeight:700, cursor:"pointer", fontFamily:"inherit",
+          }}>{suggestion}</button>?
+        </div>
+      )}
       {busy ? (
         <div className="grid">
           {[...Array(6)].map((_, i) => <SkeletonCard key={i} />)}
@@ -382,7 +396,7 @@ export default function Search({ notify }){
                 <Card noPadding>
                   <div style={{ position:"relative" }}>
                     {l.images?.length > 0 ? (
-                      <img src={`${api.base}${l.images[0]}`} alt={l.title} className="card-image"
+                      <img src={`${api.base}${l.thumbnail || l.images[0]}`} alt={l.title} className="card-image"
                         onError={e => { e.target.onerror=null; e.target.src=""; e.target.className="card-image-placeholder"; }} />
                     ) : (
                       <div className="card-image-placeholder"><IconCamera size={28} /></div>